@@ -158,3 +158,87 @@ STRIPE_SK = 'sk_test_51QddGJBhnqZWblmvGsyQZ4u2A2B8ifE2EWNhWOuRfWATQOVhi7O8hmqaCe
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "Kursy_Online/static"]
+
+# Ocenianie zadań programistycznych - pula procesów
+SANDBOX_POOL_SIZE = 4
+SANDBOX_MAX_JOBS_PER_WORKER = 100
+# Izolacja procesów oceniających: przestrzenie nazw (user, PID, sieć, montowania) i filtr seccomp.
+# 'auto' - gdy jądro pozwala (inaczej same rlimity i walidacja AST), 'required' - bez niej ocenianie nie działa, 'off'
+SANDBOX_ISOLATION = 'auto'
+# Moduły dostępne w zgłoszeniach, gdy procesy są izolowane
+SANDBOX_ALLOWED_IMPORTS = [
+    'math', 'cmath', 'collections', 'itertools', 'functools', 'heapq', 'bisect', 'operator',
+    'string', 're', 'decimal', 'fractions', 'statistics', 'random', 'datetime', 'copy', 'typing',
+    'dataclasses', 'json'
+]
+# Wejścia i wyniki testów dłuższe niż próg (znaki) zapisywane jako pliki adresowane treścią (domyślnie MEDIA_ROOT/test_cases)
+TEST_CASE_BLOB_THRESHOLD = 64 * 1024
+TEST_CASE_BLOB_ROOT = MEDIA_ROOT / 'test_cases'
+# Delegowany katalog cgroup v2 (np. /sys/fs/cgroup/grading) - limity CPU, pamięci i procesów na proces oceniający
+SANDBOX_CGROUP = None
+SANDBOX_CGROUP_CPUS = 1
+SANDBOX_CGROUP_MEMORY_MAX = 512 * 1024 * 1024
+SANDBOX_CGROUP_PIDS_MAX = 16
+# Zgłoszenia oceniane w tle przez `python manage.py grading_worker` (False - ocenianie w żądaniu HTTP)
+GRADING_ASYNC = True
+# Co ile sekund klient odpytuje /api/grading-jobs/{id}/ (endpoint nie czeka na wynik)
+GRADING_POLL_INTERVAL = 1
+# Jak długo submit_solution_stream śledzi zgłoszenie w kolejce, zanim odeśle klienta do odpytywania
+GRADING_STREAM_TIMEOUT = 60
+# Skompilowane programy z interpreterów (C, Java) - cache adresowany treścią kodu i flagami kompilatora
+COMPILED_ARTIFACT_CACHE_DIR = BASE_DIR / 'compiled_cache'
+COMPILED_ARTIFACT_CACHE_MAX_ENTRIES = 500
+# Limity procesów uruchamianych przez interpretery (sekundy, bajty wyjścia, procesy na serwer)
+RUNNER_TIMEOUT = 10
+RUNNER_CPU_TIME = 5
+RUNNER_COMPILE_TIMEOUT = 30
+RUNNER_OUTPUT_LIMIT = 64 * 1024
+RUNNER_MAX_PROCESSES = 8
+RUNNER_QUEUE_TIMEOUT = 10
+# Fork-server (`python manage.py forkserver`) - używany, gdy gniazdo istnieje
+FORKSERVER_SOCKET = BASE_DIR / 'forkserver.sock'
+FORKSERVER_MAX_CHILDREN = 8
+# Sesje Pythona na stronie interpretera (sekundy bezczynności, limit pamięci procesu sesji).
+# Procesy sesji trzyma `python manage.py repl_host` pod REPL_SOCKET (None - w procesie serwera, tylko dla runserver);
+# każdy zajmuje jedno z RUNNER_MAX_PROCESSES miejsc, dopóki sesja nie wygaśnie
+REPL_SOCKET = BASE_DIR / 'repl.sock'
+REPL_IDLE_TIMEOUT = 600
+REPL_TIMEOUT = 10
+REPL_MEMORY_LIMIT = 256 * 1024 * 1024
+REPL_MAX_SESSIONS = 20
+# Limity uruchamiania kodu na użytkownika (lub adres IP): token bucket i sekundy CPU w oknie czasu.
+# Stan trzymany w cache - przy kilku procesach serwera i grading_worker potrzebny wspólny cache. Liczniki i blokady
+# używają cache.add()/incr(), atomowych w Redis i Memcached; przy cache plikowym zmiany stanu idą pod blokadą flock()
+# pliku <LOCATION>.lock, więc wystarcza on procesom jednego serwera (nie kilku maszynom)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'execution_limits': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'execution_limits_cache',
+    },
+    'facets': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'facets_cache',
+    },
+}
+EXECUTION_LIMITS_CACHE = 'execution_limits'
+# Przybliżona liczba wyników listy kursów (?with_total=1) - cache i czas życia wpisu w sekundach
+PAGINATION_TOTAL_CACHE = 'default'
+PAGINATION_TOTAL_CACHE_TIMEOUT = 300
+# Dane filtrów katalogu (/api/courses/filters/) - cache z wersjonowanym kluczem, czas życia wpisu w sekundach.
+# Numer wersji musi być wspólny dla wszystkich procesów serwera (inaczej zmiana kursu unieważnia fasety
+# tylko w jednym z nich, a ETag różni się między procesami) - cache plikowy dla jednej maszyny, Redis dla kilku
+FACETS_CACHE = 'facets'
+FACETS_CACHE_TIMEOUT = 24 * 3600
+# Granice przedziałów cen w licznikach wyszukiwania ([od, do), ostatni bez górnej granicy)
+COURSE_PRICE_BUCKETS = [0, 50, 100, 200, 500]
+EXECUTION_RATE_PER_MINUTE = 30
+EXECUTION_RATE_BURST = 10
+EXECUTION_CPU_QUOTA = 600
+EXECUTION_CPU_QUOTA_WINDOW = 3600
+# Kolejka oceniania pełna - nowe zgłoszenia odrzucane z 429 i Retry-After (sekundy)
+GRADING_MAX_QUEUE_DEPTH = 200
+GRADING_QUEUE_RETRY_AFTER = 15
+RUNNER_BUSY_RETRY_AFTER = 5
@@ -9,7 +9,8 @@ from Kursy_Online.views import AuthViewSet, verify_email, login_view, home_view,
     PaymentViewSet, TechnologyViewSet, course_detail_view, create_chapter_view, profile_view, get_balance, get_available_moderators,    \
     my_courses_view, chapter_detail_view, create_chapter_page, manage_media_view, edit_chapter_page_view, page_detail_view, LoginHistoryView, ContentImageViewSet, ContentVideoViewSet, \
     quiz_page_detail_view, create_quiz_view, create_coding_view, payment_view, edit_quiz_view, rating_view, add_balance_view, python_interpreter, run_code, powershell_interpreter, c_interpreter, csharp_interpreter, java_interpreter, \
-    js_interpreter, interpreter_view, coding_page_detail_view, edit_coding_view
+    js_interpreter, interpreter_view, coding_page_detail_view, edit_coding_view, grading_job_status, python_session, \
+    grading_metrics_view
 
 # Main router
 router = DefaultRouter()
@@ -51,6 +52,8 @@ urlpatterns = [
     path('api/payout-history/', PayoutHistoryView.as_view(), name='payout-history'),
     path('api/login_history/', LoginHistoryView.as_view(), name='login_history'),
     path('api/payments/create/<int:course_id>/', PaymentViewSet.as_view({'post': 'create_payment'}), name='create-payment'),
+    path('api/grading-jobs/<int:job_id>/', grading_job_status, name='grading_job_status'),
+    path('api/grading-metrics/', grading_metrics_view, name='grading_metrics'),
     
     # Authentication & User Management
     path('login/', login_view, name='login'),
@@ -96,6 +99,7 @@ urlpatterns = [
     # Code Interpreters
     path('interpreter/', interpreter_view, name='interpreter'),
     path('python-interpreter/', python_interpreter, name='python_interpreter'),
+    path('python-interpreter/session/', python_session, name='python_session'),
     path('powershell-interpreter/', powershell_interpreter, name='powershell_interpreter'),
     path('c-interpreter/', c_interpreter, name='c_interpreter'),
     path('csharp-interpreter/', csharp_interpreter, name='csharp_interpreter'),
@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import User, Course,Technology, Chapter, Page, ContentPage, ContentImage, ContentVideo, Quiz, QuizQuestion, QuizAnswer, CodingExercise, TestCase, UserProgress, CourseReview, Payment, PayoutHistory, LoginHistory
+from django.contrib import admin, messages
+from .models import User, Course,Technology, Chapter, Page, ContentPage, ContentImage, ContentVideo, Quiz, QuizQuestion, QuizAnswer, CodingExercise, TestCase, UserProgress, CourseReview, Payment, PayoutHistory, LoginHistory, GradingJob, Submission, GradingHistogram
+from .grading import enqueue_regrade_job
 
 admin.site.register(User)
 admin.site.register(Course)
@@ -12,10 +13,47 @@ admin.site.register(ContentVideo)
 admin.site.register(Quiz)
 admin.site.register(QuizQuestion)
 admin.site.register(QuizAnswer)
-admin.site.register(CodingExercise)
 admin.site.register(TestCase)
 admin.site.register(UserProgress)
 admin.site.register(CourseReview)
 admin.site.register(Payment)
 admin.site.register(PayoutHistory)
-admin.site.register(LoginHistory)
\ No newline at end of file
+admin.site.register(LoginHistory)
+admin.site.register(GradingJob)
+admin.site.register(Submission)
+
+
+@admin.register(GradingHistogram)
+class GradingHistogramAdmin(admin.ModelAdmin):
+    list_display = ['exercise', 'phase', 'count', 'p50', 'p95', 'p99', 'max_time', 'total_time', 'max_memory']
+    list_filter = ['phase']
+    readonly_fields = [field.name for field in GradingHistogram._meta.fields]
+
+    @admin.display(description='p50 [s]')
+    def p50(self, obj):
+        return obj.percentile(50)
+
+    @admin.display(description='p95 [s]')
+    def p95(self, obj):
+        return obj.percentile(95)
+
+    @admin.display(description='p99 [s]')
+    def p99(self, obj):
+        return obj.percentile(99)
+
+
+@admin.register(CodingExercise)
+class CodingExerciseAdmin(admin.ModelAdmin):
+    actions = ['regrade_submissions']
+
+    @admin.action(description='Oceń ponownie zgłoszenia (w tle, przez grading_worker)')
+    def regrade_submissions(self, request, queryset):
+        # Ocenianie trwa długo - żądanie tylko dodaje zadanie do kolejki GradingJob
+        for exercise in queryset.select_related('page'):
+            job, created = enqueue_regrade_job(request.user, exercise.page)
+            if created:
+                self.message_user(request, f'{exercise.page.title}: ponowne ocenianie zlecone (zadanie {job.id})',
+                                  messages.SUCCESS)
+            else:
+                self.message_user(request, f'{exercise.page.title}: ponowne ocenianie czeka już w kolejce '
+                                           f'(zadanie {job.id})', messages.INFO)
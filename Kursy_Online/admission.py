@@ -0,0 +1,215 @@
+import math
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows - bez blokad plikowych między procesami
+    fcntl = None
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from .models import GradingJob
+
+
+class ExecutionThrottled(Exception):
+    """
+    Code execution refused for now; retry_after is the number of seconds to wait
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def _setting(name: str, default):
+    value = getattr(settings, name, None)
+    return default if value is None else value
+
+
+def _cache():
+    return caches[_setting('EXECUTION_LIMITS_CACHE', 'default')]
+
+
+def _lock_file(cache) -> Optional[str]:
+    """
+    Lock file next to the directory of a file-based cache (None for other backends).
+    FileBasedCache.add() and incr() read and write separately, so between processes they
+    are only atomic under this lock.
+    """
+    if fcntl is None or not isinstance(cache, FileBasedCache):
+        return None
+    location = settings.CACHES[_setting('EXECUTION_LIMITS_CACHE', 'default')]['LOCATION']
+    path = f'{os.path.abspath(location)}.lock'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+# Czas życia blokady kubełka - po awarii procesu, który ją trzyma, wygasa sama
+LOCK_TIMEOUT = 2
+
+
+def _busy():
+    return ExecutionThrottled('Zbyt wiele równoczesnych uruchomień kodu, spróbuj ponownie za chwilę', 1)
+
+
+@contextmanager
+def _file_locked(path: str):
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    with open(path, 'a') as handle:
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise _busy()
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _locked(cache, cache_key: str):
+    """
+    Lock shared by every process using the cache. For a file-based cache it is an flock()
+    on _lock_file; otherwise cache.add() stores the entry for exactly one of them (atomic in
+    Redis and Memcached) and the others wait until it is deleted or expires.
+    """
+    lock_file = _lock_file(cache)
+    if lock_file is not None:
+        with _file_locked(lock_file):
+            yield
+        return
+
+    lock_key = f'{cache_key}:lock'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(lock_key, token, timeout=LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            raise _busy()
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        # Blokada mogła wygasnąć i zostać przejęta - usuwana tylko własna
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def execution_key(user=None, request=None) -> str:
+    """
+    Whose limits apply: the logged-in user or, for anonymous interpreter runs, the client address
+    """
+    if user is None and request is not None:
+        user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '') if request is not None else ''}"
+
+
+def take_token(key: str, now: Optional[float] = None):
+    """
+    Token bucket per key: EXECUTION_RATE_BURST runs at once, refilled at
+    EXECUTION_RATE_PER_MINUTE. Raises ExecutionThrottled when the bucket is empty.
+    """
+    per_minute = _setting('EXECUTION_RATE_PER_MINUTE', 0)
+    if not per_minute:
+        return
+    rate = per_minute / 60
+    burst = max(1, _setting('EXECUTION_RATE_BURST', per_minute))
+    now = time.time() if now is None else now
+    cache = _cache()
+    cache_key = f'execution:bucket:{key}'
+
+    with _locked(cache, cache_key):
+        tokens, updated = cache.get(cache_key) or (burst, now)
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        if tokens < 1:
+            raise ExecutionThrottled(
+                'Zbyt wiele uruchomień kodu, spróbuj ponownie za chwilę',
+                (1 - tokens) / rate
+            )
+        # Pełny kubełek nie musi być przechowywany - wpis wygasa, gdy i tak by się napełnił
+        cache.set(cache_key, (tokens - 1, now), timeout=math.ceil(burst / rate) + 1)
+
+
+def _quota_window(now: float):
+    window = _setting('EXECUTION_CPU_QUOTA_WINDOW', 3600)
+    start = int(now // window * window)
+    return start, start + window
+
+
+def check_cpu_quota(key: str, now: Optional[float] = None):
+    """
+    Refuse once the key has used up EXECUTION_CPU_QUOTA CPU seconds in the current window
+    """
+    quota = _setting('EXECUTION_CPU_QUOTA', 0)
+    if not quota:
+        return
+    now = time.time() if now is None else now
+    start, end = _quota_window(now)
+    used = _cache().get(f'execution:cpu:{key}:{start}', 0)
+    if used >= quota * 1000:
+        raise ExecutionThrottled('Wykorzystano limit czasu procesora, spróbuj ponownie później', end - now)
+
+
+def charge_cpu_time(key: str, seconds: Optional[float], now: Optional[float] = None):
+    """
+    Add CPU time used by a finished run to the key's quota (stored in milliseconds)
+    """
+    if not seconds or not _setting('EXECUTION_CPU_QUOTA', 0):
+        return
+    now = time.time() if now is None else now
+    start, end = _quota_window(now)
+    cache = _cache()
+    cache_key = f'execution:cpu:{key}:{start}'
+    milliseconds = max(1, round(seconds * 1000))
+    timeout = math.ceil(end - now) + 1
+
+    lock_file = _lock_file(cache)
+    if lock_file is not None:
+        with _file_locked(lock_file):
+            cache.set(cache_key, cache.get(cache_key, 0) + milliseconds, timeout=timeout)
+        return
+
+    # add() i incr() bez odczytu i zapisu całej wartości - równoczesne obciążenia się sumują
+    cache.add(cache_key, 0, timeout=timeout)
+    try:
+        cache.incr(cache_key, milliseconds)
+    except ValueError:
+        # Wpis wygasł między add() a incr() - tworzy go pierwszy, pozostali dodają swoje
+        if not cache.add(cache_key, milliseconds, timeout=timeout):
+            cache.incr(cache_key, milliseconds)
+
+
+def check_queue_depth():
+    """
+    Global admission limit for the grading queue: refuse new jobs while
+    GRADING_MAX_QUEUE_DEPTH jobs are already waiting for a worker
+    """
+    limit = _setting('GRADING_MAX_QUEUE_DEPTH', 0)
+    if not limit:
+        return
+    if GradingJob.objects.filter(status='PENDING').count() >= limit:
+        raise ExecutionThrottled(
+            'Kolejka oceniania jest pełna, spróbuj ponownie za chwilę',
+            _setting('GRADING_QUEUE_RETRY_AFTER', 10)
+        )
+
+
+def admit(key: str, queued: bool = False):
+    """
+    All admission checks before running code; the rate-limit token is taken
+    last, so a request refused for another reason does not use it up
+    """
+    if queued:
+        check_queue_depth()
+    check_cpu_quota(key)
+    take_token(key)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class KursyOnlineConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Kursy_Online'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .languages import registry
+        # Ścieżki kompilatorów i interpreterów ustalane raz, przy starcie
+        registry.discover()
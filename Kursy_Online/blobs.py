@@ -0,0 +1,162 @@
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Union
+
+from django.conf import settings
+
+
+_KEY = re.compile(r'[0-9a-f]{64}')
+
+
+def blob_threshold() -> int:
+    """
+    Test inputs and expected outputs longer than this (characters) are stored as files
+    """
+    return getattr(settings, 'TEST_CASE_BLOB_THRESHOLD', None) or 64 * 1024
+
+
+def blob_root() -> str:
+    root = getattr(settings, 'TEST_CASE_BLOB_ROOT', None) or os.path.join(settings.MEDIA_ROOT, 'test_cases')
+    return str(root)
+
+
+def blob_path(key: str) -> str:
+    if not _KEY.fullmatch(key):
+        raise ValueError(f'Nieprawidłowy klucz pliku: {key!r}')
+    return os.path.join(blob_root(), key[:2], key)
+
+
+def store_blob(data: Union[bytes, str]) -> str:
+    """
+    Store data under its SHA-256 and return the key; identical content is stored once
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    key = hashlib.sha256(data).hexdigest()
+    path = blob_path(key)
+    if not os.path.exists(path):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Zapis do pliku tymczasowego i rename - czytający nigdy nie zobaczy niepełnego pliku
+        fd, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(data)
+            os.chmod(temporary, 0o444)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+    return key
+
+
+class BlobRef:
+    """
+    Reference to a stored test input or expected output. Graders receive it instead of
+    the content and read the file themselves (memory-mapped), so multi-megabyte data
+    is never copied through the database, the grading pipes or API responses.
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def __getstate__(self):
+        return self.key
+
+    def __setstate__(self, state):
+        self.key = state
+
+    def __eq__(self, other):
+        return isinstance(other, BlobRef) and other.key == self.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f'BlobRef({self.key[:12]})'
+
+    @property
+    def path(self) -> str:
+        return blob_path(self.key)
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    @contextmanager
+    def open(self) -> Iterator[Union[mmap.mmap, bytes]]:
+        """
+        Read-only memory map of the content
+        """
+        with open(self.path, 'rb') as handle:
+            if os.fstat(handle.fileno()).st_size == 0:
+                yield b''
+                return
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+
+    def read_text(self) -> str:
+        with self.open() as data:
+            return str(data[:], 'utf-8', errors='replace')
+
+    def head(self, length: int) -> str:
+        """
+        First `length` characters, read without loading the rest of the file
+        """
+        with open(self.path, 'rb') as handle:
+            return handle.read(length * 4).decode('utf-8', errors='ignore')[:length]
+
+
+@lru_cache(maxsize=256)
+def blob_digest(key: str):
+    """
+    (length, blake2b) of the content with surrounding whitespace stripped, as used by
+    comparison.ExpectedDigest; cached per key since blobs never change
+    """
+    with BlobRef(key).open() as data:
+        view = memoryview(data) if len(data) else memoryview(b'')
+        start, end = 0, len(view)
+        while start < end and view[start] in b' \t\n\r\x0b\x0c':
+            start += 1
+        while end > start and view[end - 1] in b' \t\n\r\x0b\x0c':
+            end -= 1
+        try:
+            return end - start, hashlib.blake2b(view[start:end], digest_size=16).digest()
+        finally:
+            view.release()
+
+
+def referenced_blobs() -> set:
+    from .models import TestCase
+    keys = set()
+    for fields in TestCase.objects.values_list('input_blob', 'parsed_input_blob', 'expected_output_blob'):
+        keys.update(key for key in fields if key)
+    return keys
+
+
+def prune_blobs(min_age: float = 3600) -> int:
+    """
+    Delete stored files no test case refers to any more; returns the number removed.
+    Files younger than min_age seconds are kept - they may belong to a test case being saved.
+    """
+    root = blob_root()
+    if not os.path.isdir(root):
+        return 0
+    used = referenced_blobs()
+    cutoff = time.time() - min_age
+    removed = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if _KEY.fullmatch(name) and name not in used and os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+                removed += 1
+    return removed
@@ -1,80 +1,195 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Iterator, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import ast
+import builtins
+import hashlib
+import marshal
+import math
+import shutil
 import sys
+import tempfile
+import threading
 from io import StringIO
 from contextlib import redirect_stdout
 import traceback
 import time
+from .blobs import BlobRef
+from .comparison import compact_expected, compare_outputs, preview
+from .isolation import allowed_imports, isolation_mode
+from .languages import LanguageUnavailable, registry
+from .runner import CompilationError, RunnerBusy, execute
+from .sandbox import MEMORY_LIMIT_ERROR, get_sandbox_pool
+
+
+def solution_hash(code: str) -> str:
+    """
+    Hash identifying the reference solution that produced stored expected outputs
+    """
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+TEST_INPUT_ERROR = 'Wejście testu musi być literałem Pythona (liczba, napis, lista, krotka, słownik, zbiór)'
+
+
+def parse_test_input(test_input: str) -> Optional[bytes]:
+    """
+    Parse a test input once with a literal-only parser and serialize it with marshal.
+    Returns None when the input is not a plain Python literal.
+    """
+    try:
+        return marshal.dumps(ast.literal_eval(test_input))
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+
+def load_test_input(test_input: Union[str, BlobRef], parsed_input: Union[bytes, BlobRef, None] = None) -> Any:
+    """
+    Argument passed to solution(): the pre-parsed value when available, otherwise the raw input parsed now.
+    Inputs stored in files (BlobRef) are read here, in the grading worker, through a memory map.
+    Only Python literals are accepted - anything else raises ValueError, it is never evaluated.
+    """
+    if isinstance(parsed_input, BlobRef):
+        with parsed_input.open() as data:
+            return marshal.loads(data)
+    if parsed_input is not None:
+        return marshal.loads(parsed_input)
+    if isinstance(test_input, BlobRef):
+        test_input = test_input.read_text()
+    try:
+        return ast.literal_eval(test_input)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        # Wejścia niebędące literałami (np. list(range(10))) są odrzucane przy zapisie testu
+        raise ValueError(TEST_INPUT_ERROR) from None
+
+
+def _restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name.partition('.')[0] not in allowed_imports():
+        raise ImportError(f'Niedozwolony import modułu {name}')
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def sandbox_builtins() -> Dict[str, Any]:
+    """
+    Builtins of executed submissions: imports limited to SANDBOX_ALLOWED_IMPORTS.
+    A fresh dict for every exec - changes made by one submission never reach the next one.
+    """
+    return {**vars(builtins), '__import__': _restricted_import}
 
 
 class CodeExecutionService:
-    def __init__(self):
-        self.TIMEOUT = 5
-        self.MAX_MEMORY = 100 * 1024 * 1024
+    def __init__(self, timeout=None, max_memory=None, pool=None, comparison_mode='exact', float_tolerance=None):
+        self.TIMEOUT = timeout or 5
+        self.MAX_MEMORY = max_memory or 100 * 1024 * 1024
+        self.COMPARISON_MODE = comparison_mode
+        self.FLOAT_TOLERANCE = float_tolerance
+        self._pool = pool
+
+    @classmethod
+    def for_exercise(cls, exercise, **kwargs):
+        """
+        Service using the exercise's limits (time_limit is stored in milliseconds) and comparison mode
+        """
+        return cls(
+            timeout=exercise.time_limit / 1000,
+            max_memory=exercise.memory_limit,
+            comparison_mode=exercise.comparison_mode,
+            float_tolerance=exercise.float_tolerance,
+            **kwargs
+        )
+
+    def __getstate__(self):
+        # Metody serwisu są wysyłane do procesów puli - bez samej puli
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def _run_sandboxed(self, func, *args) -> Dict[str, Any]:
+        """
+        Run func(*args) in a pre-forked grading worker with the service's limits
+        """
+        pool = self._pool or get_sandbox_pool()
+        return pool.run(func, *args, time_limit=self.TIMEOUT, memory_limit=self.MAX_MEMORY)
+
+    def _sandbox_isolated(self) -> bool:
+        """
+        Do grading workers run isolated (namespaces, read-only mounts, seccomp, no new processes)?
+        Only then the AST check is skipped.
+        """
+        if isolation_mode() == 'off':
+            return False
+        return getattr(self._pool or get_sandbox_pool(), 'isolated', False)
 
     def _validate_code(self, code: str) -> bool:
         try:
-            tree = ast.parse(code)
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.Import, ast.ImportFrom)):
-                    return False
+            return self._is_safe(ast.parse(code))
+        except SyntaxError:
+            return False
 
-                if isinstance(node, ast.Call):
-                    if isinstance(node.func, ast.Name):
-                        if node.func.id in ['eval', 'exec', 'open', '__import__', 'exit', 'quit']:
-                            return False
-                    elif isinstance(node.func, ast.Attribute):
-                        if node.func.attr in ['eval', 'exec', 'open', '__import__', 'exit', 'quit']:
+    def _is_safe(self, tree: ast.AST) -> bool:
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                return False
+
+            if isinstance(node, ast.Call):
+                if isinstance(node.func, ast.Name):
+                    if node.func.id in ['eval', 'exec', 'open', '__import__', 'exit', 'quit']:
+                        return False
+                elif isinstance(node.func, ast.Attribute):
+                    if node.func.attr in ['eval', 'exec', 'open', '__import__', 'exit', 'quit']:
+                        return False
+                    if isinstance(node.func.value, ast.Name):
+                        if node.func.value.id == 'sys' and node.func.attr == 'exit':
                             return False
-                        if isinstance(node.func.value, ast.Name):
-                            if node.func.value.id == 'sys' and node.func.attr == 'exit':
-                                return False
 
-            return True
-        except SyntaxError:
-            return False
+        return True
 
-    def execute_test_case_with_solution(self, user_code: str, correct_solution: str, test_input: str) -> Dict[str, Any]:
+    def execute_test_case_with_solution(self, user_code: str, correct_solution: str, test_input: str,
+                                        expected_output: Optional[str] = None,
+                                        parsed_input: Optional[bytes] = None) -> Dict[str, Any]:
         """
-        Compare user's code output with the correct solution's output
+        Compare user's code output with the correct solution's output.
+        When a precomputed expected_output is given the solution is not executed.
         """
-        if not self._validate_code(user_code):
-            return {
-                'success': False,
-                'error': 'Niedozwolone operacje w kodzie użytkownika'
-            }
-
-        if not self._validate_code(correct_solution):
-            return {
-                'success': False,
-                'error': 'Nieprawidłowy kod rozwiązania wzorcowego'
-            }
+        session = GradingSession(self, user_code, correct_solution if expected_output is None else None)
+        return session.run_test(test_input, expected_output, parsed_input)
 
+    def _grade(self, user_code, correct_solution, test_input: str, expected_output: Optional[str] = None,
+               parsed_input: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Execute already validated user code (and solution, if needed) and compare the outputs
+        """
         try:
             # Execute user's code
-            user_result = self._execute_code(user_code, test_input)
+            user_result = self._execute_code(user_code, test_input, parsed_input)
             if not user_result['success']:
                 return user_result
 
-            # Execute correct solution
-            solution_result = self._execute_code(correct_solution, test_input)
-            if not solution_result['success']:
-                return {
-                    'success': False,
-                    'error': 'Błąd w rozwiązaniu wzorcowym'
-                }
+            # Execute correct solution (unless its output was precomputed)
+            if expected_output is None:
+                solution_result = self._execute_code(correct_solution, test_input, parsed_input)
+                if not solution_result['success']:
+                    return {
+                        'success': False,
+                        'error': 'Błąd w rozwiązaniu wzorcowym'
+                    }
+                expected_output = solution_result['output']
 
             # Compare outputs
             user_output = user_result['output']
-            expected_output = solution_result['output']
+            compare_start = time.perf_counter()
+            passed = compare_outputs(user_output, expected_output, self.COMPARISON_MODE, self.FLOAT_TOLERANCE)
+            timings = {'execute': user_result['execution_time'], 'compare': time.perf_counter() - compare_start}
+            # Do odpowiedzi trafiają tylko skrócone wyniki - bez serializacji ogromnych struktur
+            user_output, expected_output = preview(user_output), preview(expected_output)
 
-            if str(user_output).strip() == str(expected_output).strip():
+            if passed:
                 return {
                     'success': True,
                     'output': user_output,
                     'expected_output': expected_output,
                     'execution_time': user_result['execution_time'],
-                    'stdout': user_result['stdout']
+                    'timings': timings,
+                    'stdout': preview(user_result['stdout'])
                 }
             else:
                 return {
@@ -83,7 +198,8 @@ class CodeExecutionService:
                     'expected_output': expected_output,
                     'actual_output': user_output,
                     'execution_time': user_result['execution_time'],
-                    'stdout': user_result['stdout']
+                    'timings': timings,
+                    'stdout': preview(user_result['stdout'])
                 }
 
         except Exception as e:
@@ -93,11 +209,11 @@ class CodeExecutionService:
                 'traceback': traceback.format_exc()
             }
 
-    def _execute_code(self, code: str, test_input: str) -> Dict[str, Any]:
+    def _execute_code(self, code, test_input: str, parsed_input: Optional[bytes] = None) -> Dict[str, Any]:
         """
-        Execute a piece of code with given input and return the result
+        Execute a piece of code (source or compiled code object) with given input and return the result
         """
-        local_vars = {}
+        local_vars = {'__builtins__': sandbox_builtins()}
         stdout = StringIO()
 
         try:
@@ -110,9 +226,11 @@ class CodeExecutionService:
                     'error': 'Brak funkcji solution()'
                 }
 
-            start_time = time.time()
-            result = local_vars['solution'](eval(test_input))
-            execution_time = time.time() - start_time
+            argument = load_test_input(test_input, parsed_input)
+            # Zegar monotoniczny o wysokiej rozdzielczości - time.time() może cofnąć się przy korekcie zegara
+            start_time = time.perf_counter()
+            result = local_vars['solution'](argument)
+            execution_time = time.perf_counter() - start_time
 
             return {
                 'success': True,
@@ -121,6 +239,12 @@ class CodeExecutionService:
                 'stdout': stdout.getvalue()
             }
 
+        except MemoryError:
+            # str(MemoryError()) jest pusty - użytkownik musi wiedzieć, co przekroczył
+            return {
+                'success': False,
+                'error': MEMORY_LIMIT_ERROR
+            }
         except Exception as e:
             return {
                 'success': False,
@@ -128,34 +252,113 @@ class CodeExecutionService:
                 'traceback': traceback.format_exc()
             }
 
-    def run_all_tests_with_solution(self, user_code: str, correct_solution: str, test_cases: List[Dict[str, str]]) -> Dict[str, Any]:
+    def run_all_tests_with_solution(self, user_code: str, correct_solution: str, test_cases: List[Dict[str, str]],
+                                    parallelism: int = 1, fail_fast: bool = False,
+                                    language: str = 'python') -> Dict[str, Any]:
         """
-        Run all test cases comparing user code with correct solution
+        Run all test cases comparing user code with correct solution.
+        Every test case is executed in a sandboxed worker process; results keep the order of test_cases.
         """
-        results = []
-        all_passed = True
+        results = [None] * len(test_cases)
+        timings = {}
+        for index, result in self.iter_test_results(user_code, correct_solution, test_cases, parallelism, fail_fast,
+                                                    language, timings):
+            results[index] = result
+
+        return {
+            'success': all(result['success'] for result in results),
+            'results': results,
+            'compile_time': timings.get('compile')
+        }
+
+    def iter_test_results(self, user_code: str, correct_solution: str, test_cases: List[Dict[str, str]],
+                          parallelism: int = 1, fail_fast: bool = False, language: str = 'python',
+                          timings: Optional[Dict[str, float]] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Yield (index, result) for every test case as soon as it is graded.
+        With parallelism > 1 independent test cases are fanned out across the sandbox pool
+        (bounded by its size); with fail_fast the remaining tests are skipped after the first failure.
+        Python submissions define solution(); other languages read the test input from stdin
+        and print the answer (see ProgramSession). Per-test phase timings are in result['timings'];
+        the once-per-submission compile time is stored in the timings dict, if one is given.
+        """
+        # Walidacja i kompilacja raz na zgłoszenie, nie raz na przypadek testowy
+        needs_solution = any(test_case.get('expected_output') is None for test_case in test_cases)
+        if language == 'python':
+            session = GradingSession(self, user_code, correct_solution if needs_solution else None)
+        else:
+            session = ProgramSession(self, language, user_code, correct_solution if needs_solution else None)
+        if timings is not None:
+            timings['compile'] = session.compile_time
+        failed = threading.Event()
+
+        def run(test_case):
+            if fail_fast and failed.is_set():
+                result = {
+                    'success': False,
+                    'skipped': True,
+                    'error': 'Test pominięty po wcześniejszym niepowodzeniu'
+                }
+            elif isinstance(session, ProgramSession):
+                # Program uruchamiany jako osobny proces z limitami - bez puli procesów Pythona
+                result = session.run_test(
+                    test_case['input_data'],
+                    compact_expected(test_case.get('expected_output'), self.COMPARISON_MODE),
+                    test_case.get('parsed_input')
+                )
+                if not result['success']:
+                    failed.set()
+            else:
+                result = self._run_sandboxed(
+                    session.run_test,
+                    test_case['input_data'],
+                    compact_expected(test_case.get('expected_output'), self.COMPARISON_MODE),
+                    test_case.get('parsed_input')
+                )
+                if not result['success']:
+                    failed.set()
 
-        for test_case in test_cases:
-            result = self.execute_test_case_with_solution(
-                user_code,
-                correct_solution,
-                test_case['input_data']
-            )
-            
             # Add test case info to result
             result.update({
-                'input': test_case['input_data'],
+                'input': preview(test_case['input_data']),
                 'is_hidden': test_case.get('is_hidden', False)
             })
-            
-            results.append(result)
-            if not result['success']:
-                all_passed = False
+            return result
 
-        return {
-            'success': all_passed,
-            'results': results
-        }
+        pool = self._pool or get_sandbox_pool()
+        workers = max(1, min(parallelism or 1, pool.size, len(test_cases)))
+        try:
+            if workers == 1:
+                for index, test_case in enumerate(test_cases):
+                    yield index, run(test_case)
+                return
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(run, test_case): index for index, test_case in enumerate(test_cases)}
+                try:
+                    for future in as_completed(futures):
+                        yield futures[future], future.result()
+                finally:
+                    # Odbiorca przestał czytać wyniki - nie uruchamiaj kolejnych testów
+                    for future in futures:
+                        future.cancel()
+        finally:
+            if isinstance(session, ProgramSession):
+                session.close()
+
+    def compute_expected_outputs(self, correct_solution: str, test_inputs: List[str],
+                                 parsed_inputs: Optional[List[Optional[bytes]]] = None) -> List[Optional[str]]:
+        """
+        Run the reference solution once per input and return its outputs
+        as stored in TestCase.expected_output (None where the solution failed)
+        """
+        session = GradingSession(self, correct_solution)
+        parsed_inputs = parsed_inputs or [None] * len(test_inputs)
+        outputs = []
+        for test_input, parsed_input in zip(test_inputs, parsed_inputs):
+            result = self._run_sandboxed(session.execute, test_input, parsed_input)
+            outputs.append(str(result['output']) if result['success'] else None)
+        return outputs
 
     # Keep the old methods for backward compatibility
     def execute_test_case(self, user_code: str, test_input: str, expected_output: str) -> Dict[str, Any]:
@@ -165,44 +368,16 @@ class CodeExecutionService:
                 'error': 'Niedozwolone operacje w kodzie'
             }
 
-        local_vars = {}
-        stdout = StringIO()
-
-        try:
-            with redirect_stdout(stdout):
-                exec(user_code, local_vars)
-
-            if 'solution' not in local_vars:
-                return {
-                    'success': False,
-                    'error': 'Brak funkcji solution()'
-                }
-
-            start_time = time.time()
-            result = local_vars['solution'](eval(test_input))
-            execution_time = time.time() - start_time
-
-            if str(result).strip() == str(expected_output).strip():
-                return {
-                    'success': True,
-                    'output': result,
-                    'execution_time': execution_time,
-                    'stdout': stdout.getvalue()
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f'Nieprawidłowy wynik. Oczekiwano: {expected_output}, otrzymano: {result}',
-                    'execution_time': execution_time,
-                    'stdout': stdout.getvalue()
-                }
-
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e),
-                'traceback': traceback.format_exc()
-            }
+        # Kod użytkownika wykonywany w procesie piaskownicy, nigdy w procesie serwera
+        result = self._run_sandboxed(self._execute_code, user_code, test_input)
+        if not result['success'] or str(result['output']).strip() == str(expected_output).strip():
+            return result
+        return {
+            'success': False,
+            'error': f'Nieprawidłowy wynik. Oczekiwano: {expected_output}, otrzymano: {result["output"]}',
+            'execution_time': result['execution_time'],
+            'stdout': result['stdout']
+        }
 
     def run_all_tests(self, user_code: str, test_cases: List[Dict[str, str]]) -> Dict[str, Any]:
         results = []
@@ -221,4 +396,178 @@ class CodeExecutionService:
         return {
             'success': all_passed,
             'results': results
-        }
\ No newline at end of file
+        }
+
+
+class GradingSession:
+    """
+    Validates and compiles a submission (and the reference solution) once.
+    The compiled code travels to sandbox workers as marshal bytes and is
+    reused for every test case, so a submission costs one compile plus N calls.
+    When the workers are isolated the AST check is skipped - imports are then
+    limited at run time to SANDBOX_ALLOWED_IMPORTS.
+    """
+
+    def __init__(self, service: CodeExecutionService, user_code: str, correct_solution: Optional[str] = None):
+        self.service = service
+        self._check_ast = not service._sandbox_isolated()
+        start = time.perf_counter()
+        self._user_code, self._user_error = self._compile(
+            user_code, 'Niedozwolone operacje w kodzie użytkownika'
+        )
+        self.compile_time = time.perf_counter() - start
+        self._solution, self._solution_error = None, None
+        if correct_solution is not None:
+            self._solution, self._solution_error = self._compile(
+                correct_solution, 'Nieprawidłowy kod rozwiązania wzorcowego', 'Błąd w rozwiązaniu wzorcowym'
+            )
+        self._loaded = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_loaded'] = {}
+        return state
+
+    def _compile(self, code: str, invalid_error: str, compile_error: Optional[str] = None):
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None, {'success': False, 'error': invalid_error}
+
+        if self._check_ast and not self.service._is_safe(tree):
+            return None, {'success': False, 'error': invalid_error}
+
+        try:
+            return marshal.dumps(compile(tree, '<string>', 'exec')), None
+        except (SyntaxError, ValueError) as e:
+            return None, {
+                'success': False,
+                'error': compile_error or str(e),
+                'traceback': traceback.format_exc()
+            }
+
+    def _load(self, name: str):
+        if name not in self._loaded:
+            self._loaded[name] = marshal.loads(getattr(self, name))
+        return self._loaded[name]
+
+    def execute(self, test_input: str, parsed_input: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Run the compiled user code alone and return its raw result
+        """
+        if self._user_error:
+            return dict(self._user_error)
+        return self.service._execute_code(self._load('_user_code'), test_input, parsed_input)
+
+    def run_test(self, test_input: str, expected_output: Optional[str] = None,
+                 parsed_input: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Grade a single test case with the precompiled code
+        """
+        if self._user_error:
+            return dict(self._user_error)
+
+        solution = None
+        if expected_output is None:
+            if self._solution_error:
+                return dict(self._solution_error)
+            if self._solution is None:
+                return {
+                    'success': False,
+                    'error': 'Nieprawidłowy kod rozwiązania wzorcowego'
+                }
+            solution = self._load('_solution')
+
+        return self.service._grade(self._load('_user_code'), solution, test_input, expected_output, parsed_input)
+
+
+class ProgramSession:
+    """
+    Submission in any registered non-Python language, graded through stdin/stdout:
+    the program reads the test input from stdin and prints its answer. It is compiled
+    once (through the artifact cache) into a private directory and that artifact is
+    run for every test case under the exercise's time and memory limits. Expected outputs
+    missing from the test cases come from the Python reference solution.
+
+    The program runs as a plain child process, without the isolation layers of the Python
+    grading workers (namespaces, read-only mounts, seccomp) - only rlimits apply.
+    """
+
+    def __init__(self, service: CodeExecutionService, language: str, user_code: str,
+                 correct_solution: Optional[str] = None):
+        self.service = service
+        self.language = language
+        self._workdir = tempfile.mkdtemp(prefix='grading_')
+        self._command, self._error = None, None
+        start = time.perf_counter()
+        try:
+            self._command = registry.prepare(language, user_code, self._workdir)
+        except (LanguageUnavailable, CompilationError, RunnerBusy) as e:
+            self._error = {'success': False, 'error': str(e)}
+        self.compile_time = time.perf_counter() - start
+        self._reference = GradingSession(service, correct_solution) if correct_solution is not None else None
+
+    def _expected_output(self, test_input: str, parsed_input: Optional[bytes]) -> Dict[str, Any]:
+        if self._reference is None:
+            return {'success': False, 'error': 'Nieprawidłowy kod rozwiązania wzorcowego'}
+        result = self.service._run_sandboxed(self._reference.execute, test_input, parsed_input)
+        if not result['success']:
+            return {'success': False, 'error': 'Błąd w rozwiązaniu wzorcowym'}
+        return {'success': True, 'output': str(result['output'])}
+
+    def run_test(self, test_input: str, expected_output: Optional[str] = None,
+                 parsed_input: Optional[bytes] = None) -> Dict[str, Any]:
+        if self._error:
+            return dict(self._error)
+
+        if expected_output is None:
+            expected = self._expected_output(test_input, parsed_input)
+            if not expected['success']:
+                return expected
+            expected_output = expected['output']
+
+        try:
+            result = execute(
+                self._command,
+                cwd=self._workdir,
+                # Wejście zapisane w pliku podawane programowi bezpośrednio
+                stdin=None if isinstance(test_input, BlobRef) else test_input,
+                stdin_path=test_input.path if isinstance(test_input, BlobRef) else None,
+                timeout=self.service.TIMEOUT,
+                cpu_time=math.ceil(self.service.TIMEOUT),
+                memory_limit=self.service.MAX_MEMORY
+            )
+        except RunnerBusy as e:
+            return {'success': False, 'error': str(e)}
+
+        if result['timed_out']:
+            return {'success': False, 'error': 'Przekroczono limit czasu wykonania'}
+        if result['returncode'] != 0:
+            return {
+                'success': False,
+                'error': result['stderr'] or f'Program zakończył się kodem {result["returncode"]}',
+                'execution_time': result['wall_time']
+            }
+
+        compare_start = time.perf_counter()
+        passed = compare_outputs(result['stdout'], expected_output, self.service.COMPARISON_MODE,
+                                 self.service.FLOAT_TOLERANCE)
+        user_output = preview(result['stdout'].strip())
+        base = {
+            'expected_output': preview(expected_output),
+            'execution_time': result['wall_time'],
+            'timings': {'execute': result['wall_time'], 'compare': time.perf_counter() - compare_start},
+            'stdout': preview(result['stdout']),
+            'peak_memory': result['peak_rss']
+        }
+        if passed:
+            return {'success': True, 'output': user_output, **base}
+        return {
+            'success': False,
+            'error': f'Nieprawidłowy wynik. Oczekiwano: {base["expected_output"]}, otrzymano: {user_output}',
+            'actual_output': user_output,
+            **base
+        }
+
+    def close(self):
+        shutil.rmtree(self._workdir, ignore_errors=True)
@@ -0,0 +1,181 @@
+import ast
+import hashlib
+import math
+import reprlib
+from typing import Any, Optional, Tuple
+from .blobs import BlobRef, blob_digest
+
+
+COMPARISON_MODES = [
+    ('exact', 'Exact text'),
+    ('structural', 'Structural equality'),
+    ('float', 'Float tolerance'),
+    ('unordered', 'Unordered collections')
+]
+DEFAULT_FLOAT_TOLERANCE = 1e-6
+# Oczekiwane wyniki dłuższe niż próg (znaki) trafiają do procesów oceniających jako skrót
+LARGE_OUTPUT = 64 * 1024
+# Maksymalna długość wyniku w komunikacie o błędzie i w odpowiedzi API
+PREVIEW_LENGTH = 500
+
+_preview_repr = reprlib.Repr()
+_preview_repr.maxlevel = 4
+_preview_repr.maxstring = PREVIEW_LENGTH
+_preview_repr.maxother = PREVIEW_LENGTH
+_preview_repr.maxlong = PREVIEW_LENGTH
+for _attr in ('maxtuple', 'maxlist', 'maxarray', 'maxdict', 'maxset', 'maxfrozenset', 'maxdeque'):
+    setattr(_preview_repr, _attr, 50)
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class ExpectedDigest:
+    """
+    Stand-in for a large expected output in exact mode: its length (UTF-8 bytes), digest and a short preview.
+    Workers compare the digest instead of receiving (and comparing) the whole text.
+    """
+    __slots__ = ('length', 'digest', 'preview')
+
+    def __init__(self, text: str):
+        encoded = text.strip().encode('utf-8', 'surrogatepass')
+        self.length = len(encoded)
+        self.digest = _digest(encoded)
+        self.preview = truncate(text.strip())
+
+    @classmethod
+    def from_blob(cls, blob: BlobRef) -> 'ExpectedDigest':
+        expected = cls.__new__(cls)
+        expected.length, expected.digest = blob_digest(blob.key)
+        expected.preview = preview(blob)
+        return expected
+
+    def __getstate__(self):
+        return self.length, self.digest, self.preview
+
+    def __setstate__(self, state):
+        self.length, self.digest, self.preview = state
+
+    def __str__(self):
+        return self.preview
+
+
+def compact_expected(expected_output: Optional[str], mode: str = 'exact'):
+    """
+    Expected output in the form shipped to the grading workers
+    """
+    if mode == 'exact' and isinstance(expected_output, str) and len(expected_output) > LARGE_OUTPUT:
+        return ExpectedDigest(expected_output)
+    if mode == 'exact' and isinstance(expected_output, BlobRef) and expected_output.size > LARGE_OUTPUT:
+        return ExpectedDigest.from_blob(expected_output)
+    # Pozostałe pliki procesy oceniające czytają same
+    return expected_output
+
+
+def truncate(text: str, limit: int = PREVIEW_LENGTH) -> str:
+    if len(text) <= limit:
+        return text
+    return f'{text[:limit]}... ({len(text)} znaków)'
+
+
+def preview(value: Any) -> Any:
+    """
+    Value safe to put into a response: small values unchanged, large ones as a truncated
+    repr built without stringifying the whole object
+    """
+    if isinstance(value, ExpectedDigest):
+        return value.preview
+    if isinstance(value, BlobRef):
+        size = value.size
+        head = value.head(PREVIEW_LENGTH)
+        return head if len(head) == size else f'{head}... ({size} bajtów)'
+    if isinstance(value, str):
+        return truncate(value)
+    if value is None or isinstance(value, (bool, float)):
+        return value
+    bounded = _preview_repr.repr(value)
+    if len(bounded) < PREVIEW_LENGTH and '...' not in bounded:
+        return value
+    return truncate(bounded)
+
+
+def _text(value: Any) -> str:
+    return (value if isinstance(value, str) else str(value)).strip()
+
+
+def _parse(value: Any) -> Tuple[Any, bool]:
+    # Oczekiwane wyniki są zapisywane jako str(wynik), a programy w innych językach wypisują tekst
+    if not isinstance(value, str):
+        return value, True
+    try:
+        return ast.literal_eval(value.strip()), True
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return value, False
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _sorted(items):
+    try:
+        return sorted(items)
+    except TypeError:
+        # Elementy różnych typów - porządek według repr
+        return sorted(items, key=repr)
+
+
+def _equal(actual: Any, expected: Any, tolerance: Optional[float], unordered: bool) -> bool:
+    if tolerance is not None and _is_number(actual) and _is_number(expected) and (
+        isinstance(actual, float) or isinstance(expected, float)
+    ):
+        return math.isclose(actual, expected, rel_tol=tolerance, abs_tol=tolerance)
+
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        return actual.keys() == expected.keys() and all(
+            _equal(actual[key], expected[key], tolerance, unordered) for key in expected
+        )
+
+    if isinstance(actual, (list, tuple)) and type(actual) is type(expected):
+        if len(actual) != len(expected):
+            return False
+        if unordered:
+            actual, expected = _sorted(actual), _sorted(expected)
+        return all(_equal(a, e, tolerance, unordered) for a, e in zip(actual, expected))
+
+    if tolerance is not None and isinstance(actual, (set, frozenset)) and isinstance(expected, (set, frozenset)):
+        return len(actual) == len(expected) and _equal(_sorted(actual), _sorted(expected), tolerance, False)
+
+    return actual == expected
+
+
+def compare_outputs(actual: Any, expected: Any, mode: str = 'exact',
+                    tolerance: Optional[float] = None) -> bool:
+    """
+    Does the submission's output match the expected one under the exercise's comparison mode:
+    exact - text of both values after strip() (large expected outputs by digest),
+    structural - equal values (dict/set order does not matter),
+    float - like structural, floats compared with the given tolerance,
+    unordered - like structural, lists and tuples compared as multisets.
+    Text that is not a Python literal is compared exactly in every mode.
+    """
+    if isinstance(expected, ExpectedDigest):
+        encoded = _text(actual).encode('utf-8', 'surrogatepass')
+        return len(encoded) == expected.length and _digest(encoded) == expected.digest
+    if isinstance(expected, BlobRef):
+        expected = expected.read_text()
+
+    if mode == 'exact':
+        return _text(actual) == _text(expected)
+
+    expected_value, parsed = _parse(expected)
+    actual_value, actual_parsed = _parse(actual)
+    if not (parsed and actual_parsed):
+        return _text(actual) == _text(expected)
+    return _equal(
+        actual_value,
+        expected_value,
+        (DEFAULT_FLOAT_TOLERANCE if tolerance is None else tolerance) if mode == 'float' else None,
+        mode == 'unordered'
+    )
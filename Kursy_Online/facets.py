@@ -0,0 +1,148 @@
+import time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, QuerySet
+from .models import Course, Technology
+
+
+VERSION_KEY = 'course-facets:version'
+# Pola prowadzącego w fasecie - bez adresu e-mail, telefonu i salda
+INSTRUCTOR_FIELDS = ('instructor_id', 'instructor__username', 'instructor__first_name', 'instructor__last_name')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    return caches[_setting('FACETS_CACHE', 'default')]
+
+
+def facets_version() -> int:
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Licznik startuje od bieżącego czasu - po wyczyszczeniu cache nie wrócą stare numery wersji
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump():
+    try:
+        _cache().incr(VERSION_KEY)
+    except ValueError:
+        facets_version()
+
+
+def invalidate_facets():
+    """
+    Move to a new facets version; entries cached under older versions simply expire
+    """
+    _bump()
+    # Ponownie po zatwierdzeniu - fasety policzone w trakcie transakcji widziały jeszcze stare dane
+    transaction.on_commit(_bump)
+
+
+def compute_facets() -> Dict[str, Any]:
+    """
+    Filter values for the course catalog. Price range and instructors come from a single
+    pass over courses grouped by instructor, technologies from one query.
+    """
+    instructors, prices = [], []
+    rows = Course.objects.values(*INSTRUCTOR_FIELDS).annotate(min_price=Min('price'), max_price=Max('price'))
+    for row in rows.order_by('instructor__username'):
+        instructors.append({
+            'id': row['instructor_id'],
+            'username': row['instructor__username'],
+            'first_name': row['instructor__first_name'],
+            'last_name': row['instructor__last_name']
+        })
+        prices.extend((row['min_price'], row['max_price']))
+
+    return {
+        'levels': dict(Course.LEVEL_CHOICES),
+        'technologies': list(Technology.objects.order_by('name').values('id', 'name', 'description')),
+        'price_range': {
+            'min': min(prices) if prices else None,
+            'max': max(prices) if prices else None
+        },
+        'instructors': instructors
+    }
+
+
+def get_facets() -> Tuple[int, Dict[str, Any]]:
+    """
+    (version, facets) - computed at most once per version
+    """
+    version = facets_version()
+    key = f'course-facets:{version}'
+    cache = _cache()
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets()
+        cache.set(key, facets, _setting('FACETS_CACHE_TIMEOUT', 24 * 3600))
+    return version, facets
+
+
+def price_buckets() -> List[Tuple[Decimal, Optional[Decimal]]]:
+    """
+    [from, to) price ranges for facet counts; the last one is open-ended
+    """
+    bounds = [Decimal(str(bound)) for bound in _setting('COURSE_PRICE_BUCKETS', [0, 50, 100, 200, 500])]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def _bucket_filter(start, end) -> Q:
+    condition = Q(price__gte=start)
+    return condition & Q(price__lt=end) if end is not None else condition
+
+
+def facet_counts(queryset: QuerySet, active: Dict[str, Q]) -> Dict[str, Any]:
+    """
+    Number of courses of the queryset per level, technology and price bucket.
+
+    queryset has every filter applied except the faceted ones, given separately in
+    active ({'level' | 'technologies' | 'price': Q}). Each facet is counted with all the
+    other active facet filters but without its own, so the counts show what selecting
+    a different value would return. Everything is one query: a conditional COUNT per
+    facet value over the matching courses joined with their technologies.
+    """
+    def others(name):
+        condition = Q()
+        for facet, facet_filter in active.items():
+            if facet != name:
+                condition &= facet_filter
+        return condition
+
+    _, facets = get_facets()
+    levels = [level for level, _ in Course.LEVEL_CHOICES]
+    buckets = price_buckets()
+    technologies = facets['technologies']
+
+    aggregates = {}
+    for index, level in enumerate(levels):
+        aggregates[f'level_{index}'] = Count('pk', distinct=True, filter=Q(level=level) & others('level'))
+    for index, (start, end) in enumerate(buckets):
+        aggregates[f'price_{index}'] = Count('pk', distinct=True, filter=_bucket_filter(start, end) & others('price'))
+    for technology in technologies:
+        aggregates[f'technology_{technology["id"]}'] = Count(
+            'pk', distinct=True, filter=Q(technologies__id=technology['id']) & others('technologies')
+        )
+
+    # Podzapytanie zamiast agregacji na queryset - ten może mieć distinct() i złączenia widoczności
+    counts = Course.objects.filter(pk__in=queryset.values('pk')).aggregate(**aggregates)
+    return {
+        'levels': {level: counts[f'level_{index}'] for index, level in enumerate(levels)},
+        'technologies': [
+            {'id': technology['id'], 'name': technology['name'], 'count': counts[f'technology_{technology["id"]}']}
+            for technology in technologies
+        ],
+        'price': [
+            {'min': start, 'max': end, 'count': counts[f'price_{index}']}
+            for index, (start, end) in enumerate(buckets)
+        ]
+    }
@@ -0,0 +1,460 @@
+import builtins
+import os
+import pickle
+import select
+import shutil
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows - gniazda Unix i fork() niedostępne
+    resource = None
+
+from django.conf import settings
+from .runner import process_slot
+from .sandbox import WALL_CLOCK_GRACE, _apply_limits, run_job
+
+
+# Moduły ładowane raz w serwerze - procesy potomne dziedziczą je po fork() bez kosztu importu
+PRELOAD_MODULES = [
+    'collections', 'functools', 'itertools', 'heapq', 'bisect', 'math', 'random',
+    'string', 're', 'json', 'datetime', 'decimal', 'fractions', 'statistics',
+    'Kursy_Online.code_execution'
+]
+
+HEADER = struct.Struct('!I')
+# Czas na przesłanie zlecenia po połączeniu - wolny klient nie blokuje pętli serwera
+REQUEST_TIMEOUT = 5
+
+
+class ForkServerUnavailable(RuntimeError):
+    pass
+
+
+def send_message(sock: socket.socket, message: Any):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise EOFError()
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Any:
+    size, = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+def _read_capped(handle, limit: int):
+    handle.seek(0, os.SEEK_END)
+    size = handle.tell()
+    handle.seek(0)
+    return handle.read(limit).decode('utf-8', errors='replace'), size > limit
+
+
+def _run_script(source: str):
+    """
+    Body of a script job in the forked child: run source as __main__ with
+    stdout/stderr already redirected to the capture files, then exit
+    """
+    exit_code = 0
+    try:
+        code = compile(source, 'program.py', 'exec')
+        exec(code, {'__name__': '__main__', '__builtins__': builtins})
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            exit_code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Bez ramek serwera - ślad stosu jak przy `python program.py`
+        tb = e.__traceback__.tb_next if e.__traceback__ else None
+        traceback.print_exception(type(e), e, tb)
+        exit_code = 1
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    os._exit(exit_code)
+
+
+class ForkServer:
+    """
+    Daemon that imports the Python runtime once and fork()s a child per job.
+    Clients talk to it over a Unix socket (length-prefixed pickles), so a run
+    costs a fork instead of an interpreter start. The main loop is single
+    threaded: it accepts jobs, reaps children and kills those past their deadline.
+    Requests are read without blocking as their bytes arrive, so a slow or stuck
+    client delays only its own job.
+    """
+
+    def __init__(self, socket_path: str, max_children: Optional[int] = None):
+        self.socket_path = str(socket_path)
+        self.max_children = max_children or getattr(settings, 'FORKSERVER_MAX_CHILDREN', None) or os.cpu_count() or 2
+        self._children = {}
+        # Połączenia, z których zlecenie nie zostało jeszcze odczytane w całości
+        self._pending = {}
+        self._stopping = False
+
+    def preload(self):
+        for module in PRELOAD_MODULES:
+            __import__(module)
+
+    def serve_forever(self):
+        self.preload()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        # Tylko użytkownik serwera może zlecać zadania
+        os.chmod(self.socket_path, 0o600)
+        listener.listen(128)
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        # SIGCHLD budzi pętlę przez potok, żeby wyniki zakończonych procesów odsyłać od razu
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        signal.set_wakeup_fd(self._wakeup_w)
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        try:
+            while not self._stopping:
+                timeout = self._next_timeout()
+                readable = [self._wakeup_r] + list(self._pending)
+                if len(self._children) + len(self._pending) < self.max_children:
+                    readable.append(listener)
+                ready, _, _ = select.select(readable, [], [], timeout)
+                if self._wakeup_r in ready:
+                    try:
+                        os.read(self._wakeup_r, 4096)
+                    except BlockingIOError:
+                        pass
+                for conn in ready:
+                    if conn in self._pending:
+                        self._read_request(conn, listener)
+                if listener in ready:
+                    self._accept(listener)
+                self._reap()
+                self._kill_overdue()
+                self._drop_stale_requests()
+        finally:
+            signal.set_wakeup_fd(-1)
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
+            listener.close()
+            for conn in self._pending:
+                conn.close()
+            for pid in list(self._children):
+                self._kill(pid)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def _next_timeout(self) -> float:
+        timeout = 0.5
+        now = time.monotonic()
+        deadlines = [child['deadline'] for child in self._children.values()]
+        deadlines += [pending['deadline'] for pending in self._pending.values()]
+        for deadline in deadlines:
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - now))
+        return timeout
+
+    def _accept(self, listener: socket.socket):
+        try:
+            conn, _ = listener.accept()
+        except OSError:
+            return
+        conn.setblocking(False)
+        self._pending[conn] = {'data': bytearray(), 'deadline': time.monotonic() + REQUEST_TIMEOUT}
+
+    def _read_request(self, conn: socket.socket, listener: socket.socket):
+        """
+        Read what has arrived of a request; once the whole message is in, start the job
+        """
+        data = self._pending[conn]['data']
+        try:
+            chunk = conn.recv(1024 * 1024)
+        except BlockingIOError:
+            return
+        except OSError:
+            chunk = b''
+        if not chunk:
+            del self._pending[conn]
+            conn.close()
+            return
+        data.extend(chunk)
+        if len(data) < HEADER.size:
+            return
+        size, = HEADER.unpack_from(data)
+        if len(data) < HEADER.size + size:
+            return
+
+        del self._pending[conn]
+        try:
+            job = pickle.loads(bytes(data[HEADER.size:HEADER.size + size]))
+        except Exception:
+            conn.close()
+            return
+        conn.setblocking(True)
+        self._start(conn, job, listener)
+
+    def _drop_stale_requests(self):
+        now = time.monotonic()
+        for conn in [conn for conn, pending in self._pending.items() if now >= pending['deadline']]:
+            del self._pending[conn]
+            conn.close()
+
+    def _start(self, conn: socket.socket, job: Dict[str, Any], listener: socket.socket):
+        kind = job['kind']
+        timeout = job.get('timeout')
+        child = {
+            'conn': conn,
+            'kind': kind,
+            'killed': False,
+            'deadline': time.monotonic() + timeout if timeout else None,
+            'output_limit': job.get('output_limit'),
+            'workdir': None,
+            'stdout': None,
+            'stderr': None
+        }
+        if kind == 'script':
+            child['workdir'] = tempfile.mkdtemp(prefix='run_code_')
+            child['stdout'] = tempfile.TemporaryFile(dir=child['workdir'])
+            child['stderr'] = tempfile.TemporaryFile(dir=child['workdir'])
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                listener.close()
+                for other in self._children.values():
+                    other['conn'].close()
+                for other in self._pending:
+                    other.close()
+                signal.set_wakeup_fd(-1)
+                os.close(self._wakeup_r)
+                os.close(self._wakeup_w)
+                for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                    signal.signal(signum, signal.SIG_DFL)
+                # Własna grupa procesów - zabijana w całości po przekroczeniu czasu
+                os.setsid()
+                if kind == 'script':
+                    self._child_script(job, child)
+                else:
+                    result = run_job(job['func'], job['args'], job.get('time_limit'), job.get('memory_limit'))
+                    send_message(conn, result)
+            finally:
+                os._exit(0)
+
+        self._children[pid] = child
+
+    def _child_script(self, job: Dict[str, Any], child: Dict[str, Any]):
+        os.chdir(child['workdir'])
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(child['stdout'].fileno(), 1)
+        os.dup2(child['stderr'].fileno(), 2)
+        if resource is not None:
+            if job.get('cpu_time'):
+                resource.setrlimit(resource.RLIMIT_CPU, (job['cpu_time'], job['cpu_time'] + 1))
+            if job.get('memory_limit'):
+                _apply_limits(None, job['memory_limit'])
+            if job.get('output_limit'):
+                # Zapis ponad limit kończy się błędem zamiast zapełniać dysk
+                signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+                resource.setrlimit(resource.RLIMIT_FSIZE, (job['output_limit'] + 1, job['output_limit'] + 1))
+        _run_script(job['source'])
+
+    def _kill(self, pid: int):
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, child in self._children.items():
+            if not child['killed'] and child['deadline'] is not None and now >= child['deadline']:
+                child['killed'] = True
+                self._kill(pid)
+
+    def _reap(self):
+        while self._children:
+            try:
+                pid, status, usage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            child = self._children.pop(pid, None)
+            if child is None:
+                continue
+            # Procesy pozostawione w tle przez program kończą się razem z nim
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            try:
+                self._finish(child, os.waitstatus_to_exitcode(status), usage)
+            except OSError:
+                pass
+            finally:
+                child['conn'].close()
+                for name in ('stdout', 'stderr'):
+                    if child[name] is not None:
+                        child[name].close()
+                if child['workdir']:
+                    shutil.rmtree(child['workdir'], ignore_errors=True)
+
+    def _finish(self, child: Dict[str, Any], exit_code: int, usage):
+        if child['kind'] == 'script':
+            limit = child['output_limit'] or 64 * 1024
+            stdout, stdout_truncated = _read_capped(child['stdout'], limit)
+            stderr, stderr_truncated = _read_capped(child['stderr'], limit)
+            send_message(child['conn'], {
+                'returncode': exit_code,
+                'stdout': stdout,
+                'stderr': stderr,
+                'timed_out': child['killed'] or (hasattr(signal, 'SIGXCPU') and exit_code == -signal.SIGXCPU),
+                'truncated': stdout_truncated or stderr_truncated,
+                'cpu_time': usage.ru_utime + usage.ru_stime,
+                'peak_rss': usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+            })
+        elif child['killed']:
+            send_message(child['conn'], {
+                'success': False,
+                'error': 'Przekroczono limit czasu wykonania'
+            })
+        elif exit_code != 0:
+            send_message(child['conn'], {
+                'success': False,
+                'error': 'Proces oceniający został przerwany (przekroczono limit czasu lub pamięci)'
+            })
+
+
+class ForkServerClient:
+    """
+    Client side of ForkServer. Exposes the SandboxPool interface (run/size/pid/shutdown),
+    so CodeExecutionService can use it transparently; jobs fall back to the local
+    pre-forked pool when the server is not running.
+    """
+
+    # Procesy serwera nie są izolowane przestrzeniami nazw - kod przechodzi walidację AST
+    isolated = False
+
+    def __init__(self, socket_path: str, size: Optional[int] = None, fallback=None):
+        self.socket_path = str(socket_path)
+        self.size = size or getattr(settings, 'FORKSERVER_MAX_CHILDREN', None) or os.cpu_count() or 2
+        self.pid = os.getpid()
+        self._fallback = fallback
+
+    def available(self) -> bool:
+        return os.path.exists(self.socket_path)
+
+    def _request(self, job: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        except (AttributeError, OSError) as e:
+            raise ForkServerUnavailable(str(e))
+        try:
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                raise ForkServerUnavailable(str(e))
+            # Serwer sam pilnuje limitu czasu - tu tylko zabezpieczenie przed zawieszeniem
+            sock.settimeout(timeout + 2 * WALL_CLOCK_GRACE if timeout else None)
+            send_message(sock, job)
+            try:
+                return recv_message(sock)
+            except (EOFError, ConnectionError):
+                return {
+                    'success': False,
+                    'error': 'Proces oceniający został przerwany (przekroczono limit czasu lub pamięci)'
+                }
+        finally:
+            sock.close()
+
+    def run(self, func: Callable[..., Dict[str, Any]], *args,
+            time_limit: Optional[float] = None, memory_limit: Optional[int] = None) -> Dict[str, Any]:
+        job = {
+            'kind': 'call',
+            'func': func,
+            'args': args,
+            'time_limit': time_limit,
+            'memory_limit': memory_limit,
+            'timeout': time_limit + WALL_CLOCK_GRACE if time_limit else None
+        }
+        try:
+            return self._request(job, job['timeout'])
+        except socket.timeout:
+            return {
+                'success': False,
+                'error': 'Przekroczono limit czasu wykonania'
+            }
+        except ForkServerUnavailable:
+            if self._fallback is None:
+                raise
+            return self._fallback().run(func, *args, time_limit=time_limit, memory_limit=memory_limit)
+
+    def run_script(self, source: str, timeout: Optional[float] = None, cpu_time: Optional[int] = None,
+                   memory_limit: Optional[int] = None, output_limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run a whole Python program; returns the same fields as runner.execute().
+        Like execute(), the run holds one of the host-wide RUNNER_MAX_PROCESSES slots
+        (RunnerBusy when none frees up in time).
+        """
+        timeout = getattr(settings, 'RUNNER_TIMEOUT', 10) if timeout is None else timeout
+        job = {
+            'kind': 'script',
+            'source': source,
+            'timeout': timeout,
+            'cpu_time': getattr(settings, 'RUNNER_CPU_TIME', 5) if cpu_time is None else cpu_time,
+            'memory_limit': memory_limit,
+            'output_limit': getattr(settings, 'RUNNER_OUTPUT_LIMIT', 64 * 1024) if output_limit is None else output_limit
+        }
+        start = time.monotonic()
+        with process_slot():
+            try:
+                result = self._request(job, timeout)
+            except socket.timeout:
+                # Serwer nie odesłał wyniku mimo własnego limitu - jak przekroczenie czasu w execute()
+                result = {
+                    'returncode': None,
+                    'stdout': '',
+                    'stderr': '',
+                    'timed_out': True,
+                    'truncated': False,
+                    'cpu_time': None,
+                    'peak_rss': None
+                }
+        if 'returncode' not in result:
+            raise ForkServerUnavailable(result.get('error', ''))
+        result['wall_time'] = time.monotonic() - start
+        return result
+
+    def shutdown(self):
+        pass
@@ -0,0 +1,365 @@
+import datetime
+import hashlib
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from .admission import charge_cpu_time, execution_key
+from .code_execution import CodeExecutionService, solution_hash
+from .models import CodingExercise, GradingJob, Submission, UserProgress
+from .telemetry import record_grading_timings, test_phase_timings
+
+
+def build_test_cases(coding_exercise):
+    """
+    Test cases of the exercise in the format expected by CodeExecutionService
+    """
+    current_solution_hash = solution_hash(coding_exercise.solution)
+    return [
+        {
+            # Duże wejścia i wyniki jako BlobRef - procesy oceniające czytają pliki same
+            'input_data': test.grading_input(),
+            'is_hidden': test.is_hidden,
+            # Wejście sparsowane przy zapisie
+            'parsed_input': test.grading_parsed_input(),
+            # Wynik wpisany przez prowadzącego albo wyliczony przy zapisie, o ile rozwiązanie się nie zmieniło
+            'expected_output': test.expected_output_for(current_solution_hash)
+        }
+        for test in coding_exercise.test_cases.all()
+    ]
+
+
+def format_test_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    test_result = {
+        'passed': result['success'],
+        'input': result.get('input', ''),
+        'is_hidden': result.get('is_hidden', False),
+        'error': result.get('error', None)
+    }
+
+    # Only show expected/actual for visible test cases
+    if not result.get('is_hidden', False):
+        test_result['expected_output'] = result.get('expected_output', '')
+        # Wynik niezaliczonego testu jest w 'actual_output'
+        test_result['actual_output'] = result.get('output', result.get('actual_output', ''))
+
+    return test_result
+
+
+def mark_completed(user, page):
+    UserProgress.objects.update_or_create(
+        user=user,
+        page=page,
+        defaults={
+            'completed': True,
+            'completed_at': timezone.now()
+        }
+    )
+
+
+def exercise_version(coding_exercise: CodingExercise) -> str:
+    """
+    Hash of everything that decides a verdict apart from the submitted code:
+    reference solution, limits and the test set. Changes whenever any of them is edited.
+    """
+    state = {
+        'solution': solution_hash(coding_exercise.solution),
+        'time_limit': coding_exercise.time_limit,
+        'memory_limit': coding_exercise.memory_limit,
+        'fail_fast': coding_exercise.fail_fast,
+        'comparison': [coding_exercise.comparison_mode, coding_exercise.float_tolerance],
+        'tests': [
+            [test.id, test.input_blob or test.input_data, test.is_hidden, test.order,
+             # Wyniki wyliczone wynikają z rozwiązania, wpisane przez prowadzącego są częścią testu
+             (test.expected_output_blob or test.expected_output) if test.manual_expected_output else None]
+            for test in coding_exercise.test_cases.all()
+        ]
+    }
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def to_json(data: Any) -> Any:
+    """
+    Data stored in JSONFields - same encoding rules as API responses
+    """
+    return json.loads(json.dumps(data, cls=JSONEncoder))
+
+
+def find_cached_verdict(coding_exercise: CodingExercise, code_hash: str, version: str,
+                        language: str = 'python') -> Optional[Submission]:
+    """
+    Earlier graded submission of byte-identical code against the same exercise version
+    """
+    return Submission.objects.filter(
+        exercise=coding_exercise,
+        code_hash=code_hash,
+        exercise_version=version,
+        language=language,
+        cached=False
+    ).order_by('-created_at').first()
+
+
+def record_submission(user, coding_exercise: CodingExercise, user_code: str, language: str, version: str,
+                      verdict: Dict[str, Any], raw_results=(), cached_from: Optional[Submission] = None,
+                      compile_time: Optional[float] = None) -> Submission:
+    if cached_from is not None:
+        test_timings, peak_memory = cached_from.test_timings, cached_from.peak_memory
+        compile_time = cached_from.compile_time
+    else:
+        test_timings = test_phase_timings(raw_results)
+        memory = [timings['peak_memory'] for timings in test_timings if timings['peak_memory'] is not None]
+        peak_memory = max(memory) if memory else None
+        record_grading_timings(coding_exercise, test_timings, compile_time)
+        # Czas testów wliczany do limitu czasu procesora użytkownika (werdykt z cache nic nie kosztuje)
+        charge_cpu_time(execution_key(user), (compile_time or 0) + sum(
+            timings.get('execute') or 0 for timings in test_timings
+        ))
+
+    return Submission.objects.create(
+        user=user,
+        exercise=coding_exercise,
+        code=user_code,
+        code_hash=solution_hash(user_code),
+        language=language,
+        exercise_version=version,
+        passed=verdict['success'],
+        result=verdict if cached_from is None else cached_from.result,
+        test_timings=test_timings,
+        compile_time=compile_time,
+        peak_memory=peak_memory,
+        cached=cached_from is not None
+    )
+
+
+def grade_code(coding_exercise: CodingExercise, user_code: str, language: str = 'python',
+               test_cases: Optional[List[Dict[str, Any]]] = None, parallelism: Optional[int] = None):
+    """
+    Run user code against the exercise's tests; returns (verdict formatted for the frontend,
+    raw results of CodeExecutionService.run_all_tests_with_solution)
+    """
+    executor = CodeExecutionService.for_exercise(coding_exercise)
+    results = executor.run_all_tests_with_solution(
+        user_code,
+        coding_exercise.solution,
+        test_cases if test_cases is not None else build_test_cases(coding_exercise),
+        parallelism=coding_exercise.parallel_tests if parallelism is None else parallelism,
+        fail_fast=coding_exercise.fail_fast,
+        language=language
+    )
+    formatted_results = to_json({
+        'success': results['success'],
+        'test_results': [format_test_result(result) for result in results['results']]
+    })
+    return formatted_results, results
+
+
+def grade_submission(user, coding_exercise: CodingExercise, user_code: str, language: str = 'python') -> Dict[str, Any]:
+    """
+    Grade user code against all test cases of the exercise and return results
+    formatted for the frontend. Marks the page as completed when every test passes.
+    Byte-identical code against an unchanged exercise reuses the stored verdict.
+    """
+    version = exercise_version(coding_exercise)
+    cached = find_cached_verdict(coding_exercise, solution_hash(user_code), version, language)
+    if cached is not None:
+        formatted_results = cached.result
+        record_submission(user, coding_exercise, user_code, language, version, formatted_results, cached_from=cached)
+    else:
+        formatted_results, results = grade_code(coding_exercise, user_code, language)
+        record_submission(user, coding_exercise, user_code, language, version, formatted_results, results['results'],
+                          compile_time=results.get('compile_time'))
+
+    if formatted_results['success']:
+        mark_completed(user, coding_exercise.page)
+
+    return formatted_results
+
+
+def iter_submission_results(user, coding_exercise: CodingExercise, user_code: str,
+                            language: str = 'python') -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of grade_submission: yields every test result as soon as it is graded
+    (with its index, since parallel tests finish out of order) and a final summary.
+    """
+    version = exercise_version(coding_exercise)
+    cached = find_cached_verdict(coding_exercise, solution_hash(user_code), version, language)
+    if cached is not None:
+        for index, test_result in enumerate(cached.result['test_results']):
+            yield {'type': 'test', 'index': index, **test_result}
+        record_submission(user, coding_exercise, user_code, language, version, cached.result, cached_from=cached)
+        if cached.passed:
+            mark_completed(user, coding_exercise.page)
+        yield {'type': 'summary', 'success': cached.passed, 'total': len(cached.result['test_results'])}
+        return
+
+    executor = CodeExecutionService.for_exercise(coding_exercise)
+    test_cases = build_test_cases(coding_exercise)
+    results = [None] * len(test_cases)
+    timings = {}
+
+    for index, result in executor.iter_test_results(
+        user_code,
+        coding_exercise.solution,
+        test_cases,
+        parallelism=coding_exercise.parallel_tests,
+        fail_fast=coding_exercise.fail_fast,
+        language=language,
+        timings=timings
+    ):
+        results[index] = result
+        yield {'type': 'test', 'index': index, **to_json(format_test_result(result))}
+
+    all_passed = all(result['success'] for result in results)
+    verdict = {
+        'success': all_passed,
+        'test_results': to_json([format_test_result(result) for result in results])
+    }
+    record_submission(user, coding_exercise, user_code, language, version, verdict, results,
+                      compile_time=timings.get('compile'))
+
+    if all_passed:
+        mark_completed(user, coding_exercise.page)
+
+    yield {'type': 'summary', 'success': all_passed, 'total': len(test_cases)}
+
+
+# Co ile sekund grading_worker zapisuje postęp oceniania, a strumień wyników go odczytuje
+PROGRESS_FLUSH_INTERVAL = 0.2
+
+
+def enqueue_grading_job(user, page, code: str, language: str = 'python') -> GradingJob:
+    return GradingJob.objects.create(user=user, page=page, code=code, language=language)
+
+
+def enqueue_regrade_job(user, page) -> Tuple[GradingJob, bool]:
+    """
+    Queue regrading of every stored submission of the exercise for grading_worker.
+    Returns (job, created) - a regrade of the same exercise still waiting in the queue is reused.
+    """
+    job = GradingJob.objects.filter(kind='REGRADE', page=page, status='PENDING').first()
+    if job is not None:
+        return job, False
+    return GradingJob.objects.create(user=user, page=page, kind='REGRADE', code=''), True
+
+
+def claim_next_grading_job(worker: str) -> Optional[GradingJob]:
+    """
+    Atomically take the oldest pending job. The conditional UPDATE makes sure
+    two workers never grade the same job, also on SQLite.
+    """
+    while True:
+        job = GradingJob.objects.filter(status='PENDING').order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = GradingJob.objects.filter(pk=job.pk, status='PENDING').update(
+            status='RUNNING',
+            worker=worker,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def heartbeat_grading_job(job: GradingJob, **fields):
+    """
+    Tell other workers the job is still being graded (optionally saving fields with it)
+    """
+    GradingJob.objects.filter(pk=job.pk, status='RUNNING').update(heartbeat_at=timezone.now(), **fields)
+
+
+def requeue_stale_grading_jobs(stale_after: int) -> int:
+    """
+    Return jobs whose worker died mid-run to the queue: RUNNING with no heartbeat for longer
+    than stale_after seconds. Workers send one after every progress flush and regrade batch,
+    so a long regrade is not picked up by a second worker while it is still running.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=stale_after)
+    # Zadania bez heartbeat_at - podjęte przed dodaniem pola
+    silent = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    return GradingJob.objects.filter(silent, status='RUNNING').update(
+        status='PENDING',
+        worker='',
+        started_at=None,
+        heartbeat_at=None
+    )
+
+
+def process_grading_job(job: GradingJob) -> GradingJob:
+    try:
+        coding_exercise = CodingExercise.objects.select_related('page').get(page=job.page)
+        if job.kind == 'REGRADE':
+            # Import lokalny - regrading korzysta z funkcji tego modułu
+            from .regrading import regrade_exercise
+            job.result = regrade_exercise(coding_exercise, progress=lambda stats: heartbeat_grading_job(job))
+        else:
+            job.result = grade_job_with_progress(job, coding_exercise)
+        job.status = 'DONE'
+    except Exception as e:
+        job.result = {'success': False, 'error': str(e)}
+        job.status = 'ERROR'
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'progress', 'status', 'finished_at'])
+    return job
+
+
+def grade_job_with_progress(job: GradingJob, coding_exercise: CodingExercise) -> Dict[str, Any]:
+    """
+    Grade the job's submission like grade_submission, publishing every test result in
+    job.progress as soon as it is known (at most every PROGRESS_FLUSH_INTERVAL seconds)
+    """
+    tests, success, flushed = [], False, 0.0
+    for line in iter_submission_results(job.user, coding_exercise, job.code, job.language):
+        if line['type'] != 'test':
+            success = line['success']
+            continue
+        tests.append(line)
+        if time.monotonic() - flushed >= PROGRESS_FLUSH_INTERVAL:
+            heartbeat_grading_job(job, progress=tests)
+            flushed = time.monotonic()
+
+    # Ostatnie wyniki zapisywane razem ze statusem - strumień widzi komplet, gdy zobaczy DONE
+    job.progress = tests
+    return {
+        'success': success,
+        'test_results': [
+            {key: value for key, value in line.items() if key not in ('type', 'index')}
+            for line in sorted(tests, key=lambda line: line['index'])
+        ]
+    }
+
+
+def follow_grading_job(job: GradingJob, status_url: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lines of submit_solution_stream for a queued job: test results as grading_worker publishes
+    them, then the summary. Only reads the job - grading itself never runs in the web process.
+    When the job is not finished within GRADING_STREAM_TIMEOUT seconds a 'pending' line tells
+    the client to poll status_url instead.
+    """
+    deadline = time.monotonic() + getattr(settings, 'GRADING_STREAM_TIMEOUT', 60)
+    sent = 0
+    while True:
+        job.refresh_from_db(fields=['status', 'progress', 'result'])
+        for line in job.progress[sent:]:
+            yield line
+        sent = len(job.progress)
+        if job.status in ('DONE', 'ERROR'):
+            break
+        if time.monotonic() >= deadline:
+            yield {'type': 'pending', 'job_id': job.id, 'status': job.status, 'status_url': status_url}
+            return
+        time.sleep(PROGRESS_FLUSH_INTERVAL)
+
+    result = job.result or {}
+    summary = {'type': 'summary', 'success': bool(result.get('success'))}
+    if 'test_results' in result:
+        summary['total'] = len(result['test_results'])
+    else:
+        summary['error'] = result.get('error')
+    yield summary
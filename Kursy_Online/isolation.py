@@ -0,0 +1,548 @@
+import ctypes
+import ctypes.util
+import os
+import platform
+import re
+import signal
+import struct
+import sys
+from typing import Iterable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows - izolacja i tak niedostępna
+    resource = None
+
+from django.conf import settings
+from .blobs import blob_root
+
+
+# Warstwy izolacji procesu oceniającego - zgłaszane przez proces po starcie
+NAMESPACES = 'namespaces'
+PROC = 'proc'
+READONLY_ROOT = 'readonly_root'
+SECCOMP = 'seccomp'
+NO_PROCESSES = 'no_processes'
+CGROUP = 'cgroup'
+# Bez nich kod użytkownika musi przejść walidację AST (CodeExecutionService._is_safe)
+REQUIRED_LAYERS = frozenset([NAMESPACES, READONLY_ROOT, SECCOMP, NO_PROCESSES])
+
+CLONE_THREAD = 0x00010000
+CLONE_NEWNS = 0x00020000
+CLONE_NEWCGROUP = 0x02000000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+NAMESPACE_FLAGS = (CLONE_NEWNS | CLONE_NEWCGROUP | CLONE_NEWUTS | CLONE_NEWIPC
+                   | CLONE_NEWUSER | CLONE_NEWPID | CLONE_NEWNET)
+
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_NOATIME = 0x400
+MS_NODIRATIME = 0x800
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+MS_RELATIME = 0x200000
+MNT_DETACH = 0x2
+# Flagi statvfs (ST_NOSUID, ST_NODEV, ST_NOEXEC, ST_NOATIME, ST_NODIRATIME, ST_RELATIME) i odpowiadające im flagi montowania
+STATVFS_MOUNT_FLAGS = [
+    (0x2, MS_NOSUID), (0x4, MS_NODEV), (0x8, MS_NOEXEC),
+    (0x400, MS_NOATIME), (0x800, MS_NODIRATIME), (0x1000, MS_RELATIME)
+]
+
+PR_SET_PDEATHSIG = 1
+PR_SET_SECCOMP = 22
+PR_SET_NO_NEW_PRIVS = 38
+SECCOMP_MODE_FILTER = 2
+
+SECCOMP_RET_KILL_PROCESS = 0x80000000
+SECCOMP_RET_ERRNO = 0x00050000
+SECCOMP_RET_ALLOW = 0x7fff0000
+
+BPF_LD_W_ABS = 0x20
+BPF_JMP_JEQ_K = 0x15
+BPF_JMP_JGE_K = 0x35
+BPF_JMP_JSET_K = 0x45
+BPF_RET_K = 0x06
+
+# Przesunięcia pól struct seccomp_data
+SECCOMP_DATA_NR = 0
+SECCOMP_DATA_ARCH = 4
+SECCOMP_DATA_ARG0 = 16
+
+# Wywołania systemowe zabronione w procesie oceniającym: sieć, uruchamianie programów,
+# przestrzenie nazw, montowanie, debugowanie innych procesów i operacje administracyjne
+DENIED_SYSCALLS = [
+    'socket', 'socketpair', 'connect', 'accept', 'accept4', 'bind', 'listen',
+    'execve', 'execveat', 'ptrace', 'process_vm_readv', 'process_vm_writev',
+    'unshare', 'setns', 'mount', 'umount2', 'pivot_root', 'chroot', 'mount_setattr',
+    'open_tree', 'move_mount', 'fsopen', 'fsconfig', 'fsmount', 'fspick',
+    'open_by_handle_at', 'name_to_handle_at', 'bpf', 'perf_event_open', 'userfaultfd',
+    'io_uring_setup', 'io_uring_enter', 'io_uring_register', 'keyctl', 'add_key', 'request_key',
+    'init_module', 'finit_module', 'delete_module', 'kexec_load', 'kexec_file_load',
+    'reboot', 'swapon', 'swapoff', 'acct', 'settimeofday', 'clock_settime', 'personality'
+]
+
+# Moduły, które zgłoszenia mogą importować, gdy procesy oceniające są izolowane
+DEFAULT_ALLOWED_IMPORTS = [
+    'math', 'cmath', 'collections', 'itertools', 'functools', 'heapq', 'bisect', 'operator',
+    'string', 're', 'decimal', 'fractions', 'statistics', 'random', 'datetime', 'copy', 'typing',
+    'dataclasses', 'json'
+]
+
+# Numery wywołań dla obsługiwanych architektur (AUDIT_ARCH_*, numery z unistd.h)
+SYSCALL_TABLES = {
+    'x86_64': (0xc000003e, {
+        'socket': 41, 'socketpair': 53, 'connect': 42, 'accept': 43, 'accept4': 288, 'bind': 49, 'listen': 50,
+        'execve': 59, 'execveat': 322, 'ptrace': 101, 'process_vm_readv': 310, 'process_vm_writev': 311,
+        'unshare': 272, 'setns': 308, 'mount': 165, 'umount2': 166, 'pivot_root': 155, 'chroot': 161,
+        'mount_setattr': 442, 'open_tree': 428, 'move_mount': 429, 'fsopen': 430, 'fsconfig': 431,
+        'fsmount': 432, 'fspick': 433, 'open_by_handle_at': 304, 'name_to_handle_at': 303, 'bpf': 321,
+        'perf_event_open': 298, 'userfaultfd': 323, 'io_uring_setup': 425, 'io_uring_enter': 426,
+        'io_uring_register': 427, 'keyctl': 250, 'add_key': 248, 'request_key': 249, 'init_module': 175,
+        'finit_module': 313, 'delete_module': 176, 'kexec_load': 246, 'kexec_file_load': 320, 'reboot': 169,
+        'swapon': 167, 'swapoff': 168, 'acct': 163, 'settimeofday': 164, 'clock_settime': 227,
+        'personality': 135, 'clone': 56, 'clone3': 435, 'fork': 57, 'vfork': 58
+    }),
+    'aarch64': (0xc00000b7, {
+        'socket': 198, 'socketpair': 199, 'connect': 203, 'accept': 202, 'accept4': 242, 'bind': 200,
+        'listen': 201, 'execve': 221, 'execveat': 281, 'ptrace': 117, 'process_vm_readv': 270,
+        'process_vm_writev': 271, 'unshare': 97, 'setns': 268, 'mount': 40, 'umount2': 39, 'pivot_root': 41,
+        'chroot': 51, 'mount_setattr': 442, 'open_tree': 428, 'move_mount': 429, 'fsopen': 430,
+        'fsconfig': 431, 'fsmount': 432, 'fspick': 433, 'open_by_handle_at': 265, 'name_to_handle_at': 264,
+        'bpf': 280, 'perf_event_open': 241, 'userfaultfd': 282, 'io_uring_setup': 425, 'io_uring_enter': 426,
+        'io_uring_register': 427, 'keyctl': 219, 'add_key': 217, 'request_key': 218, 'init_module': 105,
+        'finit_module': 273, 'delete_module': 106, 'kexec_load': 104, 'kexec_file_load': 294, 'reboot': 142,
+        'swapon': 224, 'swapoff': 225, 'acct': 89, 'settimeofday': 170, 'clock_settime': 112,
+        'personality': 92, 'clone': 220, 'clone3': 435
+    })
+}
+# Wywołania w trybie x32 (x86_64) mają ustawiony ten bit
+X32_SYSCALL_BIT = 0x40000000
+# Wywołania tworzące procesy (na aarch64 jest tylko clone)
+PROCESS_SYSCALLS = ['fork', 'vfork']
+
+_SOCK_FILTER = struct.Struct('HBBI')
+
+
+class IsolationError(RuntimeError):
+    pass
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_ushort), ('filter', ctypes.c_void_p)]
+
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    return _libc
+
+
+def _check(result: int, what: str):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise IsolationError(f'{what}: {os.strerror(errno)}')
+
+
+def isolation_mode() -> str:
+    """
+    SANDBOX_ISOLATION: 'auto' - namespaces and seccomp when the kernel allows them, rlimits otherwise;
+    'required' - grading workers refuse to start without them; 'off' - rlimits only
+    """
+    return getattr(settings, 'SANDBOX_ISOLATION', None) or 'auto'
+
+
+def is_isolated(layers: Iterable[str]) -> bool:
+    return REQUIRED_LAYERS.issubset(layers)
+
+
+def seccomp_filter(machine: Optional[str] = None) -> bytes:
+    """
+    Classic BPF program denying DENIED_SYSCALLS (EPERM) and namespace-creating clone()
+    on the given architecture; syscalls of any other architecture kill the process
+    """
+    arch, numbers = SYSCALL_TABLES[machine or platform.machine()]
+    deny = SECCOMP_RET_ERRNO | 1  # EPERM
+    program = [
+        (BPF_LD_W_ABS, 0, 0, SECCOMP_DATA_ARCH),
+        (BPF_JMP_JEQ_K, 1, 0, arch),
+        (BPF_RET_K, 0, 0, SECCOMP_RET_KILL_PROCESS),
+        (BPF_LD_W_ABS, 0, 0, SECCOMP_DATA_NR),
+        (BPF_JMP_JGE_K, 0, 1, X32_SYSCALL_BIT),
+        (BPF_RET_K, 0, 0, deny),
+    ]
+    for name in DENIED_SYSCALLS:
+        program += [
+            (BPF_JMP_JEQ_K, 0, 1, numbers[name]),
+            (BPF_RET_K, 0, 0, deny),
+        ]
+    # clone3 przekazuje flagi w strukturze, której filtr nie odczyta - ENOSYS i glibc wraca do clone()
+    program += [
+        (BPF_JMP_JEQ_K, 0, 1, numbers['clone3']),
+        (BPF_RET_K, 0, 0, SECCOMP_RET_ERRNO | 38),  # ENOSYS
+        (BPF_JMP_JEQ_K, 0, 3, numbers['clone']),
+        (BPF_LD_W_ABS, 0, 0, SECCOMP_DATA_ARG0),
+        (BPF_JMP_JSET_K, 0, 1, NAMESPACE_FLAGS),
+        (BPF_RET_K, 0, 0, deny),
+        (BPF_RET_K, 0, 0, SECCOMP_RET_ALLOW),
+    ]
+    return b''.join(_SOCK_FILTER.pack(*instruction) for instruction in program)
+
+
+def process_filter(machine: Optional[str] = None) -> bytes:
+    """
+    Classic BPF program denying new processes (EPERM): fork(), vfork(), clone3() (ENOSYS)
+    and clone() without CLONE_THREAD; stacked on top of seccomp_filter()
+    """
+    arch, numbers = SYSCALL_TABLES[machine or platform.machine()]
+    deny = SECCOMP_RET_ERRNO | 1  # EPERM
+    program = [
+        (BPF_LD_W_ABS, 0, 0, SECCOMP_DATA_ARCH),
+        (BPF_JMP_JEQ_K, 1, 0, arch),
+        (BPF_RET_K, 0, 0, SECCOMP_RET_KILL_PROCESS),
+        (BPF_LD_W_ABS, 0, 0, SECCOMP_DATA_NR),
+    ]
+    for name in PROCESS_SYSCALLS:
+        if name in numbers:
+            program += [
+                (BPF_JMP_JEQ_K, 0, 1, numbers[name]),
+                (BPF_RET_K, 0, 0, deny),
+            ]
+    program += [
+        (BPF_JMP_JEQ_K, 0, 1, numbers['clone3']),
+        (BPF_RET_K, 0, 0, SECCOMP_RET_ERRNO | 38),  # ENOSYS
+        # Wątki (CLONE_THREAD) są dozwolone, nowe procesy nie
+        (BPF_JMP_JEQ_K, 0, 3, numbers['clone']),
+        (BPF_LD_W_ABS, 0, 0, SECCOMP_DATA_ARG0),
+        (BPF_JMP_JSET_K, 1, 0, CLONE_THREAD),
+        (BPF_RET_K, 0, 0, deny),
+        (BPF_RET_K, 0, 0, SECCOMP_RET_ALLOW),
+    ]
+    return b''.join(_SOCK_FILTER.pack(*instruction) for instruction in program)
+
+
+def install_seccomp(program: Optional[bytes] = None):
+    libc = _get_libc()
+    program = ctypes.create_string_buffer(program or seccomp_filter())
+    fprog = _SockFprog(len(program.raw) // _SOCK_FILTER.size, ctypes.addressof(program))
+    _check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), 'no_new_privs')
+    _check(libc.prctl(PR_SET_SECCOMP, SECCOMP_MODE_FILTER, ctypes.byref(fprog), 0, 0), 'seccomp')
+
+
+def die_with_parent():
+    """
+    Have the kernel SIGKILL this process when its parent exits (Linux only)
+    """
+    if platform.system() == 'Linux':
+        _get_libc().prctl(PR_SET_PDEATHSIG, signal.SIGKILL, 0, 0, 0)
+
+
+def limit_processes():
+    """
+    Forbid the current process to start new ones: RLIMIT_NPROC of 1 (the kernel does not
+    apply it to root) and a seccomp filter denying fork() and clone() of a new process
+    """
+    if resource is not None:
+        resource.setrlimit(resource.RLIMIT_NPROC, (1, 1))
+    install_seccomp(process_filter())
+
+
+def _write(path: str, value: str):
+    with open(path, 'w') as handle:
+        handle.write(value)
+
+
+def join_cgroup(root: str, name: str) -> str:
+    """
+    Move this process into a fresh child of the delegated cgroup-v2 directory `root`
+    with the SANDBOX_CGROUP_* CPU, memory and process limits
+    """
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    cpus = getattr(settings, 'SANDBOX_CGROUP_CPUS', 1)
+    limits = {
+        'memory.max': getattr(settings, 'SANDBOX_CGROUP_MEMORY_MAX', 512 * 1024 * 1024),
+        'memory.swap.max': 0,
+        'cpu.max': f'{int(cpus * 100000)} 100000' if cpus else None,
+        'pids.max': getattr(settings, 'SANDBOX_CGROUP_PIDS_MAX', 16)
+    }
+    for control, value in limits.items():
+        if value is not None and os.path.exists(os.path.join(path, control)):
+            _write(os.path.join(path, control), str(value))
+    _write(os.path.join(path, 'cgroup.procs'), '0')
+    return path
+
+
+def remove_cgroup(path: Optional[str]):
+    # Katalog cgroup da się usunąć dopiero, gdy nie ma w nim procesów
+    if path:
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+def _close_fds(keep_fds: Iterable[int]):
+    # Procesy oceniające powstają przez fork() serwera - bez jego plików, gniazd i bazy danych
+    keep = {0, 1, 2, *keep_fds}
+    try:
+        fds = [int(fd) for fd in os.listdir('/proc/self/fd')]
+    except OSError:
+        return
+    for fd in fds:
+        if fd not in keep:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def allowed_imports() -> List[str]:
+    """
+    Modules submissions may import once workers are isolated (SANDBOX_ALLOWED_IMPORTS)
+    """
+    modules = getattr(settings, 'SANDBOX_ALLOWED_IMPORTS', None)
+    return list(DEFAULT_ALLOWED_IMPORTS if modules is None else modules)
+
+
+def preload_allowed_imports():
+    # Po przykryciu katalogów import mógłby nie znaleźć plików - moduły ładowane zawczasu
+    for module in allowed_imports():
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+
+def _covered(path: str, directories: Iterable[str]) -> bool:
+    return any(path == directory or path.startswith(directory.rstrip(os.sep) + os.sep) for directory in directories)
+
+
+def _readonly_paths() -> List[str]:
+    paths = getattr(settings, 'SANDBOX_READONLY_PATHS', None)
+    if paths is None:
+        paths = [blob_root()]
+    # Instalacja Pythona (np. pyenv lub virtualenv w katalogu domowym) musi pozostać widoczna
+    paths = [*paths, sys.prefix, sys.base_prefix, sys.exec_prefix]
+    readonly = []
+    for path in map(str, paths):
+        real = os.path.realpath(path)
+        if real not in readonly:
+            readonly.append(real)
+    return readonly
+
+
+def _hidden_paths() -> List[str]:
+    paths = getattr(settings, 'SANDBOX_HIDDEN_PATHS', None)
+    if paths is None:
+        paths = [settings.BASE_DIR, '/root', '/home', '/tmp', '/var/tmp', '/dev/shm']
+    hidden = []
+    # Od najkrótszych - katalog wewnątrz już przykrytego znika razem z nim
+    for real in sorted({os.path.realpath(str(path)) for path in paths}, key=len):
+        if os.path.isdir(real) and not _covered(real, hidden):
+            hidden.append(real)
+    return hidden
+
+
+def _mount_points() -> List[str]:
+    """
+    Mount points of this process's mount namespace, parents first
+    """
+    points = []
+    with open('/proc/self/mountinfo') as mountinfo:
+        for line in mountinfo:
+            point = line.split()[4]
+            # Znaki specjalne w ścieżkach są zapisane ósemkowo (np. spacja jako \040)
+            point = re.sub(r'\\([0-7]{3})', lambda match: chr(int(match.group(1), 8)), point)
+            if point not in points:
+                points.append(point)
+    return sorted(points, key=lambda point: point.count(os.sep) if point != os.sep else 0)
+
+
+def remount_readonly():
+    """
+    Make every mount of the worker's (private) mount namespace read-only: the root file
+    system, its submounts and the tmpfs hiding project and temporary directories.
+    The fresh /proc of the PID namespace is mounted over the old one afterwards.
+    """
+    for point in _mount_points():
+        if _covered(point, ['/proc']):
+            continue
+        try:
+            flags = os.statvfs(point).f_flag
+        except OSError:
+            # Punkt montowania przykryty przez tmpfs - niedostępny z tej przestrzeni nazw
+            continue
+        # Ponowne montowanie musi zachować zablokowane flagi montowania źródłowego
+        locked = sum(mount_flag for stat_flag, mount_flag in STATVFS_MOUNT_FLAGS if flags & stat_flag)
+        _check(_get_libc().mount(None, point.encode(), None, MS_BIND | MS_REMOUNT | MS_RDONLY | locked, None),
+               f'remount read-only {point}')
+
+
+def _enter_namespaces():
+    libc = _get_libc()
+    uid, gid = os.getuid(), os.getgid()
+    _check(libc.unshare(CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWPID | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS),
+           'unshare')
+    _write('/proc/self/setgroups', 'deny')
+    _write('/proc/self/uid_map', f'0 {uid} 1')
+    _write('/proc/self/gid_map', f'0 {gid} 1')
+    # Zmiany montowań nie wychodzą poza przestrzeń nazw procesu
+    _check(libc.mount(None, b'/', None, MS_REC | MS_PRIVATE, None), 'mount private')
+
+    # Katalogi potrzebne procesom (pliki przypadków testowych) - otwarte przed przykryciem
+    readonly = []
+    for path in _readonly_paths():
+        try:
+            os.makedirs(path, exist_ok=True)
+            readonly.append((path, os.open(path, os.O_RDONLY | os.O_DIRECTORY)))
+        except OSError:
+            pass
+
+    hidden = []
+    try:
+        for path in _hidden_paths():
+            _check(libc.mount(b'tmpfs', path.encode(), b'tmpfs', MS_NOSUID | MS_NODEV, b'size=16m,mode=0755'),
+                   f'mount tmpfs {path}')
+            hidden.append(path)
+        for path, fd in readonly:
+            if _covered(path, hidden):
+                _bind_readonly(fd, path)
+    except (IsolationError, OSError):
+        # Bez plików testów ocenianie by nie działało - lepiej bez przykrycia katalogów
+        for path in reversed(hidden):
+            libc.umount2(path.encode(), MNT_DETACH)
+        raise
+    finally:
+        for _, fd in readonly:
+            os.close(fd)
+    # Katalog bieżący wskazywałby dalej na przykryty katalog
+    os.chdir('/')
+
+
+def _bind_readonly(fd: int, path: str):
+    """
+    Mount the directory open as fd (already covered by tmpfs) back at path, read-only
+    """
+    libc = _get_libc()
+    os.makedirs(path, exist_ok=True)
+    _check(libc.mount(f'/proc/self/fd/{fd}'.encode(), path.encode(), None, MS_BIND | MS_REC, None),
+           f'bind {path}')
+    # Ponowne montowanie musi zachować zablokowane flagi montowania źródłowego
+    flags = os.fstatvfs(fd).f_flag
+    locked = sum(mount_flag for stat_flag, mount_flag in STATVFS_MOUNT_FLAGS if flags & stat_flag)
+    _check(libc.mount(None, path.encode(), None, MS_BIND | MS_REMOUNT | MS_RDONLY | locked, None),
+           f'remount read-only {path}')
+
+
+def _mount_proc() -> bool:
+    # Nowy /proc pokazuje tylko procesy z przestrzeni PID procesu oceniającego;
+    # nie uda się, gdy /proc serwera jest częściowo przykryty (np. w kontenerze)
+    return _get_libc().mount(b'proc', b'/proc', b'proc', MS_NOSUID | MS_NODEV | MS_NOEXEC, None) == 0
+
+
+def _supervise(pid: int):
+    """
+    Parent side of the PID namespace: wait for the worker (PID 1 inside) and exit with its status
+    """
+    while True:
+        try:
+            _, status = os.waitpid(pid, 0)
+            break
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            os._exit(1)
+    code = os.waitstatus_to_exitcode(status)
+    os._exit(code if code >= 0 else 128 - code)
+
+
+def isolate(name: str, keep_fds: Iterable[int] = ()) -> List[str]:
+    """
+    Isolate the current (freshly forked, single-threaded) grading worker and return the applied layers.
+
+    In order: a child cgroup of SANDBOX_CGROUP with CPU/memory/process limits, new user, PID,
+    network, mount, IPC and UTS namespaces (no network, private /proc, project, home and temporary
+    directories hidden under empty tmpfs, every mount read-only), closed inherited descriptors
+    except keep_fds and a seccomp filter. The worker itself may still fork - each job runs in
+    a child that calls limit_processes() first (NO_PROCESSES tells it to). With
+    SANDBOX_ISOLATION='auto' layers the kernel refuses are skipped, with 'required'
+    IsolationError is raised instead; per-job rlimits apply either way.
+
+    Entering the PID namespace forks: only the child returns, the original process
+    waits for it and exits with its status, so killing it ends the worker too.
+    """
+    if platform.system() != 'Linux':
+        if isolation_mode() == 'required':
+            raise IsolationError('Izolacja procesów wymaga systemu Linux')
+        return []
+    mode = isolation_mode()
+    if mode == 'off':
+        return []
+
+    required = mode == 'required'
+    layers = []
+
+    cgroup_root = getattr(settings, 'SANDBOX_CGROUP', None)
+    if cgroup_root:
+        try:
+            join_cgroup(str(cgroup_root), name)
+            layers.append(CGROUP)
+        except OSError as e:
+            if required:
+                raise IsolationError(f'cgroup: {e}')
+
+    preload_allowed_imports()
+    try:
+        _enter_namespaces()
+        layers.append(NAMESPACES)
+    except (IsolationError, OSError) as e:
+        if required:
+            raise IsolationError(str(e))
+
+    if NAMESPACES in layers:
+        pid = os.fork()
+        if pid:
+            _supervise(pid)
+        # Proces nadrzędny zabity (np. przez pulę po przekroczeniu czasu) - kończy się i ten
+        die_with_parent()
+        try:
+            remount_readonly()
+            layers.append(READONLY_ROOT)
+        except (IsolationError, OSError) as e:
+            if required:
+                raise IsolationError(str(e))
+        if _mount_proc():
+            layers.append(PROC)
+
+    _close_fds(keep_fds)
+
+    try:
+        install_seccomp()
+        layers.append(SECCOMP)
+    except (IsolationError, KeyError, OSError, AttributeError) as e:
+        if required:
+            raise IsolationError(f'seccomp: {e}')
+
+    if SECCOMP in layers and resource is not None:
+        # Filtr blokujący procesy jest zakładany w procesie każdego zadania - tu tylko sprawdzenie, że da się go zbudować
+        try:
+            process_filter()
+            layers.append(NO_PROCESSES)
+        except KeyError as e:
+            if required:
+                raise IsolationError(f'nproc: {e}')
+    elif required:
+        raise IsolationError('nproc: brak filtra seccomp')
+    return layers
@@ -0,0 +1,188 @@
+import shutil
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from .forkserver import ForkServerUnavailable
+from .runner import SOURCE_NAME, execute, prepare_workdir
+from .sandbox import get_forkserver
+
+
+class LanguageUnavailable(RuntimeError):
+    pass
+
+
+class Language:
+    """
+    A runnable language: the toolchain it needs, how to compile and run a program
+    and its limits. Commands may use {tool} placeholders (resolved to discovered paths)
+    and {source} (the source file in the run directory).
+    """
+
+    def __init__(self, name: str, label: str, file_extension: str, tools: Dict[str, List[str]],
+                 run: List[str], compile: Optional[List[str]] = None, cache_artifacts: bool = True,
+                 timeout: Optional[float] = None, cpu_time: Optional[int] = None,
+                 output_limit: Optional[int] = None, use_forkserver: bool = False):
+        self.name = name
+        self.label = label
+        self.file_extension = file_extension
+        # Narzędzie -> kandydaci (nazwy w PATH lub pełne ścieżki), sprawdzani po kolei
+        self.tools = tools
+        self.run_command = run
+        self.compile_command = compile
+        self.cache_artifacts = cache_artifacts
+        self.timeout = timeout
+        self.cpu_time = cpu_time
+        self.output_limit = output_limit
+        self.use_forkserver = use_forkserver
+
+    @property
+    def source_name(self) -> str:
+        return SOURCE_NAME + self.file_extension
+
+    def _format(self, command: List[str], toolchain: Dict[str, str]) -> List[str]:
+        return [part.format(source=self.source_name, **toolchain) for part in command]
+
+    def limits(self) -> Dict[str, Any]:
+        return {'timeout': self.timeout, 'cpu_time': self.cpu_time, 'output_limit': self.output_limit}
+
+
+class LanguageRegistry:
+    """
+    Languages available to /run-code/. Toolchains are looked up once (at startup,
+    from AppConfig.ready) and the resolved paths are reused by every request.
+    """
+
+    def __init__(self):
+        self._languages = {}
+        self._toolchains = None
+        self._lock = threading.Lock()
+
+    def register(self, language: Language):
+        with self._lock:
+            self._languages[language.name] = language
+            self._toolchains = None
+
+    def get(self, name: str) -> Language:
+        try:
+            return self._languages[name]
+        except KeyError:
+            raise LanguageUnavailable(f'Nieobsługiwany język: {name}')
+
+    def __iter__(self):
+        return iter(self._languages.values())
+
+    def discover(self) -> Dict[str, Optional[Dict[str, str]]]:
+        """
+        Resolve every language's tools; a language with a missing tool maps to None.
+        LANGUAGE_TOOLCHAINS in settings overrides paths (e.g. {'gcc': '/opt/gcc/bin/gcc'}).
+        """
+        overrides = getattr(settings, 'LANGUAGE_TOOLCHAINS', None) or {}
+        toolchains = {}
+        for language in self._languages.values():
+            toolchain = {}
+            for tool, candidates in language.tools.items():
+                path = None
+                for candidate in ([overrides[tool]] if tool in overrides else []) + candidates:
+                    path = shutil.which(candidate)
+                    if path:
+                        break
+                if path is None:
+                    toolchain = None
+                    break
+                toolchain[tool] = path
+            toolchains[language.name] = toolchain
+        with self._lock:
+            self._toolchains = toolchains
+        return toolchains
+
+    def toolchain(self, language: Language) -> Dict[str, str]:
+        toolchains = self._toolchains
+        if toolchains is None or language.name not in toolchains:
+            toolchains = self.discover()
+        toolchain = toolchains.get(language.name)
+        if toolchain is None:
+            missing = ', '.join(language.tools)
+            raise LanguageUnavailable(f'Nie znaleziono narzędzi dla języka {language.label} ({missing}).')
+        return toolchain
+
+    def available(self) -> List[Language]:
+        toolchains = self._toolchains if self._toolchains is not None else self.discover()
+        return [language for language in self._languages.values() if toolchains.get(language.name)]
+
+    def prepare(self, name: str, code: str, workdir: str) -> List[str]:
+        """
+        Put the program (compiled through the artifact cache, if the language
+        compiles) into workdir and return the command that runs it there
+        """
+        language = self.get(name)
+        toolchain = self.toolchain(language)
+        compile_command = language._format(language.compile_command, toolchain) if language.compile_command else None
+        if compile_command and not language.cache_artifacts:
+            with tempfile.TemporaryDirectory(prefix='.build-') as cache_dir:
+                prepare_workdir(workdir, code, language.file_extension, compile_command, cache_dir=cache_dir)
+        else:
+            prepare_workdir(workdir, code, language.file_extension, compile_command)
+        return language._format(language.run_command, toolchain)
+
+    def run(self, name: str, code: str) -> Dict[str, Any]:
+        """
+        Compile (through the artifact cache) and run a program in a private directory
+        under the language's limits; returns runner.execute() fields
+        """
+        language = self.get(name)
+        self.toolchain(language)
+
+        if language.use_forkserver:
+            forkserver = get_forkserver()
+            if forkserver is not None:
+                try:
+                    return forkserver.run_script(code, **language.limits())
+                except ForkServerUnavailable:
+                    pass
+
+        with tempfile.TemporaryDirectory(prefix='run_code_') as workdir:
+            command = self.prepare(name, code, workdir)
+            return execute(command, cwd=workdir, **language.limits())
+
+
+registry = LanguageRegistry()
+
+registry.register(Language(
+    'python', 'Python', '.py',
+    tools={'python': ['python3', 'python', sys.executable]},
+    run=['{python}', '{source}'],
+    use_forkserver=True
+))
+registry.register(Language(
+    'javascript', 'JavaScript', '.js',
+    tools={'node': ['node', 'nodejs']},
+    run=['{node}', '{source}']
+))
+registry.register(Language(
+    'powershell', 'PowerShell', '.ps1',
+    tools={'powershell': ['pwsh', 'powershell']},
+    run=['{powershell}', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-File', '{source}']
+))
+registry.register(Language(
+    'c', 'C', '.c',
+    tools={'gcc': ['gcc', 'cc', r'C:\msys64\ucrt64\bin\gcc.exe']},
+    compile=['{gcc}', '-O2', '-o', 'program.exe'],
+    run=['./program.exe']
+))
+registry.register(Language(
+    'csharp', 'C#', '.cs',
+    tools={'dotnet': ['dotnet']},
+    run=['{dotnet}', 'run', '{source}'],
+    # Pierwsze uruchomienie buduje projekt - więcej czasu niż dla pozostałych języków
+    timeout=60, cpu_time=60
+))
+registry.register(Language(
+    'java', 'Java', '.java',
+    tools={'javac': ['javac'], 'java': ['java']},
+    compile=['{javac}'],
+    run=['{java}', '-cp', '.', 'program'],
+    # JVM potrzebuje więcej czasu procesora na start
+    cpu_time=10
+))
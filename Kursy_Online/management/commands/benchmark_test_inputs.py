@@ -0,0 +1,37 @@
+import ast
+import marshal
+import timeit
+from django.core.management.base import BaseCommand
+from Kursy_Online.code_execution import load_test_input, parse_test_input
+
+
+class Command(BaseCommand):
+    help = 'Porównuje eval() surowego wejścia testu z wczytaniem wejścia sparsowanego przy zapisie'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1024 * 1024,
+                            help='Przybliżony rozmiar wejścia w bajtach (domyślnie 1 MB)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Ile razy powtórzyć każdy pomiar (liczy się najlepszy wynik)')
+
+    def handle(self, *args, **options):
+        # Macierz liczb całkowitych - typowe duże wejście zadania programistycznego
+        row = '[' + ', '.join(str(value) for value in range(1000, 1100)) + ']'
+        rows = max(1, options['size'] // (len(row) + 2))
+        test_input = '[' + ', '.join([row] * rows) + ']'
+        parsed_input = parse_test_input(test_input)
+
+        def measure(func):
+            return min(timeit.repeat(func, number=1, repeat=options['repeat']))
+
+        timings = [
+            ('eval(input_data)', measure(lambda: eval(test_input))),
+            ('ast.literal_eval(input_data)', measure(lambda: ast.literal_eval(test_input))),
+            ('marshal.loads(parsed_input)', measure(lambda: marshal.loads(parsed_input))),
+            ('load_test_input(parsed_input)', measure(lambda: load_test_input(test_input, parsed_input))),
+        ]
+
+        self.stdout.write(f'Input: {len(test_input)} bytes, parsed: {len(parsed_input)} bytes')
+        baseline = timings[0][1]
+        for name, seconds in timings:
+            self.stdout.write(f'{name:32} {seconds * 1000:10.2f} ms  {baseline / seconds:8.1f}x')
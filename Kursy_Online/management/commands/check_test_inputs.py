@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from Kursy_Online.models import TestCase
+
+
+class Command(BaseCommand):
+    help = ('Wypisuje przypadki testowe, których wejście nie jest literałem Pythona (np. zapisane przed '
+            'parsowaniem przy zapisie) - ocenianie ich odrzuca, dopóki prowadzący ich nie poprawi')
+
+    def handle(self, *args, **options):
+        rejected = TestCase.objects.filter(parsed_input__isnull=True, parsed_input_blob='').select_related(
+            'exercise__page'
+        ).order_by('exercise_id', 'order')
+
+        count = 0
+        for test_case in rejected.iterator():
+            count += 1
+            self.stdout.write(
+                f'Test case {test_case.id} (exercise {test_case.exercise_id}: {test_case.exercise.page.title}): '
+                f'{test_case.input_data[:80]!r}'
+            )
+        if count:
+            raise CommandError(
+                f'{count} test case(s) with non-literal input - fix them in the admin '
+                f'(/admin/Kursy_Online/testcase/<id>/change/)'
+            )
+        self.stdout.write(self.style.SUCCESS('All test inputs are Python literals'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from Kursy_Online.models import CodingExercise
+from Kursy_Online.utils import refresh_expected_outputs
+
+
+class Command(BaseCommand):
+    help = ('Wylicza brakujące i nieaktualne oczekiwane wyniki przypadków testowych z rozwiązań wzorcowych '
+            '(np. dla przypadków zapisanych przed ich wyliczaniem); wyniki wpisane przez prowadzących zostają')
+
+    def add_arguments(self, parser):
+        parser.add_argument('exercises', nargs='*', type=int,
+                            help='Identyfikatory stron zadań programistycznych (domyślnie wszystkie)')
+
+    def handle(self, *args, **options):
+        exercises = CodingExercise.objects.select_related('page').order_by('pk')
+        if options['exercises']:
+            exercises = exercises.filter(page_id__in=options['exercises'])
+            missing = set(options['exercises']) - {exercise.pk for exercise in exercises}
+            if missing:
+                raise CommandError(f'Nie znaleziono zadań: {", ".join(map(str, sorted(missing)))}')
+
+        total = 0
+        for exercise in exercises.iterator():
+            computed = refresh_expected_outputs(exercise.pk)
+            if computed:
+                self.stdout.write(f'Exercise {exercise.pk}: {exercise.page.title} - {computed} test cases')
+            total += computed
+        self.stdout.write(self.style.SUCCESS(f'Computed expected outputs of {total} test cases'))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from Kursy_Online.forkserver import ForkServer
+
+
+class Command(BaseCommand):
+    help = 'Uruchamia fork-server wykonujący kod Pythona (ocenianie i /python-interpreter/) bez startu interpretera'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None,
+                            help='Ścieżka gniazda Unix (domyślnie FORKSERVER_SOCKET z settings.py)')
+        parser.add_argument('--max-children', type=int, default=None,
+                            help='Maksymalna liczba równocześnie wykonywanych zadań')
+
+    def handle(self, *args, **options):
+        socket_path = options['socket'] or getattr(settings, 'FORKSERVER_SOCKET', None)
+        if not socket_path:
+            raise CommandError('Brak ścieżki gniazda - ustaw FORKSERVER_SOCKET lub podaj --socket')
+
+        server = ForkServer(socket_path, max_children=options['max_children'])
+        self.stdout.write(f'Fork-server listening on {socket_path}')
+        self.stdout.flush()
+        server.serve_forever()
@@ -0,0 +1,36 @@
+import os
+import socket
+import time
+from django.core.management.base import BaseCommand
+from Kursy_Online.grading import claim_next_grading_job, process_grading_job, requeue_stale_grading_jobs
+
+
+class Command(BaseCommand):
+    help = 'Ocenia zgłoszenia rozwiązań z kolejki GradingJob'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Oceń wszystkie oczekujące zgłoszenia i zakończ działanie')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Co ile sekund sprawdzać kolejkę, gdy jest pusta')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Po ilu sekundach bez sygnału od procesu oceniającego zgłoszenie wraca do kolejki')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Grading worker {worker} started')
+
+        while True:
+            requeued = requeue_stale_grading_jobs(options['stale_after'])
+            if requeued:
+                self.stdout.write(f'Requeued {requeued} stale job(s)')
+
+            job = claim_next_grading_job(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            job = process_grading_job(job)
+            self.stdout.write(f'Job {job.id}: {job.status}')
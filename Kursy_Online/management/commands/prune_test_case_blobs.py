@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from Kursy_Online.blobs import prune_blobs
+
+
+class Command(BaseCommand):
+    help = 'Usuwa pliki z dużymi wejściami i wynikami testów, do których nie odwołuje się już żaden przypadek testowy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=3600,
+                            help='Pomija pliki młodsze niż podana liczba sekund (domyślnie godzina)')
+
+    def handle(self, *args, **options):
+        removed = prune_blobs(min_age=options['min_age'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} unreferenced test case files'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from Kursy_Online.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Buduje od nowa indeks wyszukiwania kursów (np. po zmianach danych z pominięciem sygnałów)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} courses'))
@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from Kursy_Online.models import CodingExercise
+from Kursy_Online.regrading import regrade_exercise, stale_exercises
+
+
+class Command(BaseCommand):
+    help = 'Ocenia ponownie zapisane zgłoszenia po zmianie rozwiązania wzorcowego lub testów zadania'
+
+    def add_arguments(self, parser):
+        parser.add_argument('exercises', nargs='*', type=int,
+                            help='Identyfikatory stron zadań programistycznych')
+        parser.add_argument('--stale', action='store_true',
+                            help='Wszystkie zadania ze zgłoszeniami ocenionymi względem starszej wersji')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Liczba zgłoszeń odczytywanych i zapisywanych naraz')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Liczba zgłoszeń ocenianych równolegle (domyślnie rozmiar puli procesów)')
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            exercises = stale_exercises()
+        elif options['exercises']:
+            exercises = list(CodingExercise.objects.filter(page_id__in=options['exercises']).select_related('page'))
+            missing = set(options['exercises']) - {exercise.pk for exercise in exercises}
+            if missing:
+                raise CommandError(f'Nie znaleziono zadań: {", ".join(map(str, sorted(missing)))}')
+        else:
+            raise CommandError('Podaj identyfikatory zadań albo --stale')
+
+        for exercise in exercises:
+            start = time.monotonic()
+
+            def report(stats):
+                elapsed = time.monotonic() - start
+                self.stdout.write(
+                    f'  {stats["regraded"]}/{stats["total"]} submissions '
+                    f'({stats["graded"]} distinct programs graded, {elapsed:.1f}s)'
+                )
+
+            self.stdout.write(f'Exercise {exercise.pk}: {exercise.page.title}')
+            stats = regrade_exercise(exercise, batch_size=options['batch_size'], workers=options['workers'],
+                                     progress=report)
+            self.stdout.write(self.style.SUCCESS(
+                f'Exercise {exercise.pk}: {stats["regraded"]} submissions regraded, '
+                f'{stats["progress_updated"]} progress records updated'
+            ))
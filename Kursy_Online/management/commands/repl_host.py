@@ -0,0 +1,32 @@
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from Kursy_Online.repl import ReplHost
+
+
+class Command(BaseCommand):
+    help = 'Uruchamia serwer sesji Pythona - wszystkie procesy serwera WWW korzystają z tych samych sesji'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None,
+                            help='Ścieżka gniazda Unix (domyślnie REPL_SOCKET z settings.py)')
+
+    def handle(self, *args, **options):
+        socket_path = options['socket'] or getattr(settings, 'REPL_SOCKET', None)
+        if not socket_path:
+            raise CommandError('Brak ścieżki gniazda - ustaw REPL_SOCKET lub podaj --socket')
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt()
+
+        # Po SIGTERM procesy sesji są zamykane razem z serwerem
+        signal.signal(signal.SIGTERM, stop)
+        host = ReplHost(socket_path)
+        self.stdout.write(f'REPL host listening on {socket_path}')
+        self.stdout.flush()
+        try:
+            host.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            host.server_close()
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0003_remove_codingexercise_allowed_languages_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='solution_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
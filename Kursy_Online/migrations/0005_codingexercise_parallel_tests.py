@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0004_testcase_solution_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codingexercise',
+            name='fail_fast',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='codingexercise',
+            name='parallel_tests',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0006_gradingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.TextField()),
+                ('code_hash', models.CharField(max_length=64)),
+                ('language', models.CharField(default='python', max_length=20)),
+                ('exercise_version', models.CharField(max_length=64)),
+                ('passed', models.BooleanField(default=False)),
+                ('result', models.JSONField()),
+                ('test_timings', models.JSONField(default=list)),
+                ('peak_memory', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('cached', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='Kursy_Online.codingexercise')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'exercise', 'created_at'], name='Kursy_Onlin_user_id_edb1f0_idx'), models.Index(fields=['exercise', 'code_hash', 'exercise_version'], name='Kursy_Onlin_exercis_e030f8_idx')],
+            },
+        ),
+    ]
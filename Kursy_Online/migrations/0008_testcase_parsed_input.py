@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:48
+
+import ast
+import marshal
+
+from django.db import migrations, models
+
+
+def parse_existing_inputs(apps, schema_editor):
+    TestCase = apps.get_model('Kursy_Online', 'TestCase')
+    rejected = []
+    for test_case in TestCase.objects.only('id', 'exercise_id', 'input_data').iterator():
+        try:
+            parsed_input = marshal.dumps(ast.literal_eval(test_case.input_data))
+        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+            rejected.append(test_case)
+            continue
+        TestCase.objects.filter(id=test_case.id).update(parsed_input=parsed_input)
+
+    # Takie wejścia nie są już obliczane (eval) - testy zawodzą, dopóki prowadzący ich nie poprawi
+    if rejected:
+        print(f'\n  UWAGA: {len(rejected)} przypadków testowych ma wejście niebędące literałem Pythona '
+              f'i będzie odrzucane przy ocenianiu:')
+        for test_case in rejected:
+            print(f'    przypadek testowy {test_case.id} (zadanie {test_case.exercise_id}): {test_case.input_data[:80]!r}')
+        print('  Popraw wejścia w panelu administracyjnym; listę pokazuje `python manage.py check_test_inputs`.')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0007_submission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='parsed_input',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(parse_existing_inputs, migrations.RunPython.noop),
+    ]
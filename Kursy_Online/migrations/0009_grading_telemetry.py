@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0008_testcase_parsed_input'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='compile_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='GradingHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phase', models.CharField(choices=[('compile', 'Compile'), ('execute', 'Execute'), ('compare', 'Compare')], max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_time', models.FloatField(default=0)),
+                ('max_time', models.FloatField(default=0)),
+                ('buckets', models.JSONField(default=list)),
+                ('max_memory', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grading_histograms', to='Kursy_Online.codingexercise')),
+            ],
+            options={
+                'ordering': ['-total_time'],
+                'unique_together': {('exercise', 'phase')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0009_grading_telemetry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codingexercise',
+            name='comparison_mode',
+            field=models.CharField(choices=[('exact', 'Exact text'), ('structural', 'Structural equality'), ('float', 'Float tolerance'), ('unordered', 'Unordered collections')], default='exact', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='codingexercise',
+            name='float_tolerance',
+            field=models.FloatField(default=1e-06),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# Schemat indeksu zapisany w migracji - późniejsze zmiany search.py nie zmieniają tego, co ona robi
+TABLE = 'Kursy_Online_course_search'
+COLUMNS = ('title', 'description', 'technologies', 'chapters', 'pages')
+POSTGRES_WEIGHTS = ('A', 'C', 'B', 'C', 'D')
+
+
+def _documents(apps):
+    Course = apps.get_model('Kursy_Online', 'Course')
+    for course in Course.objects.prefetch_related('technologies', 'chapters__pages').iterator(chunk_size=500):
+        chapters = sorted(course.chapters.all(), key=lambda chapter: chapter.order)
+        yield course.pk, (
+            course.title,
+            course.description or '',
+            ' '.join(technology.name for technology in course.technologies.all()),
+            '\n'.join(chapter.title for chapter in chapters),
+            '\n'.join(
+                page.title for chapter in chapters
+                for page in sorted(chapter.pages.all(), key=lambda page: page.order)
+            )
+        )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{TABLE}" USING fts5('
+            f'{", ".join(COLUMNS)}, tokenize="unicode61 remove_diacritics 2")'
+        )
+        insert = f'INSERT INTO "{TABLE}" (rowid, {", ".join(COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)'
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{TABLE}" ('
+            f'course_id bigint PRIMARY KEY REFERENCES "Kursy_Online_course" (id) ON DELETE CASCADE '
+            f'DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{TABLE}_document" ON "{TABLE}" USING gin (document)')
+        vector = ' || '.join(f"setweight(to_tsvector('simple', %s), '{weight}')" for weight in POSTGRES_WEIGHTS)
+        insert = f'INSERT INTO "{TABLE}" (course_id, document) VALUES (%s, {vector})'
+    else:
+        # Inne bazy - wyszukiwanie bez indeksu (search.FallbackSearchBackend)
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for course_id, document in _documents(apps):
+            cursor.execute(insert, [course_id, *document])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{TABLE}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0011_test_case_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
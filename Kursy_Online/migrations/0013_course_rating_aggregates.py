@@ -0,0 +1,73 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:01
+
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Course = apps.get_model('Kursy_Online', 'Course')
+    CourseReview = apps.get_model('Kursy_Online', 'CourseReview')
+    histograms = defaultdict(dict)
+    counts = CourseReview.objects.filter(rating__in=range(1, 6)).values('course_id', 'rating').annotate(
+        count=models.Count('id')
+    )
+    for row in counts:
+        histograms[row['course_id']][row['rating']] = row['count']
+
+    courses = list(Course.objects.filter(pk__in=histograms))
+    for course in courses:
+        histogram = histograms[course.pk]
+        for rating in range(1, 6):
+            setattr(course, f'rating_{rating}', histogram.get(rating, 0))
+        course.review_count = sum(histogram.values())
+        course.average_rating = sum(rating * count for rating, count in histogram.items()) / course.review_count
+    Course.objects.bulk_update(
+        courses, ['average_rating', 'review_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5'],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0012_course_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='average_rating',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='review_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0013_course_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gradingjob',
+            name='kind',
+            field=models.CharField(choices=[('SUBMISSION', 'Submission'), ('REGRADE', 'Regrade')], default='SUBMISSION', max_length=20),
+        ),
+    ]
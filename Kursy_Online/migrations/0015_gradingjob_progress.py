@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Kursy_Online', '0014_gradingjob_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gradingjob',
+            name='progress',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 
 from django.contrib.auth.models import AbstractUser, UserManager
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+from .blobs import BlobRef
+from .comparison import COMPARISON_MODES, DEFAULT_FLOAT_TOLERANCE
 # Rozszerzenie modelu użytkownika
 class User(AbstractUser):
     phone_number = models.CharField(max_length=15, default='')
@@ -66,6 +69,18 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=False)
+    # Zagregowane oceny aktualizowane przy dodaniu i usunięciu opinii (signals.py)
+    average_rating = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    review_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    @property
+    def rating_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}') for rating in range(1, 6)}
 
 
 class CourseReview(models.Model):
@@ -171,17 +186,73 @@ class CodingExercise(models.Model):
     #allowed_languages = models.JSONField(default=list)
     memory_limit = models.IntegerField(default=100*1024*1024)
     time_limit = models.IntegerField(default=5000)
+    # Ile przypadków testowych może być ocenianych równolegle (1 = po kolei)
+    parallel_tests = models.PositiveSmallIntegerField(default=1)
+    # Przerwij pozostałe testy po pierwszym niepowodzeniu
+    fail_fast = models.BooleanField(default=False)
+    # Sposób porównania wyniku z oczekiwanym (Kursy_Online.comparison) i tolerancja dla trybu 'float'
+    comparison_mode = models.CharField(max_length=20, choices=COMPARISON_MODES, default='exact')
+    float_tolerance = models.FloatField(default=DEFAULT_FLOAT_TOLERANCE)
 
 class TestCase(models.Model):
     exercise = models.ForeignKey(CodingExercise, on_delete=models.CASCADE, related_name='test_cases')
-    input_data = models.TextField()
+    # Puste, gdy wejście jest zapisane w pliku (input_blob)
+    input_data = models.TextField(blank=True)
+    # input_data sparsowane raz przy zapisie (literały Pythona, format marshal)
+    parsed_input = models.BinaryField(null=True, blank=True, editable=False)
     expected_output = models.TextField(null=True, blank=True)
+    # Skrót rozwiązania wzorcowego, z którego wyliczono expected_output
+    solution_hash = models.CharField(max_length=64, blank=True, default='')
+    # Klucze plików (Kursy_Online.blobs) z dużymi wejściami i wynikami zamiast pól tekstowych
+    input_blob = models.CharField(max_length=64, blank=True, default='', editable=False)
+    parsed_input_blob = models.CharField(max_length=64, blank=True, default='', editable=False)
+    expected_output_blob = models.CharField(max_length=64, blank=True, default='', editable=False)
     is_hidden = models.BooleanField(default=False)
     order = models.PositiveIntegerField()
 
     class Meta:
         ordering = ['order']
 
+    def clean(self):
+        # Ta sama reguła co przy zapisie (signals.parse_test_case_input) - formularz pokazuje błąd przy polu
+        from .code_execution import TEST_INPUT_ERROR, parse_test_input
+        if (self.input_data or not self.input_blob) and parse_test_input(self.input_data) is None:
+            raise ValidationError({'input_data': TEST_INPUT_ERROR})
+
+    def grading_input(self):
+        """
+        Input as handed to graders: the text or, when stored in a file, a BlobRef
+        """
+        return BlobRef(self.input_blob) if self.input_blob else self.input_data
+
+    def grading_parsed_input(self):
+        if self.parsed_input_blob:
+            return BlobRef(self.parsed_input_blob)
+        # bytes - memoryview z bazy nie przechodzi przez pickle
+        return bytes(self.parsed_input) if self.parsed_input is not None else None
+
+    def grading_expected_output(self):
+        return BlobRef(self.expected_output_blob) if self.expected_output_blob else self.expected_output
+
+    def has_expected_output(self):
+        return bool(self.expected_output or self.expected_output_blob)
+
+    @property
+    def manual_expected_output(self):
+        """
+        Expected output entered by the instructor (not computed from the reference solution) - never overwritten
+        """
+        return not self.solution_hash and self.has_expected_output()
+
+    def expected_output_for(self, current_solution_hash):
+        """
+        Stored expected output usable for grading: computed from the current reference solution
+        or entered by the instructor; None when it has to come from the solution
+        """
+        if self.solution_hash == current_solution_hash or self.manual_expected_output:
+            return self.grading_expected_output()
+        return None
+
 '''class CodingExercise(models.Model):
     page = models.OneToOneField(Page, on_delete=models.CASCADE, primary_key=True)
     description = models.TextField()
@@ -192,6 +263,128 @@ class TestCase(models.Model):
     memory_limit = models.IntegerField(default=100*1024*1024)
     time_limit = models.IntegerField(default=5000)  '''
 
+class GradingJob(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('ERROR', 'Error')
+    ]
+    KIND_CHOICES = [
+        ('SUBMISSION', 'Submission'),
+        ('REGRADE', 'Regrade')
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='grading_jobs')
+    page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name='grading_jobs')
+    # Ocena jednego zgłoszenia albo ponowne ocenianie wszystkich zgłoszeń zadania (zlecone w panelu)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='SUBMISSION')
+    code = models.TextField()
+    language = models.CharField(max_length=20, default='python')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    result = models.JSONField(null=True, blank=True)
+    # Wyniki kolejnych testów zapisywane przez grading_worker w trakcie oceniania (czyta je submit_solution_stream)
+    progress = models.JSONField(default=list, blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Odświeżany przez grading_worker w trakcie oceniania - zadanie bez sygnału wraca do kolejki
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+class Submission(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submissions')
+    exercise = models.ForeignKey(CodingExercise, on_delete=models.CASCADE, related_name='submissions')
+    code = models.TextField()
+    code_hash = models.CharField(max_length=64)
+    language = models.CharField(max_length=20, default='python')
+    # Wersja zadania (rozwiązanie wzorcowe, limity, testy), względem której oceniono kod
+    exercise_version = models.CharField(max_length=64)
+    passed = models.BooleanField(default=False)
+    result = models.JSONField()
+    # Fazy każdego testu ({'execute', 'compare'} w sekundach, 'peak_memory' w bajtach),
+    # kompilacja raz na zgłoszenie i szczytowe zużycie pamięci całego zgłoszenia
+    test_timings = models.JSONField(default=list)
+    compile_time = models.FloatField(null=True, blank=True)
+    peak_memory = models.PositiveBigIntegerField(null=True, blank=True)
+    # Werdykt przepisany z wcześniejszego zgłoszenia identycznego kodu
+    cached = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'exercise', 'created_at']),
+            models.Index(fields=['exercise', 'code_hash', 'exercise_version']),
+        ]
+
+class GradingHistogram(models.Model):
+    """
+    Latency histogram of one grading phase of an exercise, updated with every graded
+    (not cached) submission. Buckets grow by a factor of 2 from 10 µs, so percentiles
+    are exact to within one bucket.
+    """
+    PHASE_CHOICES = [
+        ('compile', 'Compile'),
+        ('execute', 'Execute'),
+        ('compare', 'Compare')
+    ]
+    # Górne granice przedziałów w sekundach (10 µs ... ~84 s); ostatni przedział - wszystko powyżej
+    BUCKET_BOUNDS = [0.00001 * 2 ** i for i in range(24)]
+
+    exercise = models.ForeignKey(CodingExercise, on_delete=models.CASCADE, related_name='grading_histograms')
+    phase = models.CharField(max_length=10, choices=PHASE_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    # Suma czasów - udział zadania w czasie procesora oceniania
+    total_time = models.FloatField(default=0)
+    max_time = models.FloatField(default=0)
+    buckets = models.JSONField(default=list)
+    max_memory = models.PositiveBigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['exercise', 'phase']
+        ordering = ['-total_time']
+
+    def __str__(self):
+        return f"{self.exercise_id} {self.phase} ({self.count})"
+
+    def add(self, seconds: float):
+        buckets = self.buckets or [0] * (len(self.BUCKET_BOUNDS) + 1)
+        index = next((i for i, bound in enumerate(self.BUCKET_BOUNDS) if seconds <= bound), len(self.BUCKET_BOUNDS))
+        buckets[index] += 1
+        self.buckets = buckets
+        self.count += 1
+        self.total_time += seconds
+        self.max_time = max(self.max_time, seconds)
+
+    def percentile(self, q: float):
+        """
+        Estimated q-th percentile (0-100) in seconds, interpolated within its bucket
+        """
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.BUCKET_BOUNDS[index - 1] if index > 0 else 0.0
+                upper = self.BUCKET_BOUNDS[index] if index < len(self.BUCKET_BOUNDS) else self.max_time
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, self.max_time)
+            seen += bucket_count
+        return self.max_time
+
+    @property
+    def mean_time(self):
+        return self.total_time / self.count if self.count else None
+
 class UserProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     page = models.ForeignKey(Page, on_delete=models.CASCADE)
@@ -0,0 +1,187 @@
+import base64
+import binascii
+import datetime
+import decimal
+import hashlib
+import json
+from typing import Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _encode_value(value):
+    # Pełna precyzja - kursor musi wskazywać dokładnie ten wiersz
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a (sort key, id) pair. Each page is read with a WHERE on the
+    position of the last row instead of an OFFSET, so deep pages cost the same as the
+    first one and rows inserted meanwhile do not shift pages. No COUNT is issued unless
+    the client asks for the (cached, approximate) total with ?with_total=1.
+
+    The sort key comes from the sort/order query parameters (one of sort_fields) and
+    NULLs always go last; cursors are opaque and bound to the ordering they were issued for.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    total_query_param = 'with_total'
+    page_size = 10
+    max_page_size = 50
+    sort_fields = ('created_at',)
+    default_ordering = ('created_at', True)
+    invalid_cursor_message = 'Nieprawidłowy kursor'
+
+    def __init__(self, default_ordering: Optional[Tuple[str, bool]] = None):
+        if default_ordering is not None:
+            self.default_ordering = default_ordering
+
+    def get_ordering(self, request) -> Tuple[str, bool]:
+        sort = request.query_params.get('sort')
+        if sort in self.sort_fields:
+            return sort, request.query_params.get('order', 'asc') == 'desc'
+        return self.default_ordering
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, row, previous=False) -> str:
+        field, descending = self.ordering
+        payload = {'o': field, 'd': int(descending), 'v': _encode_value(getattr(row, field)), 'i': row.pk}
+        if previous:
+            payload['p'] = 1
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            if (payload['o'], bool(payload['d'])) != self.ordering:
+                raise ValueError('ordering changed')
+            value = payload['v']
+            if value is not None:
+                value = self._field.to_python(value)
+            return value, int(payload['i']), bool(payload.get('p'))
+        except (KeyError, TypeError, ValueError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _resolve_field(self, queryset):
+        field = self.ordering[0]
+        annotation = queryset.query.annotations.get(field)
+        if annotation is not None:
+            return annotation.output_field, True
+        model_field = queryset.model._meta.get_field(field)
+        return model_field, model_field.null
+
+    def _order(self, queryset, reverse: bool):
+        field, descending = self.ordering
+        if reverse:
+            descending = not descending
+        # Odwrócona kolejność (strona wstecz) ma NULL-e na początku
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        key = F(field).desc(**nulls) if descending else F(field).asc(**nulls)
+        return queryset.order_by(key, '-pk' if descending else 'pk')
+
+    def _beyond(self, value, pk, reverse: bool) -> Q:
+        """
+        Rows after the (value, pk) position in the current ordering, or before it when reverse
+        """
+        field, descending = self.ordering
+        later = 'lt' if descending != reverse else 'gt'
+        if not reverse:
+            if value is None:
+                return Q(**{f'{field}__isnull': True, f'pk__{later}': pk})
+            condition = Q(**{f'{field}__{later}': value}) | Q(**{field: value, f'pk__{later}': pk})
+            return condition | Q(**{f'{field}__isnull': True}) if self._nullable else condition
+        if value is None:
+            return Q(**{f'{field}__isnull': False}) | Q(**{f'{field}__isnull': True, f'pk__{later}': pk})
+        return Q(**{f'{field}__isnull': False}) & (
+            Q(**{f'{field}__{later}': value}) | Q(**{field: value, f'pk__{later}': pk})
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request)
+        self._field, self._nullable = self._resolve_field(queryset)
+        page_size = self.get_page_size(request)
+        self.total = self.get_total(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+        if cursor is not None:
+            queryset = queryset.filter(self._beyond(cursor[0], cursor[1], reverse))
+        rows = list(self._order(queryset, reverse)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Strona wstecz: dalej na pewno coś jest (stamtąd przyszliśmy), wcześniej - jeśli pobrano nadmiarowy wiersz
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else cursor is not None
+        self.next_cursor = self.encode_cursor(rows[-1]) if rows and has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], previous=True) if rows and has_previous else None
+        self.page = rows
+        return rows
+
+    def get_total(self, queryset, request) -> Optional[int]:
+        if request.query_params.get(self.total_query_param) not in ('1', 'true'):
+            return None
+        # Liczba wyników może być nieaktualna o czas życia wpisu - wystarczy do "ok. N kursów"
+        cache = caches[_setting('PAGINATION_TOTAL_CACHE', 'default')]
+        counted = queryset.order_by()
+        key = 'keyset-total:' + hashlib.sha256(str(counted.query).encode('utf-8')).hexdigest()
+        total = cache.get(key)
+        if total is None:
+            total = counted.count()
+            cache.set(key, total, _setting('PAGINATION_TOTAL_CACHE_TIMEOUT', 300))
+        return total
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.total is not None:
+            response['total'] = self.total
+        response['results'] = data
+        return Response(response)
+
+
+class CoursePagination(KeysetPagination):
+    sort_fields = ('created_at', 'price', 'average_rating', 'title')
+
+
+class ReviewPagination(KeysetPagination):
+    sort_fields = ('created_at', 'rating')
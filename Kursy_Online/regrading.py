@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from django.db import transaction
+from django.utils import timezone
+from .grading import build_test_cases, exercise_version, find_cached_verdict, grade_code
+from .models import CodingExercise, Submission, UserProgress
+from .sandbox import get_sandbox_pool
+from .telemetry import test_phase_timings
+from .utils import refresh_expected_outputs
+
+
+REGRADE_FIELDS = ['result', 'passed', 'exercise_version', 'test_timings', 'compile_time', 'peak_memory', 'cached']
+
+
+def _grade(coding_exercise: CodingExercise, code: str, language: str, test_cases: List[Dict[str, Any]]):
+    # Równolegle oceniane są różne zgłoszenia, więc testy jednego zgłoszenia idą po kolei
+    verdict, results = grade_code(coding_exercise, code, language, test_cases, parallelism=1)
+    test_timings = test_phase_timings(results['results'])
+    memory = [timings['peak_memory'] for timings in test_timings if timings['peak_memory'] is not None]
+    return {
+        'result': verdict,
+        'passed': verdict['success'],
+        'test_timings': test_timings,
+        'compile_time': results.get('compile_time'),
+        'peak_memory': max(memory) if memory else None
+    }
+
+
+def _stored_verdict(submission: Submission) -> Dict[str, Any]:
+    return {
+        'result': submission.result,
+        'passed': submission.passed,
+        'test_timings': submission.test_timings,
+        'compile_time': submission.compile_time,
+        'peak_memory': submission.peak_memory
+    }
+
+
+def regrade_exercise(coding_exercise: CodingExercise, batch_size: int = 500, workers: Optional[int] = None,
+                     progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    """
+    Regrade every stored submission of the exercise against its current version
+    (reference solution, limits, tests) and bring UserProgress in line with the new verdicts.
+
+    Submissions are read in id order in batches; byte-identical code is graded once and the
+    distinct programs of a batch are graded in parallel across the sandbox pool. Each batch is
+    written with bulk_update as soon as it is graded and submissions already graded against the
+    current version are skipped, so an interrupted run resumes where it stopped.
+    """
+    # Oczekiwane wyniki policzone raz z góry, a nie przez rozwiązanie wzorcowe w każdym zgłoszeniu
+    test_cases = build_test_cases(coding_exercise)
+    if any(test_case['expected_output'] is None for test_case in test_cases):
+        refresh_expected_outputs(coding_exercise.pk)
+        test_cases = build_test_cases(coding_exercise)
+
+    version = exercise_version(coding_exercise)
+    submissions = Submission.objects.filter(exercise=coding_exercise)
+    stale = submissions.exclude(exercise_version=version).order_by('id')
+    stats = {'total': stale.count(), 'regraded': 0, 'graded': 0}
+    # (skrót kodu, język) -> werdykt bieżącej wersji zadania
+    verdicts = {}
+
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=workers or get_sandbox_pool().size) as executor:
+        while True:
+            batch = list(stale.filter(id__gt=last_id).only('id', 'code', 'code_hash', 'language', 'user_id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            to_grade = {}
+            for submission in batch:
+                key = (submission.code_hash, submission.language)
+                if key in verdicts or key in to_grade:
+                    continue
+                # Kod oceniony już wcześniej (także przez przerwane uruchomienie) względem tej wersji
+                stored = find_cached_verdict(coding_exercise, submission.code_hash, version, submission.language)
+                if stored is not None:
+                    verdicts[key] = _stored_verdict(stored)
+                else:
+                    to_grade[key] = submission.code
+
+            futures = {
+                key: executor.submit(_grade, coding_exercise, code, key[1], test_cases)
+                for key, code in to_grade.items()
+            }
+            for key, future in futures.items():
+                verdicts[key] = future.result()
+
+            for submission in batch:
+                key = (submission.code_hash, submission.language)
+                for field, value in verdicts[key].items():
+                    setattr(submission, field, value)
+                submission.exercise_version = version
+                # Jedno zgłoszenie na kod trzyma własny werdykt, pozostałe są jego kopiami
+                submission.cached = key not in to_grade
+                to_grade.pop(key, None)
+
+            with transaction.atomic():
+                Submission.objects.bulk_update(batch, REGRADE_FIELDS)
+            stats['regraded'] += len(batch)
+            stats['graded'] += len(futures)
+            if progress:
+                progress(stats)
+
+    stats['progress_updated'] = refresh_exercise_progress(coding_exercise, version, batch_size)
+    return stats
+
+
+def refresh_exercise_progress(coding_exercise: CodingExercise, version: str, batch_size: int = 500) -> int:
+    """
+    Mark the page as completed for exactly the users with a passing submission
+    under the given exercise version; returns the number of changed progress rows
+    """
+    page = coding_exercise.page
+    graded = Submission.objects.filter(exercise=coding_exercise, exercise_version=version)
+    users = set(graded.values_list('user_id', flat=True).distinct())
+    passed = set(graded.filter(passed=True).values_list('user_id', flat=True).distinct())
+    existing = {progress.user_id: progress for progress in UserProgress.objects.filter(page=page, user_id__in=users)}
+
+    now = timezone.now()
+    changed, created = [], []
+    for user_id in users:
+        completed = user_id in passed
+        progress = existing.get(user_id)
+        if progress is None:
+            if completed:
+                created.append(UserProgress(user_id=user_id, page=page, completed=True, completed_at=now))
+        elif progress.completed != completed:
+            progress.completed = completed
+            progress.completed_at = now if completed else None
+            changed.append(progress)
+
+    with transaction.atomic():
+        UserProgress.objects.bulk_update(changed, ['completed', 'completed_at'], batch_size=batch_size)
+        UserProgress.objects.bulk_create(created, batch_size=batch_size)
+    return len(changed) + len(created)
+
+
+def stale_exercises():
+    """
+    Exercises with at least one submission graded against an older version
+    """
+    exercises = []
+    for coding_exercise in CodingExercise.objects.filter(submissions__isnull=False).distinct():
+        version = exercise_version(coding_exercise)
+        if coding_exercise.submissions.exclude(exercise_version=version).exists():
+            exercises.append(coding_exercise)
+    return exercises
@@ -0,0 +1,380 @@
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from contextlib import ExitStack
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from .forkserver import recv_message, send_message
+from .isolation import NO_PROCESSES, IsolationError, isolate, limit_processes, remove_cgroup
+from .runner import FORK_LOCK, RunnerBusy, process_slot
+from .sandbox import WORKER_START_TIMEOUT, _apply_limits, _get_context
+
+
+# Czas na dokończenie fragmentu po przerwaniu (SIGINT) zanim proces zostanie zabity
+INTERRUPT_GRACE = 1.0
+
+
+class ReplHostUnavailable(RuntimeError):
+    pass
+
+
+def _setting(name: str, default):
+    value = getattr(settings, name, None)
+    return default if value is None else value
+
+
+def _kernel_main(conn, memory_limit: Optional[int]):
+    from .repl_kernel import serve
+
+    # Własna grupa procesów - SIGINT i SIGKILL trafiają do całej sesji
+    os.setsid()
+    # Proces nadzorujący przestrzeń PID (isolate) dziedziczy ignorowanie SIGINT, sesja ustawia własną obsługę
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Wypisywanie na poziomie deskryptorów nie trafia do logów serwera sesji
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    try:
+        layers = isolate(f'repl-{os.getpid()}', keep_fds=[conn.fileno()])
+        if NO_PROCESSES in layers:
+            limit_processes()
+    except (IsolationError, OSError, ValueError) as e:
+        conn.send(IsolationError(str(e)))
+        conn.close()
+        return
+    if memory_limit:
+        _apply_limits(None, memory_limit)
+    # Pierwsza wiadomość - zastosowane warstwy izolacji
+    conn.send(layers)
+
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    serve(conn)
+
+
+class ReplKernel:
+    """
+    Long-lived Python process holding one user's session namespace, forked from the session
+    host and isolated like a grading worker (isolation.isolate, no new processes). While alive
+    it holds one of the host-wide RUNNER_MAX_PROCESSES slots. A snippet running past its time
+    limit is interrupted with SIGINT, and the kernel is killed if that does not help.
+    """
+
+    def __init__(self, memory_limit: Optional[int] = None, slot_wait: float = 0):
+        self._slot = ExitStack()
+        self._slot.enter_context(process_slot(wait=slot_wait))
+        self.process = None
+        self.conn = None
+        self.cgroup = None
+        try:
+            ctx = _get_context()
+            self.conn, child_conn = ctx.Pipe()
+            self.process = ctx.Process(target=_kernel_main, args=(child_conn, memory_limit), daemon=True)
+            with FORK_LOCK:
+                self.process.start()
+            child_conn.close()
+            if getattr(settings, 'SANDBOX_CGROUP', None):
+                self.cgroup = os.path.join(str(settings.SANDBOX_CGROUP), f'repl-{self.process.pid}')
+
+            try:
+                layers = self.conn.recv() if self.conn.poll(WORKER_START_TIMEOUT) else None
+            except (EOFError, OSError):
+                layers = None
+            if not isinstance(layers, list):
+                raise layers if isinstance(layers, IsolationError) else IsolationError(
+                    'Proces sesji nie uruchomił się'
+                )
+        except BaseException:
+            self.close()
+            raise
+        self.layers = layers
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def _signal(self, signum: int):
+        try:
+            os.killpg(self.process.pid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _read_response(self, timeout: float) -> Optional[Dict[str, Any]]:
+        if not self.conn.poll(timeout):
+            return None
+        return self.conn.recv()
+
+    def run(self, code: str, timeout: float, output_limit: int) -> Dict[str, Any]:
+        with self.lock:
+            self.last_used = time.monotonic()
+            start = time.monotonic()
+            try:
+                self.conn.send({'code': code, 'output_limit': output_limit})
+
+                response = self._read_response(timeout)
+                if response is None:
+                    self._signal(signal.SIGINT)
+                    response = self._read_response(INTERRUPT_GRACE)
+                    if response is None:
+                        self.close()
+                        return {
+                            'success': False,
+                            'stdout': '',
+                            'stderr': 'Przekroczono limit czasu wykonania - sesja została zrestartowana',
+                            'truncated': False,
+                            'restarted': True
+                        }
+                    response['timed_out'] = True
+            except (EOFError, OSError, ValueError):
+                # Proces zabity, np. po przekroczeniu limitu pamięci
+                self.close()
+                return {
+                    'success': False,
+                    'stdout': '',
+                    'stderr': 'Proces sesji został przerwany (przekroczono limit pamięci?) - sesja została zrestartowana',
+                    'truncated': False,
+                    'restarted': True
+                }
+            finally:
+                self.last_used = time.monotonic()
+
+            response['execution_time'] = time.monotonic() - start
+            return response
+
+    def close(self):
+        if self.process is not None and self.process.pid is not None:
+            if self.process.is_alive():
+                self._signal(signal.SIGKILL)
+                self.process.kill()
+            self.process.join()
+        if self.conn is not None:
+            self.conn.close()
+        remove_cgroup(self.cgroup)
+        self.cgroup = None
+        # Miejsce na proces zwalniane dopiero po zakończeniu procesu sesji
+        self._slot.close()
+
+
+class ReplSessionManager:
+    """
+    Kernels of the sessions served by this process. Kernels idle for longer than
+    REPL_IDLE_TIMEOUT are closed by a background reaper; when REPL_MAX_SESSIONS is
+    reached, or no RUNNER_MAX_PROCESSES slot is free, the least recently used idle
+    session is closed to make room.
+
+    Sessions live in one process only - with several server processes they go through
+    the session host (`python manage.py repl_host`, see get_repl_manager).
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self.pid = os.getpid()
+
+    def _start_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap_forever, daemon=True)
+            self._reaper.start()
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(max(1.0, _setting('REPL_IDLE_TIMEOUT', 600) / 10))
+            self.reap_idle()
+
+    def reap_idle(self) -> int:
+        cutoff = time.monotonic() - _setting('REPL_IDLE_TIMEOUT', 600)
+        with self._lock:
+            idle = [
+                key for key, kernel in self._sessions.items()
+                if not kernel.is_alive() or (kernel.last_used < cutoff and not kernel.lock.locked())
+            ]
+            kernels = [self._sessions.pop(key) for key in idle]
+        for kernel in kernels:
+            kernel.close()
+        return len(kernels)
+
+    def _pop_least_recently_used(self) -> Optional[ReplKernel]:
+        idle = [key for key, kernel in self._sessions.items() if not kernel.lock.locked()]
+        if not idle:
+            return None
+        return self._sessions.pop(min(idle, key=lambda k: self._sessions[k].last_used))
+
+    def _start_kernel(self) -> ReplKernel:
+        memory_limit = _setting('REPL_MEMORY_LIMIT', 256 * 1024 * 1024)
+        try:
+            return ReplKernel(memory_limit=memory_limit)
+        except RunnerBusy:
+            # Wszystkie miejsca zajęte - zwalniamy to zajmowane przez najdawniej używaną sesję
+            evicted = self._pop_least_recently_used()
+            if evicted is None:
+                raise
+            evicted.close()
+            return ReplKernel(memory_limit=memory_limit)
+
+    def _get_kernel(self, key) -> ReplKernel:
+        evicted = None
+        with self._lock:
+            kernel = self._sessions.get(key)
+            if kernel is not None and kernel.is_alive():
+                return kernel
+            if kernel is not None:
+                del self._sessions[key]
+                kernel.close()
+
+            if len(self._sessions) >= _setting('REPL_MAX_SESSIONS', 20):
+                evicted = self._pop_least_recently_used()
+                if evicted is not None:
+                    evicted.close()
+            kernel = self._start_kernel()
+            self._sessions[key] = kernel
+            self._start_reaper()
+        return kernel
+
+    def run(self, key, code: str) -> Dict[str, Any]:
+        kernel = self._get_kernel(key)
+        result = kernel.run(
+            code,
+            timeout=_setting('REPL_TIMEOUT', 10),
+            output_limit=_setting('RUNNER_OUTPUT_LIMIT', 64 * 1024)
+        )
+        if result.get('restarted'):
+            with self._lock:
+                if self._sessions.get(key) is kernel:
+                    del self._sessions[key]
+        return result
+
+    def close(self, key) -> bool:
+        with self._lock:
+            kernel = self._sessions.pop(key, None)
+        if kernel is None:
+            return False
+        kernel.close()
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            kernels = list(self._sessions.values())
+            self._sessions = {}
+        for kernel in kernels:
+            kernel.close()
+
+
+class _ReplRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        manager = self.server.manager
+        try:
+            request = recv_message(self.request)
+        except Exception:
+            return
+        try:
+            if request['action'] == 'run':
+                response = {'result': manager.run(request['key'], request['code'])}
+            elif request['action'] == 'close':
+                response = {'result': manager.close(request['key'])}
+            else:
+                response = {'error': f"Nieznana operacja: {request['action']}"}
+        except RunnerBusy as e:
+            response = {'busy': str(e)}
+        except Exception as e:
+            response = {'error': str(e)}
+        try:
+            send_message(self.request, response)
+        except OSError:
+            pass
+
+
+class ReplHost(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Session host: the one process that owns every REPL kernel, so a user's session is the same
+    whichever server process handles the request. Clients send one length-prefixed pickle per
+    connection ({"action": "run" | "close", "key", "code"}) over a Unix socket.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        self.socket_path = str(socket_path)
+        self.manager = ReplSessionManager()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        super().__init__(self.socket_path, _ReplRequestHandler)
+        # Tylko użytkownik serwera może korzystać z sesji
+        os.chmod(self.socket_path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        self.manager.shutdown()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class ReplHostClient:
+    """
+    Client side of ReplHost with the ReplSessionManager interface (run/close/shutdown)
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = str(socket_path)
+        self.pid = os.getpid()
+
+    def _request(self, request: Dict[str, Any]) -> Any:
+        # Start procesu sesji, fragment kodu i jego przerwanie - dalej czekamy tylko na zawieszony serwer
+        timeout = WORKER_START_TIMEOUT + _setting('REPL_TIMEOUT', 10) + INTERRUPT_GRACE + 5
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        except (AttributeError, OSError) as e:
+            raise ReplHostUnavailable(str(e))
+        try:
+            sock.settimeout(timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                raise ReplHostUnavailable(
+                    'Serwer sesji Pythona nie działa - uruchom `python manage.py repl_host`'
+                )
+            send_message(sock, request)
+            try:
+                response = recv_message(sock)
+            except (EOFError, OSError):
+                raise ReplHostUnavailable('Serwer sesji Pythona nie odpowiedział')
+        finally:
+            sock.close()
+        if 'busy' in response:
+            raise RunnerBusy(response['busy'])
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def run(self, key, code: str) -> Dict[str, Any]:
+        return self._request({'action': 'run', 'key': key, 'code': code})
+
+    def close(self, key) -> bool:
+        return self._request({'action': 'close', 'key': key})
+
+    def shutdown(self):
+        pass
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_repl_manager():
+    """
+    Where sessions live: the session host at REPL_SOCKET, or this process when REPL_SOCKET
+    is not set (only for a single server process, e.g. runserver)
+    """
+    global _manager
+    socket_path = getattr(settings, 'REPL_SOCKET', None)
+    with _manager_lock:
+        if socket_path:
+            if not isinstance(_manager, ReplHostClient) or _manager.socket_path != str(socket_path):
+                _manager = ReplHostClient(socket_path)
+        elif not isinstance(_manager, ReplSessionManager) or _manager.pid != os.getpid():
+            _manager = ReplSessionManager()
+        return _manager
@@ -0,0 +1,92 @@
+"""
+Kernel of a persistent Python session, run in an isolated process forked by Kursy_Online.repl.
+
+Receives one request per message ({"code": ..., "output_limit": ...}) on a multiprocessing
+connection and answers with one message ({"success", "stdout", "stderr", "truncated"}).
+All snippets share one namespace, so variables and imports survive between runs.
+"""
+import ast
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+
+class CappedBuffer:
+    def __init__(self, limit):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.truncated = False
+
+    def write(self, text):
+        room = self.limit - self.size
+        if len(text) > room:
+            self.truncated = True
+            text = text[:max(room, 0)]
+        self.parts.append(text)
+        self.size += len(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+
+def run_snippet(code, namespace):
+    """
+    Execute a snippet like an interactive prompt: the value of a trailing expression is printed
+    """
+    tree = ast.parse(code, '<session>', 'exec')
+    last = None
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        last = ast.Expression(tree.body.pop().value)
+
+    exec(compile(tree, '<session>', 'exec'), namespace)
+    if last is not None:
+        value = eval(compile(last, '<session>', 'eval'), namespace)
+        if value is not None:
+            print(repr(value))
+
+
+def serve(conn):
+    """
+    Answer requests from conn until it is closed; all snippets share one namespace
+    """
+    namespace = {'__name__': '__main__'}
+    while True:
+        try:
+            request = conn.recv()
+        except KeyboardInterrupt:
+            # SIGINT spóźniony względem zakończonego fragmentu - czekamy na następne żądanie
+            continue
+        except (EOFError, OSError):
+            return
+        stdout = CappedBuffer(request.get('output_limit') or 64 * 1024)
+        stderr = CappedBuffer(request.get('output_limit') or 64 * 1024)
+        success = True
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                try:
+                    run_snippet(request['code'], namespace)
+                except KeyboardInterrupt:
+                    success = False
+                    print('Przekroczono limit czasu wykonania', file=sys.stderr)
+                except SystemExit:
+                    success = False
+                    print('Wyjście z sesji przez exit() nie jest obsługiwane', file=sys.stderr)
+                except BaseException as e:
+                    success = False
+                    tb = e.__traceback__.tb_next if e.__traceback__ else None
+                    traceback.print_exception(type(e), e, tb)
+        except KeyboardInterrupt:
+            # SIGINT tuż po zakończeniu fragmentu - wynik i tak jest gotowy
+            pass
+
+        conn.send({
+            'success': success,
+            'stdout': stdout.getvalue(),
+            'stderr': stderr.getvalue(),
+            'truncated': stdout.truncated or stderr.truncated
+        })
@@ -0,0 +1,355 @@
+import hashlib
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows - bez blokad między procesami i rlimitów
+    fcntl = None
+    resource = None
+
+from django.conf import settings
+
+
+# Nazwa pliku źródłowego w katalogu uruchomienia (Java wymaga zgodności z nazwą klasy)
+SOURCE_NAME = 'program'
+READ_CHUNK = 64 * 1024
+
+
+# fork() bez exec() (procesy puli piaskownicy) nie może przeplatać się z tworzeniem procesu w execute():
+# potomek odziedziczyłby potoki Popen i proces uruchamiający nigdy nie dostałby EOF
+FORK_LOCK = threading.Lock()
+
+
+class CompilationError(RuntimeError):
+    pass
+
+
+class RunnerBusy(RuntimeError):
+    pass
+
+
+def _setting(name: str, default):
+    value = getattr(settings, name, None)
+    return default if value is None else value
+
+
+_local_slots = None
+_local_slots_lock = threading.Lock()
+
+
+@contextmanager
+def process_slot(wait: Optional[float] = None):
+    """
+    Host-wide cap on concurrently running child processes (RUNNER_MAX_PROCESSES).
+    Slots are flock()ed lock files, so the limit holds across all server worker processes;
+    without fcntl it falls back to a per-process semaphore.
+    """
+    slots = _setting('RUNNER_MAX_PROCESSES', 8)
+    wait = _setting('RUNNER_QUEUE_TIMEOUT', 10) if wait is None else wait
+
+    if fcntl is None:
+        global _local_slots
+        with _local_slots_lock:
+            if _local_slots is None:
+                _local_slots = threading.BoundedSemaphore(slots)
+        if not _local_slots.acquire(timeout=wait):
+            raise RunnerBusy('Serwer jest przeciążony, spróbuj ponownie za chwilę')
+        try:
+            yield
+        finally:
+            _local_slots.release()
+        return
+
+    slot_dir = os.path.join(tempfile.gettempdir(), 'kursy_online_runner_slots')
+    os.makedirs(slot_dir, exist_ok=True)
+    deadline = time.monotonic() + wait
+    while True:
+        for slot in range(slots):
+            handle = open(os.path.join(slot_dir, f'slot-{slot}.lock'), 'a')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            return
+        if time.monotonic() >= deadline:
+            raise RunnerBusy('Serwer jest przeciążony, spróbuj ponownie za chwilę')
+        time.sleep(0.05)
+
+
+def _kill_group(process: subprocess.Popen):
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def _memory_limiter(memory_limit: Optional[int]):
+    """
+    preexec_fn limiting the child's memory before exec (prlimit after the spawn would leave
+    the program a moment without the limit). RLIMIT_DATA rather than RLIMIT_AS: runtimes
+    such as Node.js or the JVM reserve far more address space than they use and would not
+    start under an address space limit, while the data limit counts only writable memory.
+    """
+    if not memory_limit or resource is None:
+        return None
+    limit = getattr(resource, 'RLIMIT_DATA', resource.RLIMIT_AS)
+
+    def apply():
+        resource.setrlimit(limit, (memory_limit, memory_limit))
+    return apply
+
+
+def execute(command: List[str], cwd: Optional[str] = None, timeout: Optional[float] = None,
+            cpu_time: Optional[int] = None, output_limit: Optional[int] = None,
+            stdin: Optional[str] = None, stdin_path: Optional[str] = None,
+            memory_limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run a command in its own process group with bounded resources:
+    wall-clock timeout and CPU-time limit (both kill the whole group), data segment
+    of at most memory_limit bytes (set before exec, so allocations beyond it fail) and
+    stdout/stderr captured incrementally and truncated at output_limit bytes each. Holds a host-wide
+    process slot for the duration. Returns the output together with exit status,
+    wall/CPU time and peak RSS (bytes) of the child. Standard input is the stdin text
+    or the file at stdin_path.
+    """
+    timeout = _setting('RUNNER_TIMEOUT', 10) if timeout is None else timeout
+    cpu_time = _setting('RUNNER_CPU_TIME', 5) if cpu_time is None else cpu_time
+    output_limit = _setting('RUNNER_OUTPUT_LIMIT', 64 * 1024) if output_limit is None else output_limit
+
+    stdin_file = None
+    if stdin_path is not None:
+        stdin_file = open(stdin_path, 'rb')
+    elif stdin is not None:
+        # Wejście z pliku, nie z potoku - potok do zapisu odziedziczony przez proces
+        # utworzony później przez fork() blokowałby EOF na zawsze
+        stdin_file = tempfile.TemporaryFile()
+        stdin_file.write(stdin.encode('utf-8'))
+        stdin_file.seek(0)
+
+    with process_slot():
+        start = time.monotonic()
+        try:
+            with FORK_LOCK:
+                process = subprocess.Popen(
+                    command, cwd=cwd,
+                    stdin=stdin_file if stdin_file is not None else subprocess.DEVNULL,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                    start_new_session=True,
+                    preexec_fn=_memory_limiter(memory_limit)
+                )
+        finally:
+            if stdin_file is not None:
+                stdin_file.close()
+        if cpu_time and resource is not None and hasattr(resource, 'prlimit'):
+            try:
+                resource.prlimit(process.pid, resource.RLIMIT_CPU, (cpu_time, cpu_time + 1))
+            except (ProcessLookupError, PermissionError, OSError):
+                pass
+
+        state = {'timed_out': False, 'truncated': False}
+        captured = {'stdout': bytearray(), 'stderr': bytearray()}
+
+        def read(name, stream):
+            buffer = captured[name]
+            while True:
+                chunk = stream.read1(READ_CHUNK) if hasattr(stream, 'read1') else stream.read(READ_CHUNK)
+                if not chunk:
+                    break
+                room = output_limit - len(buffer)
+                if len(chunk) > room:
+                    buffer.extend(chunk[:max(room, 0)])
+                    if not state['truncated']:
+                        # Limit wyjścia przekroczony - dalsze wypisywanie nie ma sensu
+                        state['truncated'] = True
+                        _kill_group(process)
+                else:
+                    buffer.extend(chunk)
+            stream.close()
+
+        readers = [
+            threading.Thread(target=read, args=('stdout', process.stdout), daemon=True),
+            threading.Thread(target=read, args=('stderr', process.stderr), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+
+        def on_timeout():
+            if process.returncode is None:
+                state['timed_out'] = True
+                _kill_group(process)
+
+        timer = threading.Timer(timeout, on_timeout) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+
+        try:
+            usage = None
+            if hasattr(os, 'wait4'):
+                # wait4 zwraca zużycie zasobów zakończonego procesu potomnego
+                _, status, usage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+            else:
+                process.wait()
+        finally:
+            if timer:
+                timer.cancel()
+            # Procesy pozostawione w tle przez program też kończą się razem z nim
+            _kill_group(process)
+            for reader in readers:
+                reader.join()
+
+        wall_time = time.monotonic() - start
+
+    cpu_used = usage.ru_utime + usage.ru_stime if usage else None
+    # ru_maxrss: kilobajty na Linuksie, bajty na macOS
+    peak_rss = None
+    if usage:
+        peak_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    # Po przekroczeniu RLIMIT_CPU jądro wysyła SIGXCPU
+    cpu_exceeded = bool(cpu_time) and (
+        (hasattr(signal, 'SIGXCPU') and process.returncode == -signal.SIGXCPU)
+        or (cpu_used is not None and cpu_used >= cpu_time)
+    )
+
+    return {
+        'returncode': process.returncode,
+        'stdout': captured['stdout'].decode('utf-8', errors='replace'),
+        'stderr': captured['stderr'].decode('utf-8', errors='replace'),
+        'timed_out': state['timed_out'] or cpu_exceeded,
+        'truncated': state['truncated'],
+        'wall_time': wall_time,
+        'cpu_time': cpu_used,
+        'peak_rss': peak_rss
+    }
+
+
+def execution_error(result: Dict[str, Any]) -> str:
+    """
+    stderr of a finished run with a note about the limit that stopped it
+    """
+    error = result['stderr']
+    if result['timed_out']:
+        error += '\nPrzekroczono limit czasu wykonania'
+    elif result['truncated']:
+        error += '\nPrzekroczono limit rozmiaru wyjścia'
+    return error.strip()
+
+
+def execution_metadata(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: result[key] for key in ('wall_time', 'cpu_time', 'peak_rss', 'timed_out', 'truncated')}
+
+
+def artifact_cache_dir() -> str:
+    path = getattr(settings, 'COMPILED_ARTIFACT_CACHE_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'kursy_online_artifacts'
+    )
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+
+def artifact_key(code: str, file_extension: str, compile_command: List[str]) -> str:
+    """
+    Content address of compiled artifacts: source plus the exact compiler command and flags
+    """
+    payload = json.dumps([file_extension, list(compile_command), code])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def write_source(workdir: str, code: str, file_extension: str) -> str:
+    path = os.path.join(workdir, SOURCE_NAME + file_extension)
+    with open(path, 'w', encoding='utf-8') as source:
+        source.write(code)
+    return path
+
+
+def _prune_artifact_cache(cache_dir: str):
+    max_entries = getattr(settings, 'COMPILED_ARTIFACT_CACHE_MAX_ENTRIES', 500)
+    entries = [
+        os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+        if not name.startswith('.')
+    ]
+    if len(entries) <= max_entries:
+        return
+    entries.sort(key=os.path.getmtime)
+    for path in entries[:len(entries) - max_entries]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def compile_cached(code: str, file_extension: str, compile_command: List[str],
+                   cache_dir: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    Return (directory with compiled artifacts, cache hit). Unchanged code compiled with
+    the same command is not compiled again. The compiler runs in its own build directory
+    and the result is published with an atomic rename, so concurrent requests never
+    see half-written artifacts.
+    """
+    cache_dir = cache_dir or artifact_cache_dir()
+    entry = os.path.join(cache_dir, artifact_key(code, file_extension, compile_command))
+    if os.path.isdir(entry):
+        os.utime(entry)
+        return entry, True
+
+    build_dir = tempfile.mkdtemp(prefix='.build-', dir=cache_dir)
+    try:
+        source_path = write_source(build_dir, code, file_extension)
+        process = execute(
+            list(compile_command) + [os.path.basename(source_path)],
+            cwd=build_dir,
+            timeout=_setting('RUNNER_COMPILE_TIMEOUT', 30),
+            cpu_time=_setting('RUNNER_COMPILE_TIMEOUT', 30)
+        )
+        if process['returncode'] != 0:
+            raise CompilationError(f"Kompilacja nieudana: {execution_error(process)}")
+        os.unlink(source_path)
+
+        try:
+            os.rename(build_dir, entry)
+        except OSError:
+            # Ten sam kod skompilowany równolegle przez inne żądanie - zostaje tamten wynik
+            if not os.path.isdir(entry):
+                raise
+        else:
+            build_dir = None
+    finally:
+        if build_dir is not None:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    _prune_artifact_cache(cache_dir)
+    return entry, False
+
+
+def prepare_workdir(workdir: str, code: str, file_extension: str,
+                    compile_command: Optional[List[str]] = None, cache_dir: Optional[str] = None) -> bool:
+    """
+    Put the program into a private working directory: compiled artifacts copied
+    from the cache when compile_command is given, otherwise the source file.
+    Returns True when the artifacts came from the cache.
+    """
+    if not compile_command:
+        write_source(workdir, code, file_extension)
+        return False
+
+    artifacts, cached = compile_cached(code, file_extension, compile_command, cache_dir)
+    shutil.copytree(artifacts, workdir, dirs_exist_ok=True)
+    return cached
@@ -0,0 +1,429 @@
+import atexit
+import math
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows - brak rlimitów, zostaje sam limit czasu
+    resource = None
+
+from django.conf import settings
+from .isolation import NO_PROCESSES, IsolationError, die_with_parent, is_isolated, isolate, limit_processes, remove_cgroup
+from .runner import FORK_LOCK
+
+
+# Dodatkowy czas na komunikację z procesem ponad limit czasu zadania
+WALL_CLOCK_GRACE = 1.0
+# Czas na uruchomienie i izolację nowego procesu oceniającego
+WORKER_START_TIMEOUT = 10
+MEMORY_LIMIT_ERROR = 'Przekroczono limit pamięci'
+
+
+class SandboxTimeout(Exception):
+    pass
+
+
+def _get_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')
+
+
+def _address_space_size() -> int:
+    """
+    Current virtual memory size of this process in bytes (0 if unknown)
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _apply_limits(time_limit: Optional[float], memory_limit: Optional[int]):
+    """
+    Limit CPU time and address space of the current process for a single job.
+    Limits are relative to what the worker already uses, so a warm worker
+    keeps its own footprint and the job gets the full budget on top of it.
+    """
+    if resource is None:
+        return
+
+    if time_limit:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(math.ceil(usage.ru_utime + usage.ru_stime + time_limit))
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    if memory_limit:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = _address_space_size() + memory_limit
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _memory_status() -> Dict[str, int]:
+    """
+    Resident set size (VmRSS) and its high-water mark (VmHWM) of this process in bytes
+    """
+    status = {}
+    try:
+        with open('/proc/self/status') as proc_status:
+            for line in proc_status:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'VmHWM'):
+                    status[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        pass
+    return status
+
+
+def _reset_peak_memory() -> Optional[int]:
+    """
+    Reset the RSS high-water mark so it covers only the next job (Linux);
+    returns the RSS the job starts from
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+    return _memory_status().get('VmRSS')
+
+
+def _peak_memory(baseline: Optional[int]) -> Optional[int]:
+    """
+    Peak memory the job used on top of the warm worker's own footprint
+    """
+    peak = _memory_status().get('VmHWM')
+    if peak is None or baseline is None:
+        return None
+    return max(0, peak - baseline)
+
+
+def _reset_limits():
+    if resource is None:
+        return
+    for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (hard, hard))
+
+
+def _picklable(result: Any) -> Any:
+    """
+    User code may return objects that cannot cross the process boundary
+    (lambdas, generators...). Replace them with their repr.
+    """
+    try:
+        pickle.dumps(result)
+        return result
+    except Exception:
+        if isinstance(result, dict):
+            return {key: _picklable(value) for key, value in result.items()}
+        return repr(result)
+
+
+def run_job(func: Callable[..., Dict[str, Any]], args, time_limit: Optional[float], memory_limit: Optional[int]) -> Any:
+    """
+    Run a single grading job in the current (worker) process under CPU/memory limits
+    """
+    baseline = _reset_peak_memory()
+    try:
+        _apply_limits(time_limit, memory_limit)
+        result = func(*args)
+    except MemoryError:
+        result = {
+            'success': False,
+            'error': MEMORY_LIMIT_ERROR
+        }
+    except BaseException as e:
+        result = {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+    finally:
+        _reset_limits()
+
+    if isinstance(result, dict):
+        result.setdefault('peak_memory', _peak_memory(baseline))
+    return _picklable(result)
+
+
+def _read_all(fd: int) -> bytes:
+    chunks = []
+    while True:
+        chunk = os.read(fd, 1024 * 1024)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def run_forked_job(job, layers) -> Any:
+    """
+    Run a job in a child forked from the warm worker. The child gets a copy-on-write
+    snapshot of the worker, so whatever the submission changes (module globals, builtins,
+    caches) disappears with it and the next job starts from the same clean state.
+    """
+    func, args, time_limit, memory_limit = job
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            die_with_parent()
+            try:
+                if NO_PROCESSES in layers:
+                    limit_processes()
+            except (IsolationError, OSError, ValueError) as e:
+                result = {
+                    'success': False,
+                    'error': f'Nie udało się zablokować tworzenia procesów: {e}'
+                }
+            else:
+                result = run_job(func, args, time_limit, memory_limit)
+            with os.fdopen(write_fd, 'wb') as output:
+                pickle.dump(result, output)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    try:
+        data = _read_all(read_fd)
+    finally:
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+    try:
+        return pickle.loads(data)
+    except (pickle.UnpicklingError, EOFError, ValueError):
+        # Proces zadania zabity przez rlimit (SIGXCPU) lub brak pamięci - proces oceniający działa dalej
+        return {
+            'success': False,
+            'error': 'Proces oceniający został przerwany (przekroczono limit czasu lub pamięci)'
+        }
+
+
+def _worker_main(conn):
+    try:
+        layers = isolate(f'worker-{os.getpid()}', keep_fds=[conn.fileno()])
+    except IsolationError as e:
+        conn.send(e)
+        conn.close()
+        return
+    # Pierwsza wiadomość - zastosowane warstwy izolacji
+    conn.send(layers)
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+
+        # Kod użytkownika nigdy nie działa w długo żyjącym procesie - każde zadanie w świeżym procesie potomnym
+        conn.send(run_forked_job(job, layers))
+    conn.close()
+
+
+class SandboxWorker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        with FORK_LOCK:
+            self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.cgroup = None
+        if getattr(settings, 'SANDBOX_CGROUP', None):
+            self.cgroup = os.path.join(str(settings.SANDBOX_CGROUP), f'worker-{self.process.pid}')
+
+        try:
+            layers = self.conn.recv() if self.conn.poll(WORKER_START_TIMEOUT) else None
+        except (EOFError, OSError):
+            layers = None
+        if not isinstance(layers, list):
+            self.close(kill=True)
+            raise layers if isinstance(layers, IsolationError) else IsolationError(
+                'Proces oceniający nie uruchomił się'
+            )
+        self.layers = layers
+
+    def run(self, job, timeout: Optional[float]):
+        self.jobs += 1
+        self.conn.send(job)
+        if not self.conn.poll(timeout):
+            raise SandboxTimeout()
+        return self.conn.recv()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def close(self, kill: bool = False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        self.conn.close()
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        remove_cgroup(self.cgroup)
+
+
+class SandboxPool:
+    """
+    Pool of warm, pre-forked worker processes used for grading.
+    A worker runs each job in a fresh child forked from itself, with CPU/memory
+    rlimits applied, so no state survives from one job to the next; workers are
+    recycled after `max_jobs_per_worker` jobs or whenever they die or time out.
+    Where the kernel allows it workers also run in their own namespaces under
+    a seccomp filter (see isolation.isolate).
+    """
+
+    def __init__(self, size: Optional[int] = None, max_jobs_per_worker: Optional[int] = None):
+        self.size = size or getattr(settings, 'SANDBOX_POOL_SIZE', None) or os.cpu_count() or 2
+        self.max_jobs_per_worker = max_jobs_per_worker or getattr(settings, 'SANDBOX_MAX_JOBS_PER_WORKER', 100)
+        self.pid = os.getpid()
+        self._ctx = _get_context()
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._isolated = None
+
+    @property
+    def isolated(self) -> bool:
+        """
+        Whether the workers run in namespaces under the seccomp filter (starts one to find out)
+        """
+        if self._isolated is None:
+            self._release(self._acquire())
+        return bool(self._isolated)
+
+    def _spawn(self) -> SandboxWorker:
+        worker = SandboxWorker(self._ctx)
+        isolated = is_isolated(worker.layers)
+        self._isolated = isolated if self._isolated is None else self._isolated and isolated
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: SandboxWorker, kill: bool = False) -> Optional[SandboxWorker]:
+        worker.close(kill=kill)
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if self._closed:
+                return None
+            return self._spawn()
+
+    def _acquire(self) -> SandboxWorker:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Pula procesów została zamknięta')
+            if self._idle.empty() and len(self._workers) < self.size:
+                return self._spawn()
+        return self._idle.get()
+
+    def _release(self, worker: Optional[SandboxWorker]):
+        if worker is None:
+            return
+        if self._closed:
+            worker.close()
+            return
+        if not worker.is_alive() or worker.jobs >= self.max_jobs_per_worker:
+            worker = self._replace(worker)
+        if worker is not None:
+            self._idle.put(worker)
+
+    def run(self, func: Callable[..., Dict[str, Any]], *args,
+            time_limit: Optional[float] = None, memory_limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run func(*args) in a pooled worker and return its result dict
+        """
+        worker = self._acquire()
+        timeout = time_limit + WALL_CLOCK_GRACE if time_limit else None
+        try:
+            return worker.run((func, args, time_limit, memory_limit), timeout)
+        except SandboxTimeout:
+            worker = self._replace(worker, kill=True)
+            return {
+                'success': False,
+                'error': 'Przekroczono limit czasu wykonania'
+            }
+        except (EOFError, OSError):
+            # Proces zabity przez rlimit (SIGXCPU) lub brak pamięci
+            worker = self._replace(worker, kill=True)
+            return {
+                'success': False,
+                'error': 'Proces oceniający został przerwany (przekroczono limit czasu lub pamięci)'
+            }
+        finally:
+            self._release(worker)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers = []
+        for worker in workers:
+            worker.close()
+
+
+_pool = None
+_forkserver = None
+_pool_lock = threading.Lock()
+
+
+def get_local_pool() -> SandboxPool:
+    """
+    Process-wide pool, created lazily and re-created after a fork
+    (e.g. gunicorn --preload) since worker pipes are not shared across forks.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = SandboxPool()
+        return _pool
+
+
+def get_forkserver():
+    """
+    Client of the fork-server (`python manage.py forkserver`) when FORKSERVER_SOCKET
+    is configured and the server is running, otherwise None
+    """
+    global _forkserver
+    socket_path = getattr(settings, 'FORKSERVER_SOCKET', None)
+    if not socket_path or not hasattr(os, 'fork') or not os.path.exists(socket_path):
+        return None
+    with _pool_lock:
+        if _forkserver is None or _forkserver.socket_path != str(socket_path):
+            from .forkserver import ForkServerClient
+            _forkserver = ForkServerClient(socket_path, fallback=get_local_pool)
+        return _forkserver
+
+
+def get_sandbox_pool():
+    """
+    Where grading jobs run: the fork-server if it is up, the local pre-forked pool otherwise
+    """
+    return get_forkserver() or get_local_pool()
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None and _pool.pid == os.getpid():
+        _pool.shutdown()
@@ -0,0 +1,199 @@
+import re
+from typing import Dict, Iterable, Optional
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+
+SEARCH_TABLE = 'Kursy_Online_course_search'
+# Kolumny dokumentu kursu i ich wagi w rankingu (tytuł najważniejszy)
+SEARCH_COLUMNS = ('title', 'description', 'technologies', 'chapters', 'pages')
+SEARCH_WEIGHTS = {'title': 10.0, 'description': 2.0, 'technologies': 5.0, 'chapters': 3.0, 'pages': 1.0}
+_POSTGRES_WEIGHTS = {'title': 'A', 'description': 'C', 'technologies': 'B', 'chapters': 'C', 'pages': 'D'}
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query: str):
+    return _TOKEN.findall(query or '')[:20]
+
+
+class SearchBackend:
+    """
+    Course search index kept in the application database (table created by migration 0012).
+    Subclasses provide the vendor-specific SQL used to maintain it and to filter and rank a Course queryset,
+    so the full-text match runs in the same query as the catalog filters.
+    """
+    vendor = None
+
+    def update(self, course_id: int, document: Dict[str, str]):
+        pass
+
+    def delete(self, course_ids: Iterable[int]):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        """
+        Queryset narrowed to courses matching every term of the query, annotated with
+        search_rank (lower is better)
+        """
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    FTS5 table with the course id as rowid, ranked with bm25()
+    """
+    vendor = 'sqlite'
+
+    def update(self, course_id, document):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO "{SEARCH_TABLE}" (rowid, {", ".join(SEARCH_COLUMNS)}) '
+                f'VALUES (%s{", %s" * len(SEARCH_COLUMNS)})',
+                [course_id, *(document[column] for column in SEARCH_COLUMNS)]
+            )
+
+    def delete(self, course_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM "{SEARCH_TABLE}" WHERE rowid = %s', [(pk,) for pk in course_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{SEARCH_TABLE}"')
+
+    @staticmethod
+    def match_expression(query: str) -> Optional[str]:
+        # Każde słowo jako fraza w cudzysłowie z dopasowaniem prefiksu - składnia FTS5 z zapytania
+        # użytkownika (AND, NEAR, kolumna:) nie jest interpretowana
+        terms = tokenize(query)
+        return ' '.join(f'"{term}"*' for term in terms) or None
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if match is None:
+            return queryset.none()
+        course = f'"{queryset.model._meta.db_table}"."id"'
+        weights = ', '.join(str(SEARCH_WEIGHTS[column]) for column in SEARCH_COLUMNS)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM "{SEARCH_TABLE}" WHERE "{SEARCH_TABLE}" MATCH %s', (match,))
+        ).annotate(search_rank=RawSQL(
+            f'SELECT bm25("{SEARCH_TABLE}", {weights}) FROM "{SEARCH_TABLE}" '
+            f'WHERE "{SEARCH_TABLE}" MATCH %s AND rowid = {course}',
+            (match,)
+        ))
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Table with a weighted tsvector per course and a GIN index, ranked with ts_rank_cd()
+    """
+    vendor = 'postgresql'
+    config = 'simple'
+
+    def update(self, course_id, document):
+        vector = ' || '.join(
+            f"setweight(to_tsvector('{self.config}', %s), '{_POSTGRES_WEIGHTS[column]}')" for column in SEARCH_COLUMNS
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{SEARCH_TABLE}" (course_id, document) VALUES (%s, {vector}) '
+                f'ON CONFLICT (course_id) DO UPDATE SET document = EXCLUDED.document',
+                [course_id, *(document[column] for column in SEARCH_COLUMNS)]
+            )
+
+    def delete(self, course_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{SEARCH_TABLE}" WHERE course_id = ANY(%s)', [list(course_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE "{SEARCH_TABLE}"')
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        # Dopasowanie prefiksu jak w FTS5; słowa bez znaków specjalnych tsquery
+        tsquery = ' & '.join(f"'{term}':*" for term in terms)
+        course = f'"{queryset.model._meta.db_table}"."id"'
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT course_id FROM "{SEARCH_TABLE}" WHERE document @@ to_tsquery(\'{self.config}\', %s)', (tsquery,)
+        )).annotate(search_rank=RawSQL(
+            # ts_rank_cd rośnie z trafnością, a search_rank sortujemy rosnąco jak bm25()
+            f'SELECT -ts_rank_cd(document, to_tsquery(\'{self.config}\', %s)) FROM "{SEARCH_TABLE}" '
+            f'WHERE course_id = {course}',
+            (tsquery,)
+        ))
+
+
+class FallbackSearchBackend(SearchBackend):
+    """
+    Databases without a full-text index: substring match on title and description, no ranking
+    """
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return queryset.annotate(search_rank=RawSQL('0', ()))
+
+
+_BACKENDS = {backend.vendor: backend for backend in (SQLiteSearchBackend, PostgresSearchBackend)}
+
+
+def get_search_backend(vendor: Optional[str] = None) -> SearchBackend:
+    return _BACKENDS.get(vendor or connection.vendor, FallbackSearchBackend)()
+
+
+def course_document(course) -> Dict[str, str]:
+    """
+    Text indexed for a course: its own fields, technology names and chapter and page titles
+    """
+    chapters = course.chapters.prefetch_related('pages')
+    return {
+        'title': course.title,
+        'description': course.description or '',
+        'technologies': ' '.join(course.technologies.values_list('name', flat=True)),
+        'chapters': '\n'.join(chapter.title for chapter in chapters),
+        'pages': '\n'.join(page.title for chapter in chapters for page in chapter.pages.all())
+    }
+
+
+def index_course(course_id: int):
+    """
+    Rebuild the index entry of one course (removes it if the course no longer exists)
+    """
+    from .models import Course
+    backend = get_search_backend()
+    course = Course.objects.filter(pk=course_id).first()
+    if course is None:
+        backend.delete([course_id])
+    else:
+        backend.update(course.pk, course_document(course))
+
+
+def remove_courses(course_ids: Iterable[int]):
+    get_search_backend().delete(course_ids)
+
+
+def rebuild_index() -> int:
+    """
+    Index every course from scratch; returns the number of indexed courses
+    """
+    from .models import Course
+    backend = get_search_backend()
+    backend.clear()
+    count = 0
+    for course in Course.objects.iterator(chunk_size=500):
+        backend.update(course.pk, course_document(course))
+        count += 1
+    return count
+
+
+def search_courses(queryset: QuerySet, query: str) -> QuerySet:
+    return get_search_backend().search(queryset, query)
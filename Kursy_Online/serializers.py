@@ -2,6 +2,10 @@ from django.db import transaction
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from .code_execution import TEST_INPUT_ERROR, parse_test_input
+from .comparison import preview
+from .utils import schedule_expected_outputs_refresh
+from .languages import registry as language_registry
 from .models import LoginHistory, Technology, Course, Chapter, Page, PayoutHistory, ContentPage, ContentImage, ContentVideo, Quiz, QuizQuestion, QuizAnswer, Payment, CodingExercise, TestCase, CourseReview
 
 User = get_user_model()
@@ -155,13 +159,28 @@ class TestCaseSerializer(serializers.ModelSerializer):
         fields = ['id', 'exercise', 'input_data', 'expected_output', 'is_hidden', 'order']
         read_only_fields = ['exercise']
 
+    def validate_input_data(self, value):
+        if parse_test_input(value) is None:
+            raise serializers.ValidationError(TEST_INPUT_ERROR)
+        return value
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Wejścia i wyniki zapisane w plikach - w odpowiedzi tylko ich początek
+        if instance.input_blob:
+            data['input_data'] = preview(instance.grading_input())
+        if instance.expected_output_blob:
+            data['expected_output'] = preview(instance.grading_expected_output())
+        return data
+
 
 class CodingExerciseSerializer(serializers.ModelSerializer):
     test_cases = TestCaseSerializer(many=True, required=False)
 
     class Meta:
         model = CodingExercise
-        fields = ['page', 'description', 'initial_code', 'solution', 'test_cases']
+        fields = ['page', 'description', 'initial_code', 'solution', 'parallel_tests', 'fail_fast', 'comparison_mode',
+                  'float_tolerance', 'test_cases']
         read_only_fields = ['page']
 
     def create(self, validated_data):
@@ -287,7 +306,8 @@ class CodingExerciseSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CodingExercise
-        fields = ['page', 'description', 'initial_code', 'solution', 'test_cases']
+        fields = ['page', 'description', 'initial_code', 'solution', 'parallel_tests', 'fail_fast', 'comparison_mode',
+                  'float_tolerance', 'test_cases']
         read_only_fields = ['page']
 
     def create(self, validated_data):
@@ -303,11 +323,19 @@ class CodingExerciseSerializer(serializers.ModelSerializer):
         print(f"CodingExerciseSerializer.update() called with data: {validated_data}")
         
         try:
+            solution_changed = validated_data.get('solution', instance.solution) != instance.solution
             instance.description = validated_data.get('description', instance.description)
             instance.initial_code = validated_data.get('initial_code', instance.initial_code)
             instance.solution = validated_data.get('solution', instance.solution)
+            instance.parallel_tests = validated_data.get('parallel_tests', instance.parallel_tests)
+            instance.fail_fast = validated_data.get('fail_fast', instance.fail_fast)
+            instance.comparison_mode = validated_data.get('comparison_mode', instance.comparison_mode)
+            instance.float_tolerance = validated_data.get('float_tolerance', instance.float_tolerance)
             instance.save()
 
+            if solution_changed:
+                schedule_expected_outputs_refresh(instance.pk)
+
             if 'test_cases' in validated_data:
                 print("Updating test cases...")
                 
@@ -321,13 +349,14 @@ class CourseSerializer(serializers.ModelSerializer):
     technologies = TechnologySerializer(many=True, required=False)
     reviews = CourseReviewSerializer(many=True, read_only=True)
     average_rating = serializers.FloatField(read_only=True)
-    total_reviews = serializers.IntegerField(read_only=True)
+    total_reviews = serializers.IntegerField(source='review_count', read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     instructor = UserInformationSerializer(read_only=True)
     moderators = UserInformationSerializer(many=True, read_only=True)
     has_access = serializers.SerializerMethodField()
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'cover_image', 'price', 'level', 'technologies', 'instructor', 'moderators','created_at', 'updated_at', 'is_published', 'chapters', 'reviews', 'average_rating', 'total_reviews',  'has_access']
+        fields = ['id', 'title', 'description', 'cover_image', 'price', 'level', 'technologies', 'instructor', 'moderators','created_at', 'updated_at', 'is_published', 'chapters', 'reviews', 'average_rating', 'total_reviews', 'rating_histogram', 'has_access']
 
 
     def create(self, validated_data):
@@ -366,14 +395,15 @@ class PublicCourseSerializer(serializers.ModelSerializer):
     chapters = ChapterSerializer(many=True, required=False)
     content = serializers.SerializerMethodField()
     average_rating = serializers.FloatField()
-    total_reviews = serializers.IntegerField()
+    total_reviews = serializers.IntegerField(source='review_count')
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = Course
         fields = [
             'id', 'title', 'description', 'cover_image',
             'price', 'level', 'instructor', 'content',
-            'average_rating', 'total_reviews', 'moderators', 'chapters'
+            'average_rating', 'total_reviews', 'rating_histogram', 'moderators', 'chapters'
         ]
 
     def get_content(self, obj):
@@ -400,7 +430,8 @@ class ContentVideoCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ['content_page']
 class CodeSubmissionSerializer(serializers.Serializer):
     code = serializers.CharField(required=True)
-    language = serializers.ChoiceField(choices=['python'], required=True)
+    # Python: funkcja solution(); pozostałe języki czytają wejście ze stdin i wypisują wynik
+    language = serializers.ChoiceField(choices=[language.name for language in language_registry], required=True)
 
 class LoginHistorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,201 @@
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from .blobs import BlobRef, blob_threshold, store_blob
+from .code_execution import TEST_INPUT_ERROR, parse_test_input
+from .facets import invalidate_facets
+from .models import Chapter, Course, CourseReview, Page, Technology, TestCase, User
+from .search import index_course, remove_courses
+from .utils import schedule_expected_outputs_refresh, update_course_ratings
+
+
+def _text(value):
+    return value.read_text() if isinstance(value, BlobRef) else value or ''
+
+
+@receiver(pre_save, sender=TestCase)
+def track_test_case_expected_output(sender, instance, raw=False, **kwargs):
+    # Przed przeniesieniem wejścia i wyniku do plików - porównanie z zapisanym przypadkiem
+    if raw or instance.pk is None:
+        return
+    stored = TestCase.objects.filter(pk=instance.pk).first()
+    if stored is None:
+        return
+    if instance.expected_output and instance.expected_output != _text(stored.grading_expected_output()):
+        # Wynik wpisany przez prowadzącego - bez skrótu rozwiązania, więc nigdy nie zostanie nadpisany
+        instance.solution_hash = ''
+    elif stored.solution_hash and instance.input_data and instance.input_data != _text(stored.grading_input()):
+        # Nowe wejście - wynik wyliczony dla poprzedniego jest nieaktualny
+        instance.expected_output, instance.expected_output_blob, instance.solution_hash = None, '', ''
+
+
+@receiver(pre_save, sender=TestCase)
+def parse_test_case_input(sender, instance, raw=False, **kwargs):
+    # Puste pole przy zapisanym pliku - wejście się nie zmieniło (sparsowane przy zapisie pliku)
+    if instance.input_data or not instance.input_blob:
+        # Wejście parsowane raz przy zapisie zamiast eval() przy każdym uruchomieniu
+        instance.parsed_input = parse_test_input(instance.input_data)
+        if instance.parsed_input is None:
+            # Wejście niebędące literałem nie jest nigdy obliczane (eval) - odrzucane już przy zapisie
+            raise ValidationError({'input_data': TEST_INPUT_ERROR})
+        instance.input_blob = instance.parsed_input_blob = ''
+        if len(instance.input_data) > blob_threshold():
+            # Duże wejście trafia do pliku, w bazie zostaje tylko klucz
+            instance.input_blob = store_blob(instance.input_data)
+            instance.input_data = ''
+            if instance.parsed_input is not None:
+                instance.parsed_input_blob = store_blob(instance.parsed_input)
+                instance.parsed_input = None
+
+    if instance.expected_output:
+        instance.expected_output_blob = ''
+        if len(instance.expected_output) > blob_threshold():
+            instance.expected_output_blob = store_blob(instance.expected_output)
+            instance.expected_output = ''
+
+
+@receiver(post_save, sender=TestCase)
+def compute_test_case_expected_output(sender, instance, raw=False, **kwargs):
+    # Brakujący oczekiwany wynik liczony raz, w tle po zatwierdzeniu transakcji - nie w żądaniu i nie przy każdym ocenianiu
+    if raw or instance.has_expected_output():
+        return
+    schedule_expected_outputs_refresh(instance.exercise_id, test_case_ids=[instance.id])
+
+
+# Indeks wyszukiwania kursów aktualizowany w tej samej transakcji co zmiana
+
+@receiver(post_save, sender=Course)
+def index_saved_course(sender, instance, raw=False, **kwargs):
+    index_course(instance.pk)
+
+
+@receiver(post_delete, sender=Course)
+def remove_deleted_course(sender, instance, **kwargs):
+    remove_courses([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.technologies.through)
+def index_course_technologies(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        index_course(instance.pk)
+        return
+    # technology.course_set.add(...) - pk_set to identyfikatory kursów (przy clear nieznane)
+    course_ids = pk_set if pk_set is not None else instance.course_set.values_list('id', flat=True)
+    for course_id in course_ids:
+        index_course(course_id)
+
+
+@receiver(pre_save, sender=Technology)
+def remember_technology_name(sender, instance, **kwargs):
+    instance._indexed_name = (
+        Technology.objects.filter(pk=instance.pk).values_list('name', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Technology)
+def index_renamed_technology(sender, instance, created, **kwargs):
+    if created or instance._indexed_name == instance.name:
+        return
+    for course_id in instance.course_set.values_list('id', flat=True):
+        index_course(course_id)
+
+
+def _deleted_with(origin, *models):
+    # origin - instancja albo QuerySet, od którego zaczęło się kaskadowe usuwanie
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in models
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def index_chapter_course(sender, instance, origin=None, **kwargs):
+    # Przy usuwaniu całego kursu indeks czyści handler kursu
+    if _deleted_with(origin, Course):
+        return
+    index_course(instance.course_id)
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+def index_page_course(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, Course, Chapter):
+        return
+    course_id = Chapter.objects.filter(pk=instance.chapter_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        index_course(course_id)
+
+
+# Oceny kursu
+
+def _rating(value):
+    # Widok przekazuje ocenę z request.data, więc może to być napis
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@receiver(pre_save, sender=CourseReview)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    instance._stored_rating = None
+    if instance.pk:
+        instance._stored_rating = CourseReview.objects.filter(pk=instance.pk).values_list('course_id', 'rating').first()
+
+
+@receiver(post_save, sender=CourseReview)
+def count_review_rating(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stored = None if created else instance._stored_rating
+    if stored is not None:
+        course_id, rating = stored
+        if (course_id, rating) == (instance.course_id, _rating(instance.rating)):
+            return
+        update_course_ratings(course_id, {rating: -1})
+    update_course_ratings(instance.course_id, {_rating(instance.rating): 1})
+
+
+@receiver(post_delete, sender=CourseReview)
+def discount_review_rating(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, Course):
+        return
+    update_course_ratings(instance.course_id, {_rating(instance.rating): -1})
+
+
+# Dane filtrów katalogu (facets.py) - nowa wersja przy zmianie kursów, technologii lub prowadzących
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Technology)
+@receiver(post_delete, sender=Technology)
+def invalidate_course_facets(sender, **kwargs):
+    invalidate_facets()
+
+
+# Dane prowadzącego pokazywane w fasetach
+INSTRUCTOR_FACET_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _instructor_facet_values(instance):
+    # Bez odczytu pól odroczonych (only/defer) - to byłoby dodatkowe zapytanie
+    return tuple(instance.__dict__.get(field) for field in INSTRUCTOR_FACET_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_instructor_facet_values(sender, instance, **kwargs):
+    instance._instructor_facet_values = _instructor_facet_values(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_instructor_facets(sender, instance, created, update_fields=None, **kwargs):
+    values = _instructor_facet_values(instance)
+    changed = values != getattr(instance, '_instructor_facet_values', None)
+    instance._instructor_facet_values = values
+    # Logowanie, saldo i inne pola bez znaczenia dla faset - pomijane bez zapytania
+    if created or not changed or (update_fields is not None and not set(INSTRUCTOR_FACET_FIELDS) & set(update_fields)):
+        return
+    if instance.courses.exists():
+        invalidate_facets()
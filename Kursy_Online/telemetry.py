@@ -0,0 +1,85 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+from django.db import transaction
+from .models import CodingExercise, GradingHistogram
+
+
+PERCENTILES = (50, 95, 99)
+
+
+def test_phase_timings(raw_results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Per-test phase timings and peak memory, as stored in Submission.test_timings
+    """
+    return [
+        {**(result.get('timings') or {}), 'peak_memory': result.get('peak_memory')}
+        for result in raw_results
+    ]
+
+
+def record_grading_timings(coding_exercise: CodingExercise, test_timings: List[Dict[str, Any]],
+                           compile_time: Optional[float] = None):
+    """
+    Add the phases of one graded submission to the exercise's latency histograms
+    """
+    samples = defaultdict(list)
+    if compile_time is not None:
+        samples['compile'].append(compile_time)
+    for timings in test_timings:
+        for phase in ('execute', 'compare'):
+            if timings.get(phase) is not None:
+                samples[phase].append(timings[phase])
+    memory = [timings['peak_memory'] for timings in test_timings if timings.get('peak_memory') is not None]
+
+    with transaction.atomic():
+        for phase, values in samples.items():
+            histogram, _ = GradingHistogram.objects.select_for_update().get_or_create(
+                exercise=coding_exercise, phase=phase
+            )
+            for seconds in values:
+                histogram.add(seconds)
+            if phase == 'execute' and memory:
+                histogram.max_memory = max(histogram.max_memory or 0, *memory)
+            histogram.save()
+
+
+def phase_summary(histogram: GradingHistogram) -> Dict[str, Any]:
+    return {
+        'count': histogram.count,
+        'total_time': histogram.total_time,
+        'mean': histogram.mean_time,
+        'max': histogram.max_time,
+        **{f'p{q}': histogram.percentile(q) for q in PERCENTILES}
+    }
+
+
+def grading_metrics(exercise_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Latency percentiles of every grading phase per exercise, ordered by the
+    grader time each exercise consumed (cpu_share - fraction of all grading time)
+    """
+    histograms = GradingHistogram.objects.select_related('exercise__page__chapter__course')
+    if exercise_id is not None:
+        histograms = histograms.filter(exercise_id=exercise_id)
+
+    exercises = {}
+    for histogram in histograms:
+        page = histogram.exercise.page
+        entry = exercises.setdefault(histogram.exercise_id, {
+            'exercise_id': histogram.exercise_id,
+            'title': page.title,
+            'course': page.chapter.course.title,
+            'total_time': 0.0,
+            'max_memory': None,
+            'phases': {}
+        })
+        entry['phases'][histogram.phase] = phase_summary(histogram)
+        entry['total_time'] += histogram.total_time
+        if histogram.max_memory is not None:
+            entry['max_memory'] = max(entry['max_memory'] or 0, histogram.max_memory)
+
+    grand_total = sum(entry['total_time'] for entry in exercises.values())
+    metrics = sorted(exercises.values(), key=lambda entry: entry['total_time'], reverse=True)
+    for entry in metrics:
+        entry['cpu_share'] = entry['total_time'] / grand_total if grand_total else None
+    return metrics
@@ -4,16 +4,51 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from unittest.mock import patch, MagicMock
 from django.urls import reverse
+from django.test import override_settings
+from django.conf import settings
+from django.utils import timezone
 from django.core import mail
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 from decimal import Decimal
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
 from Kursy_Online.models import *
 from Kursy_Online.serializers import *
 from Kursy_Online.utils import distribute_balance
 
 User = get_user_model()
 
+# Limity uruchomień na użytkownika wyłączone w testach - klucze (user:<pk>, adres IP) powtarzają się
+# między testami; limity sprawdza AdmissionControlTests. Fasety w cache procesu testów, czyszczonym w setUp
+_execution_limits_override = override_settings(
+    EXECUTION_LIMITS_CACHE='default',
+    FACETS_CACHE='default',
+    EXECUTION_RATE_PER_MINUTE=0,
+    EXECUTION_CPU_QUOTA=0,
+    GRADING_MAX_QUEUE_DEPTH=0
+)
+
+
+# Pliki dużych przypadków testowych poza katalogiem projektu
+_blob_root = tempfile.mkdtemp(prefix='test_case_blobs_')
+_blob_root_override = override_settings(TEST_CASE_BLOB_ROOT=_blob_root)
+
+
+def setUpModule():
+    _execution_limits_override.enable()
+    _blob_root_override.enable()
+
+
+def tearDownModule():
+    _execution_limits_override.disable()
+    _blob_root_override.disable()
+    shutil.rmtree(_blob_root, ignore_errors=True)
+
 
 class UserModelTests(DjangoTestCase):
     def test_user_creation(self):
@@ -366,8 +401,8 @@ class CourseAPITests(APITestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.get('/api/courses/my_courses/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'Existing Course')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Existing Course')
 
     def test_course_search_endpoint(self):
         response = self.client.get('/api/courses/search/?title=Existing')
@@ -1373,6 +1408,1908 @@ def solution(x):
         self.assertTrue(result['results'][0]['success'])
         self.assertFalse(result['results'][1]['success'])
 
+
+_WORKER_TOKEN = None
+
+
+def _worker_token():
+    global _WORKER_TOKEN
+    if _WORKER_TOKEN is None:
+        _WORKER_TOKEN = os.urandom(8).hex()
+    return _WORKER_TOKEN
+
+
+class SandboxPoolTests(DjangoTestCase):
+    def setUp(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        from Kursy_Online.sandbox import SandboxPool
+        self.pool = SandboxPool(size=1, max_jobs_per_worker=2)
+        self.service = CodeExecutionService(timeout=1, pool=self.pool)
+        self.solution = """
+def solution(x):
+    return x * 2
+"""
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_run_all_tests_with_solution_in_pool(self):
+        code = """
+def solution(x):
+    return x + x
+"""
+        result = self.service.run_all_tests_with_solution(
+            code, self.solution, [{'input_data': '3'}, {'input_data': '5', 'is_hidden': True}]
+        )
+        self.assertTrue(result['success'])
+        self.assertEqual(result['results'][1]['output'], 10)
+        self.assertTrue(result['results'][1]['is_hidden'])
+
+    def test_infinite_loop_is_stopped(self):
+        code = """
+def solution(x):
+    while True:
+        pass
+"""
+        result = self.service.run_all_tests_with_solution(code, self.solution, [{'input_data': '1'}])
+        self.assertFalse(result['success'])
+        self.assertIn('limit', result['results'][0]['error'])
+
+        # Pula nadal działa po zabiciu procesu
+        result = self.service.run_all_tests_with_solution(self.solution, self.solution, [{'input_data': '1'}])
+        self.assertTrue(result['success'])
+
+    def test_memory_limit(self):
+        service = type(self.service)(timeout=5, max_memory=50 * 1024 * 1024, pool=self.pool)
+        code = """
+def solution(x):
+    return len([0] * (200 * 1024 * 1024))
+"""
+        result = service.run_all_tests_with_solution(code, self.solution, [{'input_data': '1'}])
+        self.assertFalse(result['success'])
+        self.assertEqual(result['results'][0]['error'], 'Przekroczono limit pamięci')
+
+    def test_worker_recycled_after_max_jobs(self):
+        workers = []
+        for _ in range(4):
+            self.pool.run(abs, -1)
+            workers.append(self.pool._workers[0].process.pid)
+        self.assertNotEqual(workers[0], workers[1])
+        self.assertEqual(workers[1], workers[2])
+        self.assertNotEqual(workers[2], workers[3])
+
+    def test_job_state_does_not_survive(self):
+        # Każde zadanie w świeżym procesie potomnym - zmienna globalna ustawiona przez jedno nie istnieje w kolejnym
+        tokens = [self.pool.run(_worker_token) for _ in range(2)]
+        self.assertNotEqual(tokens[0], tokens[1])
+        self.assertEqual(len(self.pool._workers), 1)
+
+class ParallelGradingTests(DjangoTestCase):
+    def setUp(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        from Kursy_Online.sandbox import SandboxPool
+        self.pool = SandboxPool(size=3)
+        self.service = CodeExecutionService(timeout=2, pool=self.pool)
+        self.solution = """
+def solution(x):
+    return x * 2
+"""
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_parallel_results_keep_order(self):
+        test_cases = [{'input_data': str(i)} for i in range(8)]
+        result = self.service.run_all_tests_with_solution(self.solution, self.solution, test_cases, parallelism=3)
+        self.assertTrue(result['success'])
+        self.assertEqual([r['output'] for r in result['results']], [i * 2 for i in range(8)])
+        self.assertEqual([r['input'] for r in result['results']], [str(i) for i in range(8)])
+
+    def test_parallel_uses_multiple_workers(self):
+        code = """
+def solution(x):
+    total = 0
+    for i in range(2000000):
+        total += i
+    return x * 2
+"""
+        result = self.service.run_all_tests_with_solution(code, self.solution, [{'input_data': '1'}] * 3, parallelism=3)
+        self.assertTrue(result['success'])
+        self.assertEqual(len(self.pool._workers), 3)
+
+    def test_fail_fast_skips_remaining_tests(self):
+        code = """
+def solution(x):
+    if x == 0:
+        return -1
+    return x * 2
+"""
+        test_cases = [{'input_data': str(i)} for i in range(5)]
+        result = self.service.run_all_tests_with_solution(code, self.solution, test_cases, fail_fast=True)
+        self.assertFalse(result['success'])
+        self.assertEqual(len(result['results']), 5)
+        self.assertFalse(result['results'][0].get('skipped', False))
+        self.assertTrue(all(r['skipped'] for r in result['results'][1:]))
+
+    def test_without_fail_fast_all_tests_run(self):
+        code = """
+def solution(x):
+    if x == 0:
+        return -1
+    return x * 2
+"""
+        test_cases = [{'input_data': str(i)} for i in range(4)]
+        result = self.service.run_all_tests_with_solution(code, self.solution, test_cases, parallelism=2)
+        self.assertFalse(result['results'][0]['success'])
+        self.assertTrue(all(r['success'] for r in result['results'][1:]))
+
+class GradingSessionTests(DjangoTestCase):
+    def setUp(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        self.service = CodeExecutionService()
+        self.solution = """
+def solution(x):
+    return x * 2
+"""
+
+    def test_code_compiled_once_per_submission(self):
+        from Kursy_Online.code_execution import GradingSession
+        import builtins
+        with patch('Kursy_Online.code_execution.compile', side_effect=builtins.compile, create=True) as compile_mock:
+            session = GradingSession(self.service, self.solution, self.solution)
+            results = [session.run_test(str(i)) for i in range(10)]
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(compile_mock.call_count, 2)
+
+    def test_session_survives_pickling(self):
+        import pickle
+        from Kursy_Online.code_execution import GradingSession
+        session = pickle.loads(pickle.dumps(GradingSession(self.service, self.solution, self.solution)))
+        result = session.run_test('4')
+        self.assertTrue(result['success'])
+        self.assertEqual(result['output'], 8)
+
+    @override_settings(SANDBOX_ISOLATION='off')
+    def test_invalid_user_code(self):
+        from Kursy_Online.code_execution import GradingSession
+        session = GradingSession(self.service, 'import os\ndef solution(x):\n    return x', self.solution)
+        result = session.run_test('1')
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'Niedozwolone operacje w kodzie użytkownika')
+
+    @override_settings(SANDBOX_ISOLATION='off')
+    def test_invalid_solution(self):
+        from Kursy_Online.code_execution import GradingSession
+        session = GradingSession(self.service, self.solution, 'import os')
+        self.assertEqual(session.run_test('1')['error'], 'Nieprawidłowy kod rozwiązania wzorcowego')
+        # Przy zapisanym wyniku wzorcowym rozwiązanie nie jest potrzebne
+        self.assertTrue(session.run_test('1', '2')['success'])
+
+def computing_expected_outputs(test):
+    """
+    Run the background computation of expected outputs synchronously, once the test's transaction commits
+    """
+    background = patch('Kursy_Online.utils._background')
+    submit = background.start().submit
+    submit.side_effect = lambda func, *args: func(*args)
+    test.addCleanup(background.stop)
+    return test.captureOnCommitCallbacks(execute=True)
+
+
+class ExpectedOutputPrecomputeTests(DjangoTestCase, TestDataMixin):
+    def setUp(self):
+        course = self.create_course()
+        chapter = Chapter.objects.create(course=course, title='Rozdział', order=1)
+        page = Page.objects.create(chapter=chapter, title='Zadanie', type='CODING', order=1)
+        self.exercise = CodingExercise.objects.create(
+            page=page,
+            description='Podwój liczbę',
+            solution='def solution(x):\n    return x * 2\n'
+        )
+
+    def test_expected_output_computed_on_save(self):
+        from Kursy_Online.code_execution import solution_hash
+        with patch('Kursy_Online.code_execution.CodeExecutionService.compute_expected_outputs') as compute:
+            with self.captureOnCommitCallbacks() as callbacks:
+                test_case = TestCase.objects.create(exercise=self.exercise, input_data='21', order=1)
+        # Rozwiązanie wzorcowe nie jest uruchamiane w żądaniu ani w transakcji
+        compute.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+
+        with computing_expected_outputs(self):
+            test_case = TestCase.objects.create(exercise=self.exercise, input_data='21', order=2)
+        test_case.refresh_from_db()
+        self.assertEqual(test_case.expected_output, '42')
+        self.assertEqual(test_case.solution_hash, solution_hash(self.exercise.solution))
+
+        # Zapis bez zmian niczego nie przelicza, nowe wejście - tak
+        with patch('Kursy_Online.utils._background') as background:
+            with self.captureOnCommitCallbacks(execute=True):
+                test_case.is_hidden = True
+                test_case.save()
+        background.submit.assert_not_called()
+        with computing_expected_outputs(self):
+            test_case.input_data = '5'
+            test_case.save()
+        test_case.refresh_from_db()
+        self.assertEqual(test_case.expected_output, '10')
+
+    def test_instructor_output_is_kept(self):
+        from Kursy_Online.grading import build_test_cases
+        with computing_expected_outputs(self):
+            test_case = TestCase.objects.create(exercise=self.exercise, input_data='21', expected_output='43', order=1)
+        test_case.refresh_from_db()
+        self.assertEqual((test_case.expected_output, test_case.solution_hash), ('43', ''))
+        self.assertEqual(build_test_cases(self.exercise)[0]['expected_output'], '43')
+
+        # Poprawka wyniku wyliczonego też jest wynikiem prowadzącego
+        with computing_expected_outputs(self):
+            computed = TestCase.objects.create(exercise=self.exercise, input_data='1', order=2)
+        computed.refresh_from_db()
+        computed.expected_output = '3'
+        computed.save()
+        computed.refresh_from_db()
+        self.assertEqual((computed.expected_output, computed.solution_hash), ('3', ''))
+
+        # Zmiana rozwiązania przelicza tylko wyniki wyliczone
+        self.exercise.solution = 'def solution(x):\n    return x * 3\n'
+        self.exercise.save()
+        with computing_expected_outputs(self):
+            TestCase.objects.create(exercise=self.exercise, input_data='2', order=3)
+        from Kursy_Online.utils import refresh_expected_outputs
+        refresh_expected_outputs(self.exercise.pk)
+        self.assertEqual(
+            list(self.exercise.test_cases.values_list('expected_output', flat=True)), ['43', '3', '6']
+        )
+
+    def test_command_computes_missing_outputs(self):
+        from django.core.management import call_command
+        from io import StringIO
+        with patch('Kursy_Online.utils._background'):
+            test_case = TestCase.objects.create(exercise=self.exercise, input_data='4', order=1)
+        manual = TestCase.objects.create(exercise=self.exercise, input_data='5', expected_output='11', order=2)
+        call_command('compute_expected_outputs', stdout=StringIO())
+        test_case.refresh_from_db()
+        manual.refresh_from_db()
+        self.assertEqual(test_case.expected_output, '8')
+        self.assertEqual(manual.expected_output, '11')
+
+    def test_precomputed_output_skips_solution(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        service = CodeExecutionService()
+        code = 'def solution(x):\n    return x + 1\n'
+        # Rozwiązanie wzorcowe jest niepoprawne, ale nie powinno zostać uruchomione
+        result = service.execute_test_case_with_solution(code, 'raise Exception()', '1', '2')
+        self.assertTrue(result['success'])
+        self.assertEqual(result['expected_output'], '2')
+
+    def test_solution_change_recomputes_in_background(self):
+        test_case = TestCase.objects.create(exercise=self.exercise, input_data='5', order=1)
+        serializer = CodingExerciseSerializer(
+            self.exercise,
+            data={'description': 'Potrój liczbę', 'solution': 'def solution(x):\n    return x * 3\n'},
+            partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+        with patch('Kursy_Online.utils._background') as background:
+            background.submit.side_effect = lambda func, *args: func(*args)
+            with self.captureOnCommitCallbacks(execute=True):
+                serializer.save()
+        test_case.refresh_from_db()
+        self.assertEqual(test_case.expected_output, '15')
+
+    def test_unchanged_solution_does_not_recompute(self):
+        serializer = CodingExerciseSerializer(self.exercise, data={'description': 'Nowy opis'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        with patch('Kursy_Online.utils._background') as background:
+            with self.captureOnCommitCallbacks(execute=True):
+                serializer.save()
+        background.submit.assert_not_called()
+
+class CodingExerciseMixin(TestDataMixin):
+    def create_coding_exercise(self, course=None, solution='def solution(x):\n    return x * 2\n', inputs=('1', '2')):
+        course = course or self.create_course()
+        chapter = Chapter.objects.create(course=course, title='Zadania', order=1)
+        page = Page.objects.create(chapter=chapter, title='Podwajanie', type='CODING', order=1)
+        exercise = CodingExercise.objects.create(page=page, description='Podwój liczbę', solution=solution)
+        for order, input_data in enumerate(inputs, 1):
+            TestCase.objects.create(exercise=exercise, input_data=input_data, order=order)
+        return exercise
+
+    def submit_url(self, exercise):
+        page = exercise.page
+        return f'/api/courses/{page.chapter.course_id}/chapters/{page.chapter_id}/pages/{page.id}/submit_solution/'
+
+
+class GradingQueueTests(APITestCase, CodingExerciseMixin):
+    def setUp(self):
+        self.exercise = self.create_coding_exercise()
+        self.student = self.create_user('student')
+        self.create_payment(user=self.student, course=self.exercise.page.chapter.course)
+        self.client.force_authenticate(user=self.student)
+
+    def submit(self, code='def solution(x):\n    return x + x\n'):
+        return self.client.post(self.submit_url(self.exercise), {'code': code, 'language': 'python'}, format='json')
+
+    @override_settings(GRADING_ASYNC=True)
+    def test_submission_is_enqueued(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = GradingJob.objects.get(id=response.data['job_id'])
+        self.assertEqual(job.status, 'PENDING')
+        self.assertEqual(response.data['status_url'], f'/api/grading-jobs/{job.id}/')
+
+    @override_settings(GRADING_ASYNC=True)
+    def test_worker_grades_job(self):
+        from django.core.management import call_command
+        from io import StringIO
+        job_id = self.submit().data['job_id']
+
+        call_command('grading_worker', once=True, stdout=StringIO())
+
+        response = self.client.get(f'/api/grading-jobs/{job_id}/')
+        self.assertEqual(response.data['status'], 'DONE')
+        self.assertTrue(response.data['result']['success'])
+        self.assertEqual(len(response.data['result']['test_results']), 2)
+        self.assertTrue(UserProgress.objects.filter(user=self.student, page=self.exercise.page, completed=True).exists())
+
+    @override_settings(GRADING_ASYNC=True, GRADING_POLL_INTERVAL=2)
+    def test_status_returns_immediately(self):
+        job_id = self.submit().data['job_id']
+        started = time.monotonic()
+        response = self.client.get(f'/api/grading-jobs/{job_id}/', {'wait': 20})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.data['status'], 'PENDING')
+        self.assertEqual(response.data['poll_interval'], 2)
+
+    @override_settings(GRADING_ASYNC=True)
+    def test_other_user_cannot_see_job(self):
+        job_id = self.submit().data['job_id']
+        self.client.force_authenticate(user=self.create_user('intruder'))
+        response = self.client.get(f'/api/grading-jobs/{job_id}/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stale_jobs_are_requeued(self):
+        from Kursy_Online.grading import claim_next_grading_job, requeue_stale_grading_jobs
+        job = GradingJob.objects.create(user=self.student, page=self.exercise.page, code='x')
+        self.assertEqual(claim_next_grading_job('worker-1').id, job.id)
+        self.assertIsNone(claim_next_grading_job('worker-2'))
+        an_hour_ago = timezone.now() - timezone.timedelta(hours=1)
+        GradingJob.objects.filter(id=job.id).update(started_at=an_hour_ago, heartbeat_at=an_hour_ago)
+        self.assertEqual(requeue_stale_grading_jobs(300), 1)
+        self.assertEqual(claim_next_grading_job('worker-2').id, job.id)
+
+    @override_settings(GRADING_ASYNC=False)
+    def test_synchronous_grading(self):
+        response = self.submit('def solution(x):\n    return x\n')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['success'])
+        self.assertFalse(GradingJob.objects.exists())
+
+class StreamingSubmissionTests(APITestCase, CodingExerciseMixin):
+    def setUp(self):
+        self.exercise = self.create_coding_exercise(inputs=('1', '2', '3'))
+        self.student = self.create_user('student')
+        self.create_payment(user=self.student, course=self.exercise.page.chapter.course)
+        self.client.force_authenticate(user=self.student)
+
+    def post_stream(self, code):
+        url = self.submit_url(self.exercise).replace('submit_solution/', 'submit_solution_stream/')
+        response = self.client.post(url, {'code': code, 'language': 'python'}, format='json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return response
+
+    def read_lines(self, response):
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        return [json.loads(line) for line in lines]
+
+    def stream(self, code):
+        return self.read_lines(self.post_stream(code))
+
+    @override_settings(GRADING_ASYNC=True)
+    def test_queued_submission_streams_worker_progress(self):
+        from django.core.management import call_command
+        from io import StringIO
+        response = self.post_stream('def solution(x):\n    return x * 2\n')
+        job = GradingJob.objects.get(user=self.student)
+        self.assertEqual(job.status, 'PENDING')
+
+        # Ocenia grading_worker, a strumień tylko czyta zapisany postęp
+        call_command('grading_worker', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual([line['index'] for line in job.progress], [0, 1, 2])
+
+        lines = self.read_lines(response)
+        self.assertEqual(lines[:-1], job.progress)
+        self.assertEqual(lines[-1], {'type': 'summary', 'success': True, 'total': 3})
+
+    @override_settings(GRADING_ASYNC=True, GRADING_STREAM_TIMEOUT=0)
+    def test_stream_hands_over_to_polling(self):
+        lines = self.stream('def solution(x):\n    return x * 2\n')
+        job = GradingJob.objects.get(user=self.student)
+        self.assertEqual(lines, [{
+            'type': 'pending', 'job_id': job.id, 'status': 'PENDING',
+            'status_url': f'/api/grading-jobs/{job.id}/'
+        }])
+
+    @override_settings(GRADING_ASYNC=False)
+    def test_results_are_streamed_per_test(self):
+        lines = self.stream('def solution(x):\n    return x * 2\n')
+        tests = [line for line in lines if line['type'] == 'test']
+        self.assertEqual(sorted(line['index'] for line in tests), [0, 1, 2])
+        self.assertTrue(all(line['passed'] for line in tests))
+        self.assertEqual(lines[-1], {'type': 'summary', 'success': True, 'total': 3})
+        self.assertTrue(UserProgress.objects.filter(user=self.student, page=self.exercise.page, completed=True).exists())
+
+    @override_settings(GRADING_ASYNC=False)
+    def test_failed_submission_summary(self):
+        lines = self.stream('def solution(x):\n    return x\n')
+        self.assertFalse(lines[-1]['success'])
+        self.assertFalse(UserProgress.objects.filter(user=self.student, page=self.exercise.page).exists())
+
+    def test_validation_errors_are_not_streamed(self):
+        url = self.submit_url(self.exercise).replace('submit_solution/', 'submit_solution_stream/')
+        response = self.client.post(url, {'language': 'python'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(GRADING_ASYNC=False)
+class SubmissionHistoryTests(APITestCase, CodingExerciseMixin):
+    def setUp(self):
+        self.exercise = self.create_coding_exercise()
+        self.student = self.create_user('student')
+        self.create_payment(user=self.student, course=self.exercise.page.chapter.course)
+        self.client.force_authenticate(user=self.student)
+        self.code = 'def solution(x):\n    return x + x\n'
+
+    def submit(self, code=None):
+        return self.client.post(self.submit_url(self.exercise), {'code': code or self.code, 'language': 'python'}, format='json')
+
+    def test_submission_is_recorded(self):
+        self.submit()
+        submission = Submission.objects.get()
+        self.assertEqual(submission.user, self.student)
+        self.assertTrue(submission.passed)
+        self.assertFalse(submission.cached)
+        self.assertEqual(len(submission.test_timings), 2)
+
+    def test_identical_resubmission_reuses_verdict(self):
+        first = self.submit()
+        with patch('Kursy_Online.grading.CodeExecutionService.run_all_tests_with_solution') as run:
+            second = self.submit()
+        run.assert_not_called()
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(Submission.objects.count(), 2)
+        self.assertTrue(Submission.objects.filter(cached=True).exists())
+
+    def test_changed_test_set_invalidates_verdict(self):
+        self.submit()
+        TestCase.objects.create(exercise=self.exercise, input_data='3', order=3)
+        response = self.submit()
+        self.assertEqual(len(response.data['test_results']), 3)
+        self.assertFalse(Submission.objects.filter(cached=True).exists())
+
+
+class TestInputParsingTests(DjangoTestCase, CodingExerciseMixin):
+    def test_literal_input_is_parsed_on_save(self):
+        import marshal
+        exercise = self.create_coding_exercise(inputs=('[1, 2, {"a": (3, 4)}]',))
+        test_case = exercise.test_cases.get()
+        self.assertEqual(marshal.loads(test_case.parsed_input), [1, 2, {'a': (3, 4)}])
+
+    def test_non_literal_input_is_rejected(self):
+        from django.core.exceptions import ValidationError
+        from Kursy_Online.code_execution import load_test_input
+        with self.assertRaises(ValidationError):
+            self.create_coding_exercise(inputs=('list(range(3))',))
+        # Wejście nigdy nie jest obliczane - także gdy ominie walidację przy zapisie
+        with self.assertRaises(ValueError):
+            load_test_input("__import__('os').getcwd()")
+
+    def test_legacy_non_literal_inputs_are_reported(self):
+        import importlib
+        from contextlib import redirect_stdout
+        from io import StringIO
+        from django.apps import apps
+        from django.core.management import CommandError, call_command
+        exercise = self.create_coding_exercise(inputs=('1',))
+        test_case = exercise.test_cases.get()
+        # Przypadek zapisany przed parsowaniem przy zapisie
+        TestCase.objects.filter(pk=test_case.pk).update(input_data='list(range(3))', parsed_input=None)
+
+        migration = importlib.import_module('Kursy_Online.migrations.0008_testcase_parsed_input')
+        output = StringIO()
+        with redirect_stdout(output):
+            migration.parse_existing_inputs(apps, None)
+        self.assertIn(f'przypadek testowy {test_case.pk} (zadanie {exercise.pk})', output.getvalue())
+
+        output = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_test_inputs', stdout=output)
+        self.assertIn(f'Test case {test_case.pk} (exercise {exercise.pk}', output.getvalue())
+
+        # Poprawka przez formularz: błąd przy polu zamiast wyjątku przy zapisie, literał zapisuje się normalnie
+        test_case.refresh_from_db()
+        with self.assertRaises(ValidationError) as error:
+            test_case.full_clean()
+        self.assertIn('input_data', error.exception.message_dict)
+        test_case.input_data = '[0, 1, 2]'
+        test_case.full_clean()
+        test_case.save()
+        call_command('check_test_inputs', stdout=StringIO())
+
+    def test_serializer_rejects_non_literal_input(self):
+        from Kursy_Online.serializers import TestCaseSerializer
+        serializer = TestCaseSerializer(data={'input_data': 'list(range(3))', 'order': 1})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('input_data', serializer.errors)
+        self.assertTrue(TestCaseSerializer(data={'input_data': '[0, 1, 2]', 'order': 1}).is_valid())
+
+    def test_grading_uses_parsed_input(self):
+        from Kursy_Online.code_execution import CodeExecutionService, parse_test_input
+        service = CodeExecutionService()
+        code = 'def solution(x):\n    return sum(x)\n'
+        # Surowe wejście nie jest już potrzebne - liczy się wartość sparsowana przy zapisie
+        result = service._execute_code(code, 'not python', parse_test_input('[1, 2, 3]'))
+        self.assertTrue(result['success'])
+        self.assertEqual(result['output'], 6)
+
+
+class RunCodeTests(DjangoTestCase):
+    def setUp(self):
+        import sys
+        import tempfile
+        from Kursy_Online.languages import Language, LanguageRegistry
+        self.cache_dir = tempfile.mkdtemp()
+        self.compile_log = os.path.join(self.cache_dir, '.compile_log')
+        self.settings_override = override_settings(COMPILED_ARTIFACT_CACHE_DIR=self.cache_dir)
+        self.settings_override.enable()
+
+        # "Kompilator" w Pythonie: kopiuje źródło do program.out i odnotowuje każde wywołanie
+        compiler = f'import shutil, sys; shutil.copy(sys.argv[-1], "program.out"); open({self.compile_log!r}, "a").write("x")'
+        self.registry = LanguageRegistry()
+        self.registry.register(Language(
+            'compiled', 'Compiled', '.src',
+            tools={'python': [sys.executable]},
+            compile=['{python}', '-c', compiler],
+            run=['{python}', 'program.out']
+        ))
+        self.registry.register(Language(
+            'script', 'Script', '.py', tools={'python': [sys.executable]}, run=['{python}', '{source}']
+        ))
+        self.registry.register(Language(
+            'missing', 'Missing', '.x', tools={'tool': ['no-such-compiler-here']}, run=['{tool}']
+        ))
+        self.registry_patch = patch('Kursy_Online.views.registry', self.registry)
+        self.registry_patch.start()
+
+    def tearDown(self):
+        import shutil
+        self.registry_patch.stop()
+        self.settings_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def run_code(self, code, language='compiled'):
+        return self.client.post('/run-code/', {'language': language, 'code': code}, content_type='application/json').json()
+
+    def compilations(self):
+        if not os.path.exists(self.compile_log):
+            return 0
+        with open(self.compile_log) as log:
+            return len(log.read())
+
+    def test_unchanged_code_is_compiled_once(self):
+        first = self.run_code('print("hello")')
+        second = self.run_code('print("hello")')
+        self.assertEqual(first['output'], 'hello\n')
+        self.assertEqual(second['output'], 'hello\n')
+        self.assertEqual(self.compilations(), 1)
+
+        self.run_code('print("changed")')
+        self.assertEqual(self.compilations(), 2)
+
+    def test_runs_do_not_touch_current_directory(self):
+        before = set(os.listdir('.'))
+        result = self.run_code('import os\nprint(sorted(os.listdir(".")))')
+        self.assertEqual(result['output'], "['program.out']\n")
+        self.assertEqual(set(os.listdir('.')), before)
+
+    def test_concurrent_runs_are_isolated(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from django.test import Client
+        run = lambda i: Client().post('/run-code/', {'language': 'compiled', 'code': f'print({i})'},
+                                      content_type='application/json').json()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(run, range(8)))
+        self.assertEqual([result['output'] for result in results], [f'{i}\n' for i in range(8)])
+
+    def test_interpreted_language(self):
+        result = self.run_code('print(1 + 1)', language='script')
+        self.assertTrue(result['success'])
+        self.assertEqual(result['output'], '2\n')
+
+    def test_unknown_and_unavailable_languages(self):
+        response = self.client.post('/run-code/', {'language': 'cobol', 'code': 'x'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        result = self.run_code('x', language='missing')
+        self.assertFalse(result['success'])
+        self.assertIn('Missing', result['error'])
+
+    def test_language_list(self):
+        languages = {language['name']: language['available'] for language in self.client.get('/run-code/').json()['languages']}
+        self.assertEqual(languages, {'compiled': True, 'script': True, 'missing': False})
+
+    def test_toolchains_are_discovered_once(self):
+        self.run_code('print(1)', language='script')
+        with patch('Kursy_Online.languages.shutil.which') as which:
+            self.run_code('print(2)', language='script')
+        which.assert_not_called()
+
+
+class BoundedRunnerTests(DjangoTestCase):
+    def setUp(self):
+        import sys
+        self.python = sys.executable
+
+    def run_python(self, code, **kwargs):
+        from Kursy_Online.runner import execute
+        return execute([self.python, '-c', code], **kwargs)
+
+    def test_metadata(self):
+        result = self.run_python('print("ok")')
+        self.assertEqual(result['returncode'], 0)
+        self.assertEqual(result['stdout'], 'ok\n')
+        self.assertFalse(result['timed_out'])
+        self.assertIsNotNone(result['cpu_time'])
+        self.assertGreater(result['peak_rss'], 0)
+
+    def test_timeout_kills_process_group(self):
+        import time
+        # Proces potomny w tle też musi zostać zabity, inaczej trzymałby otwarte wyjście
+        code = 'import subprocess, sys, time; subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]); time.sleep(60)'
+        start = time.monotonic()
+        result = self.run_python(code, timeout=1, cpu_time=5)
+        self.assertTrue(result['timed_out'])
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_cpu_limit(self):
+        result = self.run_python('while True: pass', timeout=30, cpu_time=1)
+        self.assertTrue(result['timed_out'])
+        self.assertNotEqual(result['returncode'], 0)
+
+    def test_output_is_truncated(self):
+        result = self.run_python('while True: print(1)', timeout=10, output_limit=1000)
+        self.assertTrue(result['truncated'])
+        self.assertEqual(len(result['stdout']), 1000)
+
+    def test_memory_limit(self):
+        code = 'data = bytearray(128 * 1024 * 1024); print("ok")'
+        result = self.run_python(code, memory_limit=48 * 1024 * 1024)
+        self.assertNotEqual(result['returncode'], 0)
+        self.assertIn('MemoryError', result['stderr'])
+        self.assertEqual(self.run_python(code)['stdout'], 'ok\n')
+
+    def test_graded_program_gets_exercise_memory_limit(self):
+        from Kursy_Online.code_execution import CodeExecutionService, ProgramSession
+        from Kursy_Online.languages import Language, LanguageRegistry
+        registry = LanguageRegistry()
+        registry.register(Language('script', 'Script', '.py', tools={'python': [self.python]},
+                                   run=['{python}', '{source}'], cache_artifacts=False))
+        service = CodeExecutionService(max_memory=48 * 1024 * 1024)
+        with patch('Kursy_Online.code_execution.registry', registry):
+            session = ProgramSession(service, 'script', 'data = bytearray(128 * 1024 * 1024)\nprint(input())\n')
+        try:
+            result = session.run_test('1', expected_output='1')
+        finally:
+            session.close()
+        self.assertFalse(result['success'])
+        self.assertIn('MemoryError', result['error'])
+
+    @override_settings(RUNNER_MAX_PROCESSES=1, RUNNER_QUEUE_TIMEOUT=0.2)
+    def test_process_slots_are_limited(self):
+        from Kursy_Online.runner import RunnerBusy, process_slot
+        with process_slot():
+            with self.assertRaises(RunnerBusy):
+                with process_slot():
+                    pass
+        with process_slot():
+            pass
+
+
+class ForkServerTests(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import multiprocessing
+        import tempfile
+        import time
+        from Kursy_Online.forkserver import ForkServer, ForkServerClient
+        cls.socket_dir = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.socket_dir, 'forkserver.sock')
+        server = ForkServer(cls.socket_path, max_children=4)
+        cls.server = multiprocessing.get_context('fork').Process(target=server.serve_forever, daemon=True)
+        cls.server.start()
+        deadline = time.monotonic() + 10
+        while not os.path.exists(cls.socket_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        cls.forkserver = ForkServerClient(cls.socket_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        import shutil
+        cls.server.terminate()
+        cls.server.join(5)
+        shutil.rmtree(cls.socket_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_run_script(self):
+        result = self.forkserver.run_script('import sys\nprint("hello")\nprint("oops", file=sys.stderr)')
+        self.assertEqual(result['returncode'], 0)
+        self.assertEqual(result['stdout'], 'hello\n')
+        self.assertEqual(result['stderr'], 'oops\n')
+        self.assertIsNotNone(result['cpu_time'])
+
+    def test_script_timeout(self):
+        result = self.forkserver.run_script('while True: pass', timeout=1)
+        self.assertTrue(result['timed_out'])
+
+    def test_script_socket_timeout_is_a_timeout(self):
+        import socket
+        with patch.object(self.forkserver, '_request', side_effect=socket.timeout):
+            result = self.forkserver.run_script('print(1)', timeout=1)
+        self.assertTrue(result['timed_out'])
+        self.assertIsNotNone(result['wall_time'])
+
+    @override_settings(RUNNER_MAX_PROCESSES=1, RUNNER_QUEUE_TIMEOUT=0.2)
+    def test_scripts_hold_runner_slots(self):
+        from Kursy_Online.runner import RunnerBusy, process_slot
+        with process_slot(wait=0):
+            with self.assertRaises(RunnerBusy):
+                self.forkserver.run_script('print(1)')
+        self.assertEqual(self.forkserver.run_script('print(1)')['stdout'], '1\n')
+
+    def test_stalled_client_does_not_block_server(self):
+        import socket
+        from Kursy_Online.forkserver import REQUEST_TIMEOUT
+        # Klient, który wysłał tylko część nagłówka zlecenia
+        stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(stalled.close)
+        stalled.connect(self.socket_path)
+        stalled.sendall(b'\x00\x00')
+        time.sleep(0.1)
+
+        start = time.monotonic()
+        self.assertEqual(self.forkserver.run_script('print(1)')['stdout'], '1\n')
+        self.assertLess(time.monotonic() - start, REQUEST_TIMEOUT / 2)
+
+    def test_script_output_is_capped(self):
+        result = self.forkserver.run_script('while True: print(1)', output_limit=1000)
+        self.assertTrue(result['truncated'])
+        self.assertEqual(len(result['stdout']), 1000)
+
+    def test_grading_through_forkserver(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        service = CodeExecutionService(timeout=1, pool=self.forkserver)
+        solution = 'def solution(x):\n    return x * 2\n'
+        result = service.run_all_tests_with_solution(
+            'def solution(x):\n    return x + x\n', solution, [{'input_data': '3'}, {'input_data': '4'}], parallelism=2
+        )
+        self.assertTrue(result['success'])
+
+        result = service.run_all_tests_with_solution('def solution(x):\n    while True: pass\n', solution, [{'input_data': '1'}])
+        self.assertIn('limit', result['results'][0]['error'])
+
+    def test_python_interpreter_uses_forkserver(self):
+        from django.test import RequestFactory
+        from Kursy_Online.views import python_interpreter
+        request = RequestFactory().post('/python-interpreter/', {'code': 'import os\nprint(os.getppid())'})
+        with override_settings(FORKSERVER_SOCKET=self.socket_path):
+            response = json.loads(python_interpreter(request).content)
+        self.assertTrue(response['success'])
+        self.assertEqual(response['output'].strip(), str(self.server.pid))
+
+    def test_falls_back_to_local_pool(self):
+        from Kursy_Online.forkserver import ForkServerClient
+        from Kursy_Online.sandbox import SandboxPool
+        pool = SandboxPool(size=1)
+        try:
+            client = ForkServerClient(os.path.join(self.socket_dir, 'missing.sock'), fallback=lambda: pool)
+            self.assertEqual(client.run(abs, -3), 3)
+        finally:
+            pool.shutdown()
+
+
+class ReplSessionTests(DjangoTestCase, TestDataMixin):
+    def setUp(self):
+        from Kursy_Online.repl import ReplSessionManager
+        self.manager = ReplSessionManager()
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def test_state_persists_between_snippets(self):
+        self.assertTrue(self.manager.run(1, 'import math\nx = 21')['success'])
+        result = self.manager.run(1, 'x * 2')
+        self.assertEqual(result['stdout'], '42\n')
+        # Inny użytkownik ma własną przestrzeń nazw
+        self.assertIn('NameError', self.manager.run(2, 'x')['stderr'])
+
+    @override_settings(REPL_TIMEOUT=1)
+    def test_timeout_interrupts_snippet_but_keeps_session(self):
+        self.manager.run(1, 'y = 5')
+        result = self.manager.run(1, 'while True: pass')
+        self.assertFalse(result['success'])
+        self.assertTrue(result['timed_out'])
+        self.assertEqual(self.manager.run(1, 'y')['stdout'], '5\n')
+
+    @override_settings(REPL_IDLE_TIMEOUT=0)
+    def test_idle_sessions_are_reaped(self):
+        self.manager.run(1, 'z = 1')
+        self.assertEqual(self.manager.reap_idle(), 1)
+        self.assertIn('NameError', self.manager.run(1, 'z')['stderr'])
+
+    @override_settings(REPL_MEMORY_LIMIT=200 * 1024 * 1024)
+    def test_memory_cap(self):
+        result = self.manager.run(1, 'data = bytearray(500 * 1024 * 1024)')
+        self.assertFalse(result['success'])
+        self.assertIn('MemoryError', result['stderr'])
+
+    def test_kernel_is_isolated(self):
+        from Kursy_Online.isolation import is_isolated
+        self.manager.run(1, 'import os')
+        if not is_isolated(self.manager._sessions[1].layers):
+            self.skipTest('Jądro nie pozwala na przestrzenie nazw lub seccomp')
+        self.assertIn('Read-only file system', self.manager.run(1, "open('/etc/repl-probe', 'w')")['stderr'])
+        self.assertIn('PermissionError', self.manager.run(1, 'os.fork()')['stderr'])
+        self.assertFalse(os.path.exists('/etc/repl-probe'))
+
+    @override_settings(RUNNER_MAX_PROCESSES=1)
+    def test_kernels_hold_runner_slots(self):
+        from Kursy_Online.runner import RunnerBusy, process_slot
+        self.manager.run(1, 'a = 1')
+        with self.assertRaises(RunnerBusy):
+            with process_slot(wait=0):
+                pass
+
+        # Jedyne miejsce zajęte przez sesję 1 - nowa sesja zamyka ją zamiast czekać
+        self.assertTrue(self.manager.run(2, 'b = 2')['success'])
+        self.assertIn('NameError', self.manager.run(1, 'a')['stderr'])
+
+        self.manager.shutdown()
+        with process_slot(wait=0):
+            with self.assertRaises(RunnerBusy):
+                self.manager.run(3, 'c = 3')
+
+    def test_host_shares_sessions_between_processes(self):
+        import threading
+        from Kursy_Online.repl import ReplHost, ReplHostClient
+        socket_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, socket_dir, True)
+        socket_path = os.path.join(socket_dir, 'repl.sock')
+        host = ReplHost(socket_path)
+        threading.Thread(target=host.serve_forever, daemon=True).start()
+        self.addCleanup(host.server_close)
+        self.addCleanup(host.shutdown)
+
+        # Dwa procesy serwera WWW - każdy z własnym klientem
+        first, second = ReplHostClient(socket_path), ReplHostClient(socket_path)
+        self.assertTrue(first.run(1, 'n = 20')['success'])
+        self.assertEqual(second.run(1, 'n + 1')['stdout'], '21\n')
+        self.assertTrue(second.close(1))
+        self.assertIn('NameError', first.run(1, 'n')['stderr'])
+
+    def test_session_endpoint_without_host(self):
+        from Kursy_Online.repl import ReplHostClient
+        from Kursy_Online import views
+        client = ReplHostClient(os.path.join(tempfile.gettempdir(), 'missing-repl.sock'))
+        with patch.object(views, 'get_repl_manager', return_value=client):
+            self.client.force_login(self.create_user('student'))
+            response = self.client.post('/python-interpreter/session/', {'code': 'a = 1'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('repl_host', response.json()['error'])
+
+    def test_session_endpoint(self):
+        from Kursy_Online import views
+        with patch.object(views, 'get_repl_manager', return_value=self.manager):
+            self.assertEqual(self.client.post('/python-interpreter/session/', {'code': 'a = 1'}).status_code, 403)
+
+            self.client.force_login(self.create_user('student'))
+            self.client.post('/python-interpreter/session/', {'code': 'a = 1'})
+            response = self.client.post('/python-interpreter/session/', {'code': 'print(a + 1)'}).json()
+            self.assertTrue(response['success'])
+            self.assertEqual(response['output'], '2\n')
+
+            self.client.delete('/python-interpreter/session/')
+            response = self.client.post('/python-interpreter/session/', {'code': 'a'}).json()
+            self.assertFalse(response['success'])
+
+
+class MultiLanguageGradingTests(DjangoTestCase):
+    def setUp(self):
+        import sys
+        import tempfile
+        from Kursy_Online.code_execution import CodeExecutionService
+        from Kursy_Online.languages import Language, LanguageRegistry
+        self.cache_dir = tempfile.mkdtemp()
+        self.compile_log = os.path.join(self.cache_dir, '.compile_log')
+        self.settings_override = override_settings(COMPILED_ARTIFACT_CACHE_DIR=self.cache_dir)
+        self.settings_override.enable()
+
+        # "Kompilowany" język testowy: program w Pythonie czytający wejście ze stdin
+        compiler = f'import shutil, sys; shutil.copy(sys.argv[-1], "program.out"); open({self.compile_log!r}, "a").write("x")'
+        registry = LanguageRegistry()
+        registry.register(Language(
+            'compiled', 'Compiled', '.src',
+            tools={'python': [sys.executable]},
+            compile=['{python}', '-c', compiler],
+            run=['{python}', 'program.out']
+        ))
+        self.registry_patch = patch('Kursy_Online.code_execution.registry', registry)
+        self.registry_patch.start()
+        self.service = CodeExecutionService(timeout=2)
+        self.solution = 'def solution(x):\n    return x * 2\n'
+
+    def tearDown(self):
+        import shutil
+        self.registry_patch.stop()
+        self.settings_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def grade(self, code, test_cases, **kwargs):
+        return self.service.run_all_tests_with_solution(code, self.solution, test_cases, language='compiled', **kwargs)
+
+    def test_stdin_stdout_harness(self):
+        code = 'import ast\nprint(ast.literal_eval(input()) * 2)\n'
+        result = self.grade(code, [{'input_data': '3'}, {'input_data': '[1]', 'expected_output': '[1, 1]'}])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['results'][0]['output'], '6')
+
+    def test_program_is_compiled_once_per_submission(self):
+        code = 'print(int(input()) * 2)\n'
+        result = self.grade(code, [{'input_data': str(i)} for i in range(5)], parallelism=3)
+        self.assertTrue(result['success'])
+        with open(self.compile_log) as log:
+            self.assertEqual(log.read(), 'x')
+
+    def test_wrong_answer_and_runtime_error(self):
+        result = self.grade('print(0)\n', [{'input_data': '3'}])
+        self.assertIn('Nieprawidłowy wynik', result['results'][0]['error'])
+        result = self.grade('raise SystemExit(3)\n', [{'input_data': '3'}])
+        self.assertFalse(result['success'])
+        self.assertIn('3', result['results'][0]['error'])
+
+    def test_unknown_language(self):
+        result = self.service.run_all_tests_with_solution('x', self.solution, [{'input_data': '1'}], language='cobol')
+        self.assertIn('cobol', result['results'][0]['error'])
+
+
+def _race_admission(start, results):
+    from Kursy_Online.admission import ExecutionThrottled, charge_cpu_time, take_token
+    start.wait()
+    taken = 0
+    for _ in range(20):
+        try:
+            take_token('user:1', now=100.0)
+            taken += 1
+        except ExecutionThrottled:
+            pass
+        charge_cpu_time('user:1', 0.01, now=100.0)
+    results.put(taken)
+
+
+class AdmissionControlTests(APITestCase, CodingExerciseMixin):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.exercise = self.create_coding_exercise()
+        self.student = self.create_user('student')
+        self.create_payment(user=self.student, course=self.exercise.page.chapter.course)
+        self.client.force_authenticate(user=self.student)
+
+    def submit(self, code='def solution(x):\n    return x + x\n'):
+        return self.client.post(self.submit_url(self.exercise), {'code': code, 'language': 'python'}, format='json')
+
+    def test_token_bucket_refills_over_time(self):
+        from Kursy_Online.admission import ExecutionThrottled, take_token
+        with override_settings(EXECUTION_RATE_PER_MINUTE=60, EXECUTION_RATE_BURST=2):
+            take_token('user:1', now=100.0)
+            take_token('user:1', now=100.0)
+            with self.assertRaises(ExecutionThrottled) as throttled:
+                take_token('user:1', now=100.5)
+            self.assertEqual(throttled.exception.retry_after, 1)
+            # Inny użytkownik ma własny kubełek
+            take_token('user:2', now=100.5)
+            take_token('user:1', now=101.0)
+
+    def test_cpu_quota_is_charged_per_window(self):
+        from Kursy_Online.admission import ExecutionThrottled, charge_cpu_time, check_cpu_quota
+        with override_settings(EXECUTION_CPU_QUOTA=2, EXECUTION_CPU_QUOTA_WINDOW=60):
+            charge_cpu_time('user:1', 1.5, now=130.0)
+            check_cpu_quota('user:1', now=130.0)
+            charge_cpu_time('user:1', 0.5, now=150.0)
+            with self.assertRaises(ExecutionThrottled) as throttled:
+                check_cpu_quota('user:1', now=150.0)
+            self.assertEqual(throttled.exception.retry_after, 30)
+            # Nowe okno - limit od zera
+            check_cpu_quota('user:1', now=180.0)
+
+    @override_settings(EXECUTION_RATE_PER_MINUTE=1, EXECUTION_RATE_BURST=1, GRADING_ASYNC=True)
+    def test_submission_rate_limited_with_retry_after(self):
+        first = self.submit()
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        second = self.submit()
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(second['Retry-After'], '60')
+        self.assertEqual(GradingJob.objects.count(), 1)
+
+    @override_settings(GRADING_MAX_QUEUE_DEPTH=1, GRADING_QUEUE_RETRY_AFTER=7, GRADING_ASYNC=True)
+    def test_full_grading_queue_returns_429(self):
+        self.submit()
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '7')
+
+    @override_settings(EXECUTION_CPU_QUOTA=1, EXECUTION_CPU_QUOTA_WINDOW=3600, GRADING_ASYNC=False)
+    def test_graded_tests_count_towards_cpu_quota(self):
+        from Kursy_Online.admission import charge_cpu_time
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        charge_cpu_time(f'user:{self.student.pk}', 1)
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_concurrent_requests_share_one_bucket(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from Kursy_Online.admission import ExecutionThrottled, take_token
+
+        def take(_):
+            try:
+                take_token('user:1', now=100.0)
+                return True
+            except ExecutionThrottled:
+                return False
+
+        # LocMemCache - add() atomowe jak w Redis
+        with override_settings(EXECUTION_RATE_PER_MINUTE=60, EXECUTION_RATE_BURST=5, EXECUTION_LIMITS_CACHE='default'):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                taken = list(executor.map(take, range(20)))
+        self.assertEqual(sum(taken), 5)
+
+    def test_processes_race_on_file_cache(self):
+        import multiprocessing
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        caches_setting = {
+            **settings.CACHES,
+            'execution_limits': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.path.join(cache_dir, 'limits')
+            }
+        }
+        with override_settings(CACHES=caches_setting, EXECUTION_LIMITS_CACHE='execution_limits',
+                               EXECUTION_RATE_PER_MINUTE=1, EXECUTION_RATE_BURST=5, EXECUTION_CPU_QUOTA=1000):
+            ctx = multiprocessing.get_context('fork')
+            results = ctx.Queue()
+            start = ctx.Event()
+            # Procesy jak workery gunicorna i grading_worker - wspólny jest tylko katalog cache
+            processes = [ctx.Process(target=_race_admission, args=(start, results)) for _ in range(6)]
+            for process in processes:
+                process.start()
+            start.set()
+            taken = sum(results.get(timeout=60) for _ in processes)
+            for process in processes:
+                process.join()
+
+            from Kursy_Online.admission import _cache
+            self.assertEqual(taken, 5)
+            self.assertEqual(_cache().get('execution:cpu:user:1:0'), 6 * 20 * 10)
+
+    def test_bucket_locked_by_another_process(self):
+        from django.core.cache import cache
+        from Kursy_Online.admission import ExecutionThrottled, take_token
+        cache.add('execution:bucket:user:1:lock', 'inny proces', timeout=5)
+        with override_settings(EXECUTION_RATE_PER_MINUTE=60, EXECUTION_LIMITS_CACHE='default'), \
+                patch('Kursy_Online.admission.LOCK_TIMEOUT', 0.05):
+            with self.assertRaises(ExecutionThrottled):
+                take_token('user:1')
+
+    @override_settings(GRADING_MAX_QUEUE_DEPTH=1, GRADING_QUEUE_RETRY_AFTER=7, GRADING_ASYNC=True)
+    def test_streaming_submission_checks_queue_depth(self):
+        self.submit()
+        url = self.submit_url(self.exercise).replace('submit_solution/', 'submit_solution_stream/')
+        response = self.client.post(url, {'code': 'def solution(x):\n    return x + x\n', 'language': 'python'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '7')
+
+    @override_settings(EXECUTION_RATE_PER_MINUTE=1, EXECUTION_RATE_BURST=1)
+    def test_interpreter_rate_limited_per_client(self):
+        self.client.force_authenticate(user=None)
+        first = self.client.post('/run-code/', {'language': 'python', 'code': 'print(1)'}, format='json')
+        self.assertEqual(first.status_code, 200)
+        second = self.client.post('/run-code/', {'language': 'python', 'code': 'print(1)'}, format='json')
+        self.assertEqual(second.status_code, 429)
+        self.assertFalse(second.json()['success'])
+        self.assertEqual(second['Retry-After'], '60')
+
+
+@override_settings(GRADING_ASYNC=False)
+class GradingTelemetryTests(APITestCase, CodingExerciseMixin):
+    def setUp(self):
+        self.exercise = self.create_coding_exercise()
+        self.student = self.create_user('student')
+        self.create_payment(user=self.student, course=self.exercise.page.chapter.course)
+        self.client.force_authenticate(user=self.student)
+
+    def submit(self, code='def solution(x):\n    return x + x\n'):
+        return self.client.post(self.submit_url(self.exercise), {'code': code, 'language': 'python'}, format='json')
+
+    def test_histogram_percentiles(self):
+        histogram = GradingHistogram(exercise=self.exercise, phase='execute')
+        for _ in range(98):
+            histogram.add(0.001)
+        histogram.add(0.5)
+        histogram.add(2.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertLess(histogram.percentile(50), 0.0013)
+        self.assertGreater(histogram.percentile(50), 0.0005)
+        self.assertGreater(histogram.percentile(99), 0.25)
+        self.assertLessEqual(histogram.percentile(100), 2.0)
+        self.assertAlmostEqual(histogram.total_time, 2.598)
+
+    def test_submission_records_phase_timings(self):
+        self.submit()
+        submission = Submission.objects.get()
+        self.assertIsNotNone(submission.compile_time)
+        for timings in submission.test_timings:
+            self.assertGreaterEqual(timings['execute'], 0)
+            self.assertGreaterEqual(timings['compare'], 0)
+            self.assertIn('peak_memory', timings)
+
+        histograms = {h.phase: h for h in GradingHistogram.objects.filter(exercise=self.exercise)}
+        self.assertEqual(set(histograms), {'compile', 'execute', 'compare'})
+        self.assertEqual(histograms['compile'].count, 1)
+        self.assertEqual(histograms['execute'].count, 2)
+
+        # Werdykt z cache nie trafia do histogramów
+        self.submit()
+        self.assertEqual(GradingHistogram.objects.get(exercise=self.exercise, phase='execute').count, 2)
+
+    def test_metrics_endpoint_orders_by_grader_time(self):
+        other = self.create_coding_exercise(course=self.create_course(
+            instructor=self.exercise.page.chapter.course.instructor, title='Inny kurs'
+        ))
+        GradingHistogram.objects.create(exercise=other, phase='execute', count=1, total_time=5.0, max_time=5.0)
+        self.submit()
+
+        response = self.client.get('/api/grading-metrics/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = self.create_user('admin', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        exercises = self.client.get('/api/grading-metrics/').data['exercises']
+        self.assertEqual([entry['exercise_id'] for entry in exercises], [other.pk, self.exercise.pk])
+        self.assertGreater(exercises[0]['cpu_share'], 0.5)
+        self.assertIn('p95', exercises[1]['phases']['execute'])
+
+        filtered = self.client.get(f'/api/grading-metrics/?exercise={self.exercise.pk}').data['exercises']
+        self.assertEqual(len(filtered), 1)
+
+
+class RegradingTests(DjangoTestCase, CodingExerciseMixin):
+    def setUp(self):
+        from Kursy_Online.grading import grade_submission
+        self.exercise = self.create_coding_exercise()
+        self.doubler = self.create_user('doubler')
+        self.tripler = self.create_user('tripler')
+        doubling = 'def solution(x):\n    return x * 2\n'
+        tripling = 'def solution(x):\n    return x * 3\n'
+        grade_submission(self.doubler, self.exercise, doubling)
+        grade_submission(self.doubler, self.exercise, doubling)
+        grade_submission(self.tripler, self.exercise, tripling)
+        self.assertTrue(UserProgress.objects.get(user=self.doubler).completed)
+
+        # Instruktor zmienia zadanie - od teraz poprawne jest potrojenie
+        self.exercise.solution = tripling
+        self.exercise.save()
+
+    def regrade(self, **kwargs):
+        from Kursy_Online.regrading import regrade_exercise
+        return regrade_exercise(CodingExercise.objects.get(pk=self.exercise.pk), **kwargs)
+
+    def test_regrade_updates_verdicts_and_progress(self):
+        stats = self.regrade(batch_size=2)
+        self.assertEqual(stats['regraded'], 3)
+        # Identyczny kod oceniany raz
+        self.assertEqual(stats['graded'], 2)
+        self.assertFalse(Submission.objects.filter(user=self.doubler, passed=True).exists())
+        self.assertTrue(Submission.objects.filter(user=self.tripler, passed=True).exists())
+        self.assertFalse(UserProgress.objects.get(user=self.doubler).completed)
+        self.assertTrue(UserProgress.objects.get(user=self.tripler).completed)
+        self.assertEqual(Submission.objects.filter(cached=False).count(), 2)
+
+    def test_regrade_resumes_after_interruption(self):
+        from Kursy_Online.regrading import grade_code
+
+        calls = []
+
+        def interrupted(*args, **kwargs):
+            if calls:
+                raise KeyboardInterrupt()
+            calls.append(args)
+            return grade_code(*args, **kwargs)
+
+        with patch('Kursy_Online.regrading.grade_code', side_effect=interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.regrade(batch_size=2, workers=1)
+        # Pierwsza partia (dwa zgłoszenia tego samego kodu) została zapisana
+        self.assertEqual(self.regrade()['regraded'], 1)
+        self.assertEqual(self.regrade()['regraded'], 0)
+
+    def test_admin_action_queues_regrade(self):
+        from Kursy_Online.grading import claim_next_grading_job, process_grading_job
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'haslo123')
+        self.client.force_login(admin_user)
+        action = {'action': 'regrade_submissions', '_selected_action': [self.exercise.pk]}
+        with patch('Kursy_Online.regrading.regrade_exercise') as regrade:
+            self.client.post('/admin/Kursy_Online/codingexercise/', action)
+            self.client.post('/admin/Kursy_Online/codingexercise/', action)
+        # Żądanie panelu nie ocenia - zadanie czeka na grading_worker (jedno mimo dwóch kliknięć)
+        regrade.assert_not_called()
+        job = GradingJob.objects.get()
+        self.assertEqual((job.kind, job.status), ('REGRADE', 'PENDING'))
+
+        job = process_grading_job(claim_next_grading_job('test'))
+        self.assertEqual(job.status, 'DONE')
+        self.assertEqual(job.result['regraded'], 3)
+        self.assertTrue(UserProgress.objects.get(user=self.tripler).completed)
+
+    def test_long_regrade_job_is_not_requeued(self):
+        from Kursy_Online.grading import claim_next_grading_job, enqueue_regrade_job, process_grading_job, \
+            requeue_stale_grading_jobs
+        from Kursy_Online.regrading import regrade_exercise
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'haslo123')
+        enqueue_regrade_job(admin_user, self.exercise.page)
+        job = claim_next_grading_job('worker-1')
+        requeued = []
+
+        def long_regrade(coding_exercise, progress=None):
+            def batch_done(stats):
+                # Ocenianie trwa już godzinę - dłużej niż stale_after
+                an_hour_ago = timezone.now() - timezone.timedelta(hours=1)
+                GradingJob.objects.filter(pk=job.pk).update(started_at=an_hour_ago, heartbeat_at=an_hour_ago)
+                progress(stats)
+                requeued.append(requeue_stale_grading_jobs(300))
+            return regrade_exercise(coding_exercise, batch_size=1, progress=batch_done)
+
+        with patch('Kursy_Online.regrading.regrade_exercise', long_regrade):
+            job = process_grading_job(job)
+        self.assertEqual(requeued, [0, 0, 0])
+        self.assertEqual(job.status, 'DONE')
+        self.assertIsNone(claim_next_grading_job('worker-2'))
+
+    def test_regrade_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('regrade', '--stale', stdout=out)
+        self.assertIn('3 submissions regraded', out.getvalue())
+        call_command('regrade', str(self.exercise.pk), stdout=out)
+        self.assertIn('0 submissions regraded', out.getvalue())
+
+
+class ComparisonTests(DjangoTestCase, CodingExerciseMixin):
+    def test_modes(self):
+        from Kursy_Online.comparison import compare_outputs
+        self.assertTrue(compare_outputs('0.30000000000000004', '0.3', 'float'))
+        self.assertFalse(compare_outputs('0.30000000000000004', '0.3', 'exact'))
+        self.assertFalse(compare_outputs('0.31', '0.3', 'float', tolerance=1e-3))
+        self.assertTrue(compare_outputs("{'b': 2, 'a': 1}", "{'a': 1, 'b': 2}", 'structural'))
+        self.assertTrue(compare_outputs('[3, 1, 2]', '[1, 2, 3]', 'unordered'))
+        self.assertFalse(compare_outputs('[3, 1, 2]', '[1, 2, 3]', 'structural'))
+        self.assertFalse(compare_outputs('[1, 1, 2]', '[1, 2, 2]', 'unordered'))
+        # Tekst niebędący literałem porównywany dokładnie
+        self.assertTrue(compare_outputs('hello\n', 'hello', 'structural'))
+
+    def test_large_expected_output_compared_by_digest(self):
+        from Kursy_Online.comparison import LARGE_OUTPUT, ExpectedDigest, compact_expected, compare_outputs
+        expected = 'x' * (LARGE_OUTPUT + 1)
+        compact = compact_expected(expected)
+        self.assertIsInstance(compact, ExpectedDigest)
+        self.assertLess(len(pickle.dumps(compact)), 1024)
+        self.assertTrue(compare_outputs(expected + '\n', compact))
+        self.assertFalse(compare_outputs('y' + expected[1:], compact))
+        # W pozostałych trybach wynik musi zostać sparsowany w całości
+        self.assertEqual(compact_expected(expected, 'structural'), expected)
+
+    def test_huge_output_is_truncated(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        from Kursy_Online.comparison import PREVIEW_LENGTH
+        results = CodeExecutionService().run_all_tests_with_solution(
+            'def solution(x):\n    return list(range(100000))\n',
+            'def solution(x):\n    return list(range(99999))\n',
+            [{'input_data': '1'}]
+        )
+        result = results['results'][0]
+        self.assertFalse(result['success'])
+        self.assertLess(len(result['error']), 3 * PREVIEW_LENGTH)
+        self.assertLess(len(str(result['actual_output'])), 2 * PREVIEW_LENGTH)
+
+    def test_exercise_comparison_mode(self):
+        from Kursy_Online.grading import exercise_version, grade_submission
+        exercise = self.create_coding_exercise(
+            solution='def solution(x):\n    return [x / 3] * 2\n', inputs=('1',)
+        )
+        student = self.create_user('student')
+        code = 'def solution(x):\n    return [x / 3 + 1e-9, x / 3]\n'
+        self.assertFalse(grade_submission(student, exercise, code)['success'])
+
+        version = exercise_version(exercise)
+        exercise.comparison_mode = 'float'
+        exercise.save()
+        self.assertNotEqual(exercise_version(exercise), version)
+        self.assertTrue(grade_submission(student, exercise, code)['success'])
+
+
+def _isolation_probe(x):
+    import os
+    import socket
+    probe = {'project': os.path.exists(os.path.join(str(settings.BASE_DIR), 'manage.py'))}
+    try:
+        socket.socket()
+        probe['socket'] = True
+    except OSError:
+        probe['socket'] = False
+    try:
+        os.execv('/bin/true', ['true'])
+    except OSError:
+        probe['exec'] = False
+    for name, path in (('write_root', '/etc'), ('write_tmp', '/tmp')):
+        try:
+            with open(os.path.join(path, f'sandbox-probe-{os.getpid()}'), 'w'):
+                probe[name] = True
+        except OSError:
+            probe[name] = False
+    try:
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        probe['fork'] = True
+    except OSError:
+        probe['fork'] = False
+    return probe
+
+
+class SandboxIsolationTests(DjangoTestCase):
+    def test_seccomp_filter_covers_denied_syscalls(self):
+        from Kursy_Online.isolation import DENIED_SYSCALLS, SYSCALL_TABLES, process_filter, seccomp_filter
+        for machine, (_, numbers) in SYSCALL_TABLES.items():
+            program = seccomp_filter(machine)
+            self.assertEqual(len(program) % 8, 0)
+            self.assertEqual(len(process_filter(machine)) % 8, 0)
+            self.assertTrue(set(DENIED_SYSCALLS) <= set(numbers))
+
+    def test_cgroup_limits_written(self):
+        from Kursy_Online.isolation import join_cgroup, remove_cgroup
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        os.makedirs(os.path.join(root, 'worker-1'))
+        for control in ('memory.max', 'cpu.max', 'pids.max'):
+            open(os.path.join(root, 'worker-1', control), 'w').close()
+        with self.settings(SANDBOX_CGROUP_MEMORY_MAX=1024, SANDBOX_CGROUP_CPUS=0.5, SANDBOX_CGROUP_PIDS_MAX=4):
+            path = join_cgroup(root, 'worker-1')
+        with open(os.path.join(path, 'cpu.max')) as cpu_max:
+            self.assertEqual(cpu_max.read(), '50000 100000')
+        with open(os.path.join(path, 'memory.max')) as memory_max:
+            self.assertEqual(memory_max.read(), '1024')
+        self.assertFalse(os.path.exists(os.path.join(path, 'memory.swap.max')))
+        remove_cgroup(path)
+
+    @override_settings(SANDBOX_ISOLATION='off')
+    def test_disabled_isolation_keeps_ast_check(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        from Kursy_Online.sandbox import SandboxPool
+        pool = SandboxPool(size=1)
+        self.addCleanup(pool.shutdown)
+        self.assertFalse(pool.isolated)
+        code = 'import math\ndef solution(x):\n    return math.sqrt(x)\n'
+        result = CodeExecutionService(pool=pool).run_all_tests_with_solution(code, code, [{'input_data': '4'}])
+        self.assertEqual(result['results'][0]['error'], 'Niedozwolone operacje w kodzie użytkownika')
+
+    def test_isolated_worker(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        from Kursy_Online.sandbox import SandboxPool
+        pool = SandboxPool(size=1)
+        self.addCleanup(pool.shutdown)
+        if not pool.isolated:
+            self.skipTest('Jądro nie pozwala na przestrzenie nazw lub seccomp')
+
+        probe = pool.run(_isolation_probe, 1, time_limit=5)
+        self.assertEqual(probe, {
+            'project': False, 'socket': False, 'exec': False, 'write_root': False, 'write_tmp': False,
+            'fork': False, 'peak_memory': probe['peak_memory']
+        })
+
+        service = CodeExecutionService(pool=pool)
+        code = 'import math\nfrom collections import Counter\ndef solution(x):\n    return math.isqrt(x) + Counter("aa")["a"]\n'
+        result = service.run_all_tests_with_solution(code, code, [{'input_data': '16'}])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['results'][0]['output'], 6)
+
+        result = service.run_all_tests_with_solution('import os\ndef solution(x):\n    return x\n', code,
+                                                     [{'input_data': '16'}])
+        self.assertEqual(result['results'][0]['error'], 'Niedozwolony import modułu os')
+
+    def test_builtins_changes_do_not_leak_between_jobs(self):
+        from Kursy_Online.code_execution import CodeExecutionService
+        from Kursy_Online.sandbox import SandboxPool
+        pool = SandboxPool(size=1)
+        self.addCleanup(pool.shutdown)
+        service = CodeExecutionService(pool=pool)
+        attack = "__builtins__['abs'] = lambda x: 'hacked'\ndef solution(x):\n    return x\n"
+        honest = 'def solution(x):\n    return abs(x)\n'
+        service.run_all_tests_with_solution(attack, attack, [{'input_data': '-1', 'expected_output': '-1'}])
+        result = service.run_all_tests_with_solution(honest, honest, [{'input_data': '-3', 'expected_output': '3'}])
+        self.assertTrue(result['success'], result)
+
+    @override_settings(SANDBOX_ISOLATION='required')
+    def test_required_isolation_fails_loudly(self):
+        from Kursy_Online.isolation import IsolationError
+        from Kursy_Online.sandbox import SandboxPool
+        pool = SandboxPool(size=1)
+        self.addCleanup(pool.shutdown)
+        with patch('Kursy_Online.isolation._enter_namespaces', side_effect=IsolationError('unshare: brak uprawnień')):
+            with self.assertRaises(IsolationError):
+                pool.isolated
+
+
+@override_settings(TEST_CASE_BLOB_THRESHOLD=1000)
+class TestCaseBlobTests(APITestCase, CodingExerciseMixin):
+    def setUp(self):
+        self.exercise = self.create_coding_exercise(solution='def solution(x):\n    return x[::-1]\n', inputs=())
+        self.large_input = str(list(range(1000)))
+        with computing_expected_outputs(self):
+            self.test_case = TestCase.objects.create(exercise=self.exercise, input_data=self.large_input, order=1)
+        self.test_case.refresh_from_db()
+
+    def test_large_input_and_output_stored_as_files(self):
+        from Kursy_Online.blobs import BlobRef
+        from Kursy_Online.code_execution import load_test_input
+        test_case = self.test_case
+        self.assertEqual(test_case.input_data, '')
+        self.assertIsNone(test_case.parsed_input)
+        self.assertEqual(test_case.expected_output, '')
+        with open(BlobRef(test_case.input_blob).path) as stored:
+            self.assertEqual(stored.read(), self.large_input)
+        self.assertEqual(load_test_input(test_case.grading_input(), test_case.grading_parsed_input()),
+                         list(range(1000)))
+        self.assertEqual(BlobRef(test_case.expected_output_blob).read_text(), str(list(range(999, -1, -1))))
+
+        # Zapis bez zmiany wejścia zachowuje plik, nowe małe wejście go zastępuje
+        test_case.is_hidden = True
+        test_case.save()
+        test_case.refresh_from_db()
+        self.assertTrue(test_case.input_blob)
+        with computing_expected_outputs(self):
+            test_case.input_data = '[1, 2]'
+            test_case.save()
+        test_case.refresh_from_db()
+        self.assertEqual((test_case.input_blob, test_case.parsed_input_blob), ('', ''))
+        self.assertEqual(test_case.expected_output, '[2, 1]')
+        self.assertEqual(test_case.expected_output_blob, '')
+
+    def test_grading_with_files(self):
+        from Kursy_Online.grading import build_test_cases, grade_submission
+        from Kursy_Online.blobs import BlobRef
+        test_cases = build_test_cases(self.exercise)
+        self.assertIsInstance(test_cases[0]['input_data'], BlobRef)
+        self.assertIsInstance(test_cases[0]['expected_output'], BlobRef)
+
+        student = self.create_user('student')
+        result = grade_submission(student, self.exercise, 'def solution(x):\n    return list(reversed(x))\n')
+        self.assertTrue(result['success'])
+        result = grade_submission(student, self.exercise, 'def solution(x):\n    return x\n')
+        self.assertFalse(result['success'])
+        test_result = result['test_results'][0]
+        self.assertLess(len(test_result['input']), 600)
+        self.assertLess(len(test_result['expected_output']), 600)
+
+    def test_program_reads_input_file(self):
+        import sys
+        from Kursy_Online.code_execution import CodeExecutionService
+        from Kursy_Online.grading import build_test_cases
+        from Kursy_Online.languages import Language, LanguageRegistry
+        registry = LanguageRegistry()
+        registry.register(Language('script', 'Script', '.py', tools={'python': [sys.executable]},
+                                   run=['{python}', '{source}'], cache_artifacts=False))
+        with patch('Kursy_Online.code_execution.registry', registry):
+            results = CodeExecutionService.for_exercise(self.exercise).run_all_tests_with_solution(
+                'import ast\nprint(ast.literal_eval(input())[::-1])\n', self.exercise.solution,
+                build_test_cases(self.exercise), language='script'
+            )
+        self.assertTrue(results['success'], results)
+
+    def test_api_returns_previews(self):
+        from Kursy_Online.serializers import TestCaseSerializer
+        data = TestCaseSerializer(self.test_case).data
+        self.assertTrue(data['input_data'].startswith('[0, 1, 2'))
+        self.assertLess(len(data['input_data']), 600)
+        self.assertLess(len(data['expected_output']), 600)
+
+    def test_prune_keeps_referenced_files(self):
+        from Kursy_Online.blobs import BlobRef, prune_blobs, store_blob
+        orphan = store_blob('nieużywany plik')
+        self.assertEqual(prune_blobs(min_age=0), 1)
+        self.assertFalse(os.path.exists(BlobRef(orphan).path))
+        self.assertTrue(os.path.exists(BlobRef(self.test_case.input_blob).path))
+
+
+class CourseSearchTests(APITestCase, TestDataMixin):
+    def setUp(self):
+        self.instructor = self.create_user('instructor')
+        self.python = Technology.objects.create(name='Python')
+        self.django = self.create_course(self.instructor, title='Aplikacje webowe w Django', is_published=True,
+                                         description='Budowa serwisów internetowych', price=200)
+        self.django.technologies.add(self.python)
+        self.basics = self.create_course(self.instructor, title='Podstawy programowania', is_published=True,
+                                         description='Pierwsze kroki, w tym trochę Django', price=50)
+        chapter = Chapter.objects.create(course=self.basics, title='Pętle i warunki', order=1)
+        self.page = Page.objects.create(chapter=chapter, title='Generatory', type='CONTENT', order=1)
+
+    def search(self, **params):
+        response = self.client.get('/api/courses/search/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [course['title'] for course in response.data['results']['results']]
+
+    def test_ranked_by_relevance(self):
+        # Trafienie w tytule waży więcej niż w opisie
+        self.assertEqual(self.search(q='django'), [self.django.title, self.basics.title])
+        self.assertEqual(self.search(title='Django'), [self.django.title, self.basics.title])
+
+    def test_indexes_related_titles_and_technologies(self):
+        self.assertEqual(self.search(q='petle'), [self.basics.title])
+        self.assertEqual(self.search(q='generat'), [self.basics.title])
+        self.assertEqual(self.search(q='python'), [self.django.title])
+        self.assertEqual(self.search(q='python generatory'), [])
+
+        self.page.title = 'Iteratory'
+        self.page.save()
+        self.assertEqual(self.search(q='generatory'), [])
+        self.python.name = 'Python 3'
+        self.python.save()
+        self.assertEqual(self.search(q='python 3'), [self.django.title])
+        self.django.technologies.clear()
+        self.assertEqual(self.search(q='python'), [])
+
+    def test_combined_with_filters(self):
+        self.assertEqual(self.search(q='django', max_price=100), [self.basics.title])
+        self.assertEqual(self.search(q='django', sort='price'), [self.basics.title, self.django.title])
+
+    def test_operators_in_query_are_plain_words(self):
+        self.assertEqual(self.search(q='django" OR title:*'), [])
+        self.assertEqual(self.search(q='"django"'), [self.django.title, self.basics.title])
+
+    def test_deleted_course_removed_from_index(self):
+        from Kursy_Online.search import search_courses
+        basics_id = self.basics.pk
+        self.basics.delete()
+        self.assertFalse(search_courses(Course.objects.filter(pk=basics_id), 'podstawy').exists())
+        self.assertEqual(self.search(q='django'), [self.django.title])
+
+    def test_rebuild_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from Kursy_Online.search import get_search_backend
+        get_search_backend().clear()
+        self.assertEqual(self.search(q='django'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search(q='django'), [self.django.title, self.basics.title])
+
+
+class CourseRatingAggregateTests(APITestCase, TestDataMixin):
+    def setUp(self):
+        self.course = self.create_course(is_published=True)
+        self.students = [self.create_user(f'student{i}') for i in range(3)]
+
+    def assertRatings(self, average, count, histogram):
+        self.course.refresh_from_db()
+        if average is None:
+            self.assertIsNone(self.course.average_rating)
+        else:
+            self.assertAlmostEqual(self.course.average_rating, average)
+        self.assertEqual(self.course.review_count, count)
+        self.assertEqual(self.course.rating_histogram, {rating: histogram.get(rating, 0) for rating in range(1, 6)})
+
+    def test_aggregates_follow_reviews(self):
+        self.assertRatings(None, 0, {})
+        first = CourseReview.objects.create(course=self.course, user=self.students[0], rating=5, comment='')
+        # Ocena z request.data przychodzi jako napis
+        CourseReview.objects.create(course=self.course, user=self.students[1], rating='2', comment='')
+        self.assertRatings(3.5, 2, {5: 1, 2: 1})
+
+        first.rating = 4
+        first.save()
+        self.assertRatings(3.0, 2, {4: 1, 2: 1})
+        first.comment = 'Bez zmiany oceny'
+        first.save()
+        self.assertRatings(3.0, 2, {4: 1, 2: 1})
+
+        first.delete()
+        self.assertRatings(2.0, 1, {2: 1})
+        self.students[1].delete()
+        self.assertRatings(None, 0, {})
+
+    def test_sort_and_filter_use_stored_columns(self):
+        other = self.create_course(self.course.instructor, title='Other', is_published=True)
+        CourseReview.objects.create(course=self.course, user=self.students[0], rating=3, comment='')
+        CourseReview.objects.create(course=other, user=self.students[0], rating=5, comment='')
+        CourseReview.objects.create(course=other, user=self.students[1], rating=4, comment='')
+
+        response = self.client.get('/api/courses/search/', {'sort': 'average_rating', 'order': 'desc'})
+        results = response.data['results']['results']
+        self.assertEqual([course['title'] for course in results], ['Other', 'Test Course'])
+        self.assertEqual((results[0]['average_rating'], results[0]['total_reviews']), (4.5, 2))
+        self.assertEqual(results[0]['rating_histogram'], {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1})
+
+        response = self.client.get('/api/courses/search/', {'min_rating': 4})
+        self.assertEqual([course['title'] for course in response.data['results']['results']], ['Other'])
+
+    def test_concurrent_updates_are_relative(self):
+        from Kursy_Online.utils import update_course_ratings
+        stale = Course.objects.get(pk=self.course.pk)
+        update_course_ratings(self.course.pk, {5: 1})
+        update_course_ratings(stale.pk, {1: 1})
+        self.assertRatings(3.0, 2, {5: 1, 1: 1})
+
+
+class KeysetPaginationTests(APITestCase, TestDataMixin):
+    def setUp(self):
+        self.instructor = self.create_user('instructor')
+        # Powtarzające się ceny i brak ocen - kolejność rozstrzyga id
+        self.courses = [
+            self.create_course(self.instructor, title=f'Kurs {i}', price=[10, 20, 20, 30, 20][i], is_published=True)
+            for i in range(5)
+        ]
+        for course, rating in zip(self.courses[:2], (5, 3)):
+            CourseReview.objects.create(course=course, user=self.create_user(f'student{course.pk}'),
+                                        rating=rating, comment='')
+
+    def page_titles(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        # search zwraca {'results': [...], 'filters': {...}}
+        if isinstance(results, dict):
+            results = results['results']
+        return [course['title'] for course in results]
+
+    def walk(self, url, params):
+        response = self.client.get(url, params)
+        pages = [self.page_titles(response)]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(self.page_titles(response))
+        return pages, response
+
+    def titles(self, *indexes):
+        return [f'Kurs {i}' for i in indexes]
+
+    def test_list_pages_follow_sort_key_and_id(self):
+        pages, _ = self.walk('/api/courses/', {'sort': 'price', 'page_size': 2})
+        self.assertEqual(pages, [self.titles(0, 1), self.titles(2, 4), self.titles(3)])
+        pages, _ = self.walk('/api/courses/', {'sort': 'price', 'order': 'desc', 'page_size': 2})
+        self.assertEqual(pages, [self.titles(3, 4), self.titles(2, 1), self.titles(0)])
+        # Domyślnie od najnowszych
+        pages, _ = self.walk('/api/courses/', {'page_size': 3})
+        self.assertEqual(pages, [self.titles(4, 3, 2), self.titles(1, 0)])
+        # Strona główna sortuje po nazwie na serwerze i doładowuje kolejne strony
+        pages, _ = self.walk('/api/courses/', {'sort': 'title', 'order': 'desc', 'page_size': 2})
+        self.assertEqual(pages, [self.titles(4, 3), self.titles(2, 1), self.titles(0)])
+
+    def test_nulls_last_and_previous_pages(self):
+        # Kursy bez ocen na końcu w obu kierunkach, remisy według id w kierunku sortowania
+        for order, expected in (('desc', [0, 1, 4, 3, 2]), ('asc', [1, 0, 2, 3, 4])):
+            pages, last = self.walk('/api/courses/search/', {'sort': 'average_rating', 'order': order, 'page_size': 2})
+            self.assertEqual(sum(pages, []), self.titles(*expected))
+            backwards = []
+            response = last
+            while response.data['previous']:
+                response = self.client.get(response.data['previous'])
+                backwards.insert(0, self.page_titles(response))
+            self.assertEqual(backwards, pages[:-1])
+
+    def test_search_pages_by_relevance(self):
+        pages, _ = self.walk('/api/courses/search/', {'q': 'kurs', 'page_size': 2})
+        self.assertEqual(pages, [self.titles(0, 1), self.titles(2, 3), self.titles(4)])
+
+    def test_no_count_unless_total_requested(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/courses/', {'page_size': 2})
+        self.assertNotIn('total', response.data)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get('/api/courses/', {'page_size': 2, 'with_total': 1})
+        self.assertEqual(response.data['total'], 5)
+        self.create_course(self.instructor, title='Nowy', is_published=True)
+        # Przybliżona liczba z pamięci podręcznej
+        self.assertEqual(self.client.get('/api/courses/', {'page_size': 2, 'with_total': 1}).data['total'], 5)
+
+    def test_invalid_or_foreign_cursor(self):
+        response = self.client.get('/api/courses/', {'cursor': 'nie-kursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/courses/', {'sort': 'price', 'page_size': 2})
+        cursor = response.data['next'].split('cursor=')[1].split('&')[0]
+        response = self.client.get('/api/courses/', {'sort': 'created_at', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reviews_paginated(self):
+        response = self.client.get(f'/api/courses/{self.courses[0].pk}/reviews/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([review['rating'] for review in response.data['results']], [5])
+        self.assertIsNone(response.data['next'])
+
+
+class CourseFacetTests(APITestCase, TestDataMixin):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.instructor = self.create_user('instructor', first_name='Anna')
+        self.python = Technology.objects.create(name='Python')
+        self.create_course(self.instructor, price=20, is_published=True)
+        self.create_course(self.instructor, title='Drugi', price=80, is_published=True)
+
+    def test_facets_computed_once_per_version(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        response = self.client.get('/api/courses/filters/')
+        self.assertEqual(response.data['price_range'], {'min': Decimal('20'), 'max': Decimal('80')})
+        self.assertEqual(response.data['instructors'], [
+            {'id': self.instructor.pk, 'username': 'instructor', 'first_name': 'Anna', 'last_name': ''}
+        ])
+        self.assertEqual([technology['name'] for technology in response.data['technologies']], ['Python'])
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get('/api/courses/filters/')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(again.data, response.data)
+
+        search = self.client.get('/api/courses/search/')
+        self.assertEqual(search.data['results']['facets_version'], response.data['version'])
+        self.assertNotIn('filters', search.data['results'])
+
+    def test_invalidated_by_relevant_changes_only(self):
+        version = self.client.get('/api/courses/filters/').data['version']
+        # Logowanie (zapis last_login) i nowi użytkownicy nie zmieniają faset
+        self.instructor.last_login = timezone.now()
+        self.instructor.save(update_fields=['last_login'])
+        self.create_user('student')
+        self.assertEqual(self.client.get('/api/courses/filters/').data['version'], version)
+
+        self.instructor.last_name = 'Nowak'
+        self.instructor.save()
+        response = self.client.get('/api/courses/filters/')
+        self.assertGreater(response.data['version'], version)
+        self.assertEqual(response.data['instructors'][0]['last_name'], 'Nowak')
+
+        version = response.data['version']
+        Technology.objects.create(name='Rust')
+        response = self.client.get('/api/courses/filters/')
+        self.assertGreater(response.data['version'], version)
+        self.assertEqual(len(response.data['technologies']), 2)
+
+        version = response.data['version']
+        self.create_course(self.instructor, title='Tani', price=5)
+        response = self.client.get('/api/courses/filters/')
+        self.assertGreater(response.data['version'], version)
+        self.assertEqual(response.data['price_range']['min'], Decimal('5'))
+
+    def test_balance_change_skips_facets(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        version = self.client.get('/api/courses/filters/').data['version']
+        instructor = User.objects.get(pk=self.instructor.pk)
+        instructor.balance += 10
+        with CaptureQueriesContext(connection) as queries:
+            instructor.save()
+        # Sam UPDATE - bez sprawdzania kursów prowadzącego
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.client.get('/api/courses/filters/').data['version'], version)
+
+    def test_version_shared_between_processes(self):
+        import multiprocessing
+        from Kursy_Online.facets import facets_version, invalidate_facets
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        caches_setting = {
+            **settings.CACHES,
+            'facets': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir}
+        }
+        with override_settings(CACHES=caches_setting, FACETS_CACHE='facets'):
+            version = facets_version()
+            # Zmiana kursu obsłużona przez inny proces serwera
+            other = multiprocessing.get_context('fork').Process(target=invalidate_facets)
+            other.start()
+            other.join()
+            self.assertEqual(other.exitcode, 0)
+            self.assertGreater(facets_version(), version)
+
+    def test_conditional_requests(self):
+        response = self.client.get('/api/courses/filters/')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        not_modified = self.client.get('/api/courses/filters/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        pinned = self.client.get('/api/courses/filters/', {'version': response.data['version']})
+        self.assertIn('immutable', pinned['Cache-Control'])
+
+
+class FacetCountTests(APITestCase, TestDataMixin):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        instructor = self.create_user('instructor')
+        self.python = Technology.objects.create(name='Python')
+        self.django = Technology.objects.create(name='Django')
+        courses = [
+            ('BEGINNER', 20, [self.python]),
+            ('BEGINNER', 120, [self.python, self.django]),
+            ('ADVANCED', 60, [self.django]),
+            ('ADVANCED', 600, []),
+        ]
+        for index, (level, price, technologies) in enumerate(courses):
+            course = self.create_course(instructor, title=f'Kurs {index}', level=level, price=price, is_published=True)
+            course.technologies.set(technologies)
+        # Nieopublikowany - niewidoczny dla anonimowych, więc nie liczony
+        self.create_course(instructor, title='Szkic', level='BEGINNER', price=10)
+
+    def counts(self, **params):
+        response = self.client.get('/api/courses/search/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = response.data['results']['facet_counts']
+        return (
+            counts['levels'],
+            {technology['name']: technology['count'] for technology in counts['technologies']},
+            [bucket['count'] for bucket in counts['price']]
+        )
+
+    def test_counts_without_filters(self):
+        levels, technologies, prices = self.counts()
+        self.assertEqual(levels, {'BEGINNER': 2, 'INTERMEDIATE': 0, 'ADVANCED': 2})
+        self.assertEqual(technologies, {'Python': 2, 'Django': 2})
+        # [0, 50), [50, 100), [100, 200), [200, 500), 500+
+        self.assertEqual(prices, [1, 1, 1, 0, 1])
+
+    def test_each_facet_ignores_only_its_own_filter(self):
+        levels, technologies, prices = self.counts(level='BEGINNER', technologies=['Django'])
+        self.assertEqual(levels, {'BEGINNER': 1, 'INTERMEDIATE': 0, 'ADVANCED': 1})
+        self.assertEqual(technologies, {'Python': 2, 'Django': 1})
+        self.assertEqual(prices, [0, 0, 1, 0, 0])
+
+        levels, technologies, prices = self.counts(max_price=100, technologies=['Python', 'Django'])
+        self.assertEqual(levels, {'BEGINNER': 1, 'INTERMEDIATE': 0, 'ADVANCED': 1})
+        self.assertEqual(technologies, {'Python': 1, 'Django': 1})
+        self.assertEqual(prices, [1, 1, 1, 0, 0])
+
+    def test_counts_follow_query_and_single_statement(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.get('/api/courses/filters/')
+        with CaptureQueriesContext(connection) as queries:
+            levels, technologies, _ = self.counts(q='kurs 1', level='ADVANCED')
+        self.assertEqual(levels, {'BEGINNER': 1, 'INTERMEDIATE': 0, 'ADVANCED': 0})
+        self.assertEqual(technologies, {'Python': 0, 'Django': 0})
+        self.assertEqual(sum('COUNT(DISTINCT' in query['sql'] for query in queries.captured_queries), 1)
+
+    def test_multiple_selected_technologies_do_not_duplicate_results(self):
+        response = self.client.get('/api/courses/search/', {'technologies': ['Python', 'Django']})
+        titles = [course['title'] for course in response.data['results']['results']]
+        self.assertEqual(sorted(titles), ['Kurs 0', 'Kurs 1', 'Kurs 2'])
+        next_page = self.client.get('/api/courses/search/', {'page_size': 1})
+        self.assertIsNone(self.client.get(next_page.data['next']).data['results']['facet_counts'])
+
+
 class ProgressTrackingTests(DjangoTestCase, TestDataMixin):
     def setUp(self):
         self.student = self.create_user('student')
@@ -1,4 +1,14 @@
-from .models import User, PayoutHistory
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+from .blobs import blob_threshold, store_blob
+from .models import User, PayoutHistory, CodingExercise, Course, TestCase
+from .code_execution import CodeExecutionService, solution_hash
+
+# Jeden wątek w tle - przeliczenia dla tego samego zadania wykonują się po kolei
+_background = ThreadPoolExecutor(max_workers=1)
 
 def distribute_balance(course, amount):
     """
@@ -42,3 +52,100 @@ def distribute_balance(course, amount):
         }
     except Exception as e:
         raise ValueError(f"Błąd podczas rozdzielania salda: {str(e)}")
+
+
+def stale_expected_outputs(current_hash):
+    """
+    Przypadki testowe bez oczekiwanego wyniku albo z wynikiem wyliczonym z innej wersji rozwiązania.
+    Wyniki wpisane przez prowadzącego (bez skrótu rozwiązania) nie są przeliczane.
+    """
+    missing = Q(expected_output_blob='') & (Q(expected_output__isnull=True) | Q(expected_output=''))
+    return Q(solution_hash='') & missing | ~Q(solution_hash='') & ~Q(solution_hash=current_hash)
+
+
+def refresh_expected_outputs(exercise_id, test_case_ids=None):
+    """
+    Przelicza brakujące i nieaktualne oczekiwane wyniki przypadków testowych na podstawie
+    rozwiązania wzorcowego i zapisuje je razem ze skrótem rozwiązania, z którego pochodzą.
+    Zwraca liczbę przeliczonych przypadków.
+    """
+    try:
+        exercise = CodingExercise.objects.get(pk=exercise_id)
+    except CodingExercise.DoesNotExist:
+        return 0
+
+    # Bez rozwiązania wzorcowego nie ma z czego liczyć - zostają wyniki wpisane przez prowadzącego
+    if not exercise.solution.strip():
+        return 0
+
+    current_hash = solution_hash(exercise.solution)
+    test_cases = TestCase.objects.filter(stale_expected_outputs(current_hash), exercise=exercise)
+    if test_case_ids is not None:
+        test_cases = test_cases.filter(id__in=test_case_ids)
+    test_cases = list(test_cases.only('id', 'input_data', 'parsed_input', 'input_blob', 'parsed_input_blob'))
+    if not test_cases:
+        return 0
+
+    outputs = CodeExecutionService.for_exercise(exercise).compute_expected_outputs(
+        exercise.solution,
+        [tc.grading_input() for tc in test_cases],
+        [tc.grading_parsed_input() for tc in test_cases]
+    )
+
+    # update() zamiast save(), żeby nie wywoływać ponownie sygnału post_save
+    for test_case, output in zip(test_cases, outputs):
+        output_blob = ''
+        if output is not None and len(output) > blob_threshold():
+            # Duży wynik w pliku - nie w bazie i nie w każdym odczycie przypadków testowych
+            output_blob, output = store_blob(output), ''
+        # Warunek powtórzony - wynik wpisany w międzyczasie przez prowadzącego nie jest nadpisywany
+        TestCase.objects.filter(stale_expected_outputs(current_hash), id=test_case.id).update(
+            expected_output=output,
+            expected_output_blob=output_blob,
+            solution_hash=current_hash if output is not None else ''
+        )
+    return len(test_cases)
+
+
+def _refresh_expected_outputs_in_background(exercise_id, test_case_ids=None):
+    try:
+        refresh_expected_outputs(exercise_id, test_case_ids)
+    finally:
+        connection.close()
+
+
+def schedule_expected_outputs_refresh(exercise_id, test_case_ids=None):
+    """
+    Przelicza oczekiwane wyniki w tle, po zatwierdzeniu bieżącej transakcji.
+    """
+    transaction.on_commit(
+        lambda: _background.submit(_refresh_expected_outputs_in_background, exercise_id, test_case_ids)
+    )
+
+
+RATINGS = range(1, 6)
+
+
+def rating_aggregate_updates(changes):
+    """
+    Course.update() arguments applying the changes {rating: +/-count} to the rating histogram,
+    review_count and average_rating. All columns are computed in the database from their current
+    values, so concurrent reviews of the same course cannot overwrite each other.
+    """
+    counts = {rating: F(f'rating_{rating}') + changes.get(rating, 0) for rating in RATINGS}
+    total = sum(counts.values(), Value(0))
+    weighted = sum((count * rating for rating, count in counts.items()), Value(0))
+    updates = {f'rating_{rating}': counts[rating] for rating in RATINGS if changes.get(rating)}
+    updates['review_count'] = total
+    updates['average_rating'] = Case(
+        When(GreaterThan(total, 0), then=Cast(weighted, FloatField()) / Cast(total, FloatField())),
+        default=None,
+        output_field=FloatField()
+    )
+    return updates
+
+
+def update_course_ratings(course_id, changes):
+    changes = {rating: count for rating, count in changes.items() if rating in RATINGS and count}
+    if changes:
+        Course.objects.filter(pk=course_id).update(**rating_aggregate_updates(changes))
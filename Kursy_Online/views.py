@@ -1,9 +1,7 @@
 from django.contrib.auth import login, logout, authenticate
 from django.shortcuts import render, redirect
+from django.urls import reverse
 import traceback
-import subprocess
-import shutil
-import tempfile
 import os
 import json
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -17,7 +15,7 @@ from django.utils.crypto import get_random_string
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils import timezone
-from django.http import Http404, HttpResponseForbidden, HttpResponse, JsonResponse
+from django.http import Http404, HttpResponseForbidden, HttpResponse, JsonResponse, StreamingHttpResponse
 from io import StringIO
 from contextlib import redirect_stdout
 from functools import wraps
@@ -28,13 +26,22 @@ from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Max,Min, Avg, Count, Avg, Q
+from rest_framework.utils.encoders import JSONEncoder
+from django.db.models import Max, Q
 from django.db import models, transaction
-from .code_execution import CodeExecutionService
+from .admission import ExecutionThrottled, admit, charge_cpu_time, execution_key
+from .comparison import preview
+from .facets import facet_counts, facets_version, get_facets
+from .pagination import CoursePagination, ReviewPagination
+from .search import search_courses
+from .grading import enqueue_grading_job, follow_grading_job, grade_submission, iter_submission_results
+from .repl import ReplHostUnavailable, get_repl_manager
+from .telemetry import grading_metrics
+from .languages import LanguageUnavailable, registry
+from .runner import CompilationError, RunnerBusy, execution_error, execution_metadata
 from .utils import distribute_balance
 from .models import User, VerificationCode, LoginHistory, PayoutHistory, Course, Chapter, Page, UserProgress, ContentPage, \
-    CodingExercise, CourseReview, Payment, Technology, ContentImage, ContentVideo, Quiz, QuizAnswer, QuizQuestion 
+    CodingExercise, CourseReview, Payment, Technology, ContentImage, ContentVideo, Quiz, QuizAnswer, QuizQuestion, GradingJob
 from .serializers import UserRegistrationSerializer, PayoutHistorySerializer, UserSerializer, CourseSerializer, ChapterSerializer, \
     PageSerializer, ContentPageSerializer, QuizSerializer, CodingExerciseSerializer, CodeSubmissionSerializer, \
      TestCaseSerializer,ContentVideoSerializer, ContentImageSerializer, QuizQuestionSerializer, \
@@ -312,6 +319,7 @@ def profile(self, request):
 class CourseViewSet(viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    pagination_class = CoursePagination
     permission_classes = [IsAuthenticated]
 
     def get_permissions(self):
@@ -406,24 +414,11 @@ class CourseViewSet(viewsets.ModelViewSet):
     def search(self, request):
         queryset = self.get_queryset()
 
-        title = request.query_params.get('title', '')
-        if title:
-            queryset = queryset.filter(title__icontains=title)
-
-        technologies = request.query_params.getlist('technologies', [])
-        if technologies:
-            queryset = queryset.filter(technologies__name__in=technologies)
-
-        level = request.query_params.get('level')
-        if level:
-            queryset = queryset.filter(level=level)
-
-        min_price = request.query_params.get('min_price')
-        max_price = request.query_params.get('max_price')
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
+        # q - pełnotekstowo po tytule, opisie, technologiach i tytułach rozdziałów i stron;
+        # title - starsza nazwa parametru
+        query = request.query_params.get('q') or request.query_params.get('title', '')
+        if query:
+            queryset = search_courses(queryset, query)
 
         instructor = request.query_params.get('instructor')
         if instructor:
@@ -433,20 +428,34 @@ class CourseViewSet(viewsets.ModelViewSet):
         if min_rating:
             queryset = queryset.filter(average_rating__gte=min_rating)
 
-        sort_by = request.query_params.get('sort')
-        order = request.query_params.get('order', 'asc')
-        valid_sort_fields = ['price', 'average_rating', 'created_at']
-        if sort_by in valid_sort_fields:
-            if order == 'desc':
-                sort_by = f'-{sort_by}'
-            queryset = queryset.order_by(sort_by)
-
-        page_size = int(request.query_params.get('page_size', 10))
-        page = int(request.query_params.get('page', 1))
+        # Filtry z licznikami (facet_counts) - każdy licznik uwzględnia wszystkie pozostałe
+        faceted = {}
+        technologies = request.query_params.getlist('technologies', [])
+        if technologies:
+            # Podzapytanie zamiast złączenia - kurs z kilkoma wybranymi technologiami nie powtarza się
+            faceted['technologies'] = models.Q(pk__in=Course.technologies.through.objects.filter(
+                technology__name__in=technologies
+            ).values('course_id'))
 
-        paginator = PageNumberPagination()
-        paginator.page_size = min(page_size, 10)
+        level = request.query_params.get('level')
+        if level:
+            faceted['level'] = models.Q(level=level)
 
+        min_price = request.query_params.get('min_price')
+        max_price = request.query_params.get('max_price')
+        if min_price or max_price:
+            faceted['price'] = models.Q()
+            if min_price:
+                faceted['price'] &= models.Q(price__gte=min_price)
+            if max_price:
+                faceted['price'] &= models.Q(price__lte=max_price)
+
+        counted = queryset
+        for facet_filter in faceted.values():
+            queryset = queryset.filter(facet_filter)
+
+        # Sortowanie (sort/order) i kursor obsługuje paginator; bez sort - według trafności
+        paginator = CoursePagination(default_ordering=('search_rank', False) if query else None)
         page_items = paginator.paginate_queryset(queryset, request)
 
         if request.user.is_authenticated:
@@ -464,33 +473,28 @@ class CourseViewSet(viewsets.ModelViewSet):
 
         return paginator.get_paginated_response({
             'results': serializer.data,
-            'filters': {
-                'levels': dict(Course.LEVEL_CHOICES),
-                'technologies': list(Technology.objects.values('id', 'name')),
-                'price_range': {
-                    'min': Course.objects.aggregate(Min('price'))['price__min'],
-                    'max': Course.objects.aggregate(Max('price'))['price__max']
-                }
-            }
+            # Dane filtrów pobiera się z /api/courses/filters/ - klient odświeża je tylko po zmianie wersji
+            'facets_version': facets_version(),
+            # Liczniki nie zależą od kursora - liczone tylko dla pierwszej strony
+            'facet_counts': None if paginator.cursor_query_param in request.query_params
+            else facet_counts(counted, faceted)
         })
 
     @action(detail=False, methods=['GET'])
     def filters(self, request):
-        return Response({
-            'levels': dict(Course.LEVEL_CHOICES),
-            'technologies': TechnologySerializer(
-                Technology.objects.all(),
-                many=True
-            ).data,
-            'price_range': {
-                'min': Course.objects.aggregate(Min('price'))['price__min'],
-                'max': Course.objects.aggregate(Max('price'))['price__max']
-            },
-            'instructors': UserSerializer(
-                User.objects.filter(courses__isnull=False).distinct(),
-                many=True
-            ).data
-        })
+        version, facets = get_facets()
+        etag = f'"facets-{version}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'version': version, **facets})
+        response['ETag'] = etag
+        # Adres z aktualną wersją (?version=) się nie zmienia, bez niej - zawsze sprawdzenie ETag
+        if request.query_params.get('version') == str(version):
+            response['Cache-Control'] = 'public, max-age=86400, immutable'
+        else:
+            response['Cache-Control'] = 'no-cache'
+        return response
 
     @action(detail=False, methods=['GET'])
     def bought_courses(self, request):
@@ -500,10 +504,12 @@ class CourseViewSet(viewsets.ModelViewSet):
         purchased_courses = Course.objects.filter(
             payments__user=request.user,
             payments__status='ACCEPTED'
-        )
+        ).prefetch_related('technologies', 'reviews')
 
-        serializer = CourseSerializer(purchased_courses, many=True)
-        return Response(serializer.data)
+        paginator = CoursePagination()
+        page_items = paginator.paginate_queryset(purchased_courses, request)
+        serializer = CourseSerializer(page_items, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['GET'])
     def my_courses(self, request):
@@ -513,10 +519,12 @@ class CourseViewSet(viewsets.ModelViewSet):
         my_courses = Course.objects.filter(
             models.Q(instructor=request.user) |
             models.Q(moderators=request.user)
-        ).distinct()
+        ).distinct().prefetch_related('technologies', 'reviews')
 
-        serializer = CourseSerializer(my_courses, many=True)
-        return Response(serializer.data)
+        paginator = CoursePagination()
+        page_items = paginator.paginate_queryset(my_courses, request)
+        serializer = CourseSerializer(page_items, many=True)
+        return paginator.get_paginated_response(serializer.data)
     @action(detail=True, methods=['GET'])
     def check_access(self, request, pk=None):
         course = self.get_object()
@@ -583,14 +591,15 @@ class CourseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
     def get_queryset(self):
-        queryset = Course.objects.annotate(
-            average_rating=Avg('reviews__rating'),
-            total_reviews=Count('reviews')
-        ).prefetch_related('reviews', 'technologies')
+        # Średnia i liczba ocen są kolumnami kursu - bez złączenia z opiniami
+        queryset = Course.objects.prefetch_related('technologies')
         
         # Jeśli użytkownik nie jest zalogowany, pokazuj tylko opublikowane kursy
         if not self.request.user.is_authenticated:
             return queryset.filter(is_published=True)
+
+        # CourseSerializer (dla zalogowanych) zwraca też listę opinii
+        queryset = queryset.prefetch_related('reviews')
             
         # Dla zalogowanych użytkowników:
         # - Instruktorzy i moderatorzy widzą swoje kursy
@@ -633,9 +642,11 @@ class CourseViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['GET'])
     def reviews(self, request, pk=None):
         course = self.get_object()
-        reviews = CourseReview.objects.filter(course=course)
-        serializer = CourseReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        reviews = CourseReview.objects.filter(course=course).select_related('user')
+        paginator = ReviewPagination()
+        page_items = paginator.paginate_queryset(reviews, request)
+        serializer = CourseReviewSerializer(page_items, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     '''@action(detail=True, methods=['GET'])
     def progress(self, request, pk=None):
@@ -697,7 +708,7 @@ class PageViewSet(viewsets.ModelViewSet):
                             'add_content_video', 'add_test_case', 'update_content',
                             'update_order']:
             return [IsAuthenticated(), IsModerator()]
-        elif self.action == 'submit_solution':
+        elif self.action in ['submit_solution', 'submit_solution_stream']:
             return [IsAuthenticated(), CanSubmitSolution()]  # Use the new permission
         return [IsAuthenticated()]
 
@@ -887,12 +898,11 @@ class PageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-    @action(detail=True, methods=['post'])
-    def submit_solution(self, request, course_pk=None, chapter_pk=None, pk=None):
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        logger.info("=== SUBMIT SOLUTION DEBUG ===")
+    def _prepare_submission(self, request, logger):
+        """
+        Wspólne sprawdzenia dla submit_solution i submit_solution_stream.
+        Zwraca (zadanie, dane zgłoszenia, None) albo (None, None, odpowiedź z błędem).
+        """
         logger.info(f"User: {request.user}")
         logger.info(f"Request data: {request.data}")
         
@@ -901,17 +911,17 @@ class PageViewSet(viewsets.ModelViewSet):
         
         if page.type != 'CODING':
             logger.error(f"Page type is {page.type}, not CODING")
-            return Response(
+            return None, None, Response(
                 {'error': 'Ta strona nie jest zadaniem programistycznym'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
-            coding_exercise = CodingExercise.objects.get(page=page)
+            coding_exercise = CodingExercise.objects.select_related('page').get(page=page)
             logger.info(f"Found coding exercise with {coding_exercise.test_cases.count()} test cases")
         except CodingExercise.DoesNotExist:
             logger.error("CodingExercise not found")
-            return Response(
+            return None, None, Response(
                 {'error': 'Zadanie programistyczne nie zostało znalezione'},
                 status=status.HTTP_404_NOT_FOUND
             )
@@ -919,7 +929,7 @@ class PageViewSet(viewsets.ModelViewSet):
         # Check if correct solution exists
         if not coding_exercise.solution or not coding_exercise.solution.strip():
             logger.error("No correct solution found")
-            return Response(
+            return None, None, Response(
                 {'error': 'Brak wzorcowego rozwiązania dla tego zadania'},
                 status=status.HTTP_404_NOT_FOUND
             )
@@ -927,72 +937,129 @@ class PageViewSet(viewsets.ModelViewSet):
         serializer = CodeSubmissionSerializer(data=request.data)
         if not serializer.is_valid():
             logger.error(f"Serializer errors: {serializer.errors}")
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return None, None, Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        user_code = serializer.validated_data['code']
-        logger.info(f"User code: {user_code}")
+        logger.info(f"User code: {serializer.validated_data['code']}")
         logger.info(f"Correct solution: {coding_exercise.solution}")
         
         test_cases = coding_exercise.test_cases.all()
-        logger.info(f"Test cases: {[(tc.input_data, tc.expected_output) for tc in test_cases]}")
+        logger.info(f"Test cases: {[(preview(tc.grading_input()), preview(tc.grading_expected_output())) for tc in test_cases]}")
 
         if not test_cases.exists():
             logger.error("No test cases found")
-            return Response(
+            return None, None, Response(
                 {'error': 'Brak przypadków testowych dla tego zadania'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        executor = CodeExecutionService()
-        
-        # Use the new method that compares with correct solution
-        results = executor.run_all_tests_with_solution(
-            user_code,
-            coding_exercise.solution,  # Pass the correct solution
-            [
-                {
-                    'input_data': test.input_data,
-                    'is_hidden': test.is_hidden
-                }
-                for test in test_cases
-            ]
-        )
+        return coding_exercise, serializer.validated_data, None
+
+    @action(detail=True, methods=['post'])
+    def submit_solution(self, request, course_pk=None, chapter_pk=None, pk=None):
+        import logging
+        logger = logging.getLogger(__name__)
         
-        logger.info(f"Execution results: {results}")
+        logger.info("=== SUBMIT SOLUTION DEBUG ===")
+        coding_exercise, submission, error_response = self._prepare_submission(request, logger)
+        if error_response:
+            return error_response
 
-        # Format results for frontend
-        formatted_results = {
-            'success': results['success'],
-            'test_results': []
-        }
+        user_code = submission['code']
+        grading_async = getattr(settings, 'GRADING_ASYNC', False)
 
-        for i, result in enumerate(results['results']):
-            test_result = {
-                'passed': result['success'],
-                'input': result.get('input', ''),
-                'is_hidden': result.get('is_hidden', False),
-                'error': result.get('error', None)
-            }
-            
-            # Only show expected/actual for visible test cases
-            if not result.get('is_hidden', False):
-                test_result['expected_output'] = result.get('expected_output', '')
-                test_result['actual_output'] = result.get('output', '')
-            
-            formatted_results['test_results'].append(test_result)
+        try:
+            admit(execution_key(request.user), queued=grading_async)
+        except ExecutionThrottled as e:
+            logger.info(f"Submission throttled: {e}")
+            return throttled_response(e)
+
+        if grading_async:
+            job = enqueue_grading_job(request.user, coding_exercise.page, user_code, submission['language'])
+            logger.info(f"Enqueued grading job {job.id}")
+            return Response({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': reverse('grading_job_status', kwargs={'job_id': job.id})
+            }, status=status.HTTP_202_ACCEPTED)
 
-        if results['success']:
-            UserProgress.objects.update_or_create(
-                user=request.user,
-                page=page,
-                defaults={
-                    'completed': True,
-                    'completed_at': timezone.now()
-                }
-            )
+        formatted_results = grade_submission(request.user, coding_exercise, user_code, submission['language'])
+        logger.info(f"Execution results: {formatted_results}")
 
         return Response(formatted_results)
 
+    @action(detail=True, methods=['post'])
+    def submit_solution_stream(self, request, course_pk=None, chapter_pk=None, pk=None):
+        """
+        Przesyła wynik każdego testu zaraz po jego zakończeniu jako NDJSON (jeden obiekt JSON
+        na linię), a na końcu podsumowanie. Przy GRADING_ASYNC zgłoszenie trafia do kolejki,
+        a strumień odczytuje postęp zapisywany przez grading_worker; jeśli ocenianie nie skończy
+        się w GRADING_STREAM_TIMEOUT sekund, ostatnia linia ({"type": "pending"}) zawiera status_url.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        coding_exercise, submission, error_response = self._prepare_submission(request, logger)
+        if error_response:
+            return error_response
+
+        try:
+            # Te same limity co zgłoszenia kolejkowane - łącznie z głębokością kolejki i limitem CPU
+            admit(execution_key(request.user), queued=True)
+        except ExecutionThrottled as e:
+            return throttled_response(e)
+
+        if getattr(settings, 'GRADING_ASYNC', False):
+            job = enqueue_grading_job(request.user, coding_exercise.page, submission['code'], submission['language'])
+            logger.info(f"Enqueued grading job {job.id} (stream)")
+            results = follow_grading_job(job, reverse('grading_job_status', kwargs={'job_id': job.id}))
+        else:
+            results = iter_submission_results(request.user, coding_exercise, submission['code'], submission['language'])
+        response = StreamingHttpResponse(
+            (json.dumps(line, cls=JSONEncoder) + '\n' for line in results),
+            content_type='application/x-ndjson'
+        )
+        # Bez buforowania po stronie proxy (nginx), żeby wyniki docierały od razu
+        response['X-Accel-Buffering'] = 'no'
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def grading_job_status(request, job_id):
+    """
+    Status zgłoszenia oceniania - odpowiedź wraca od razu, a klient odpytuje ponownie
+    po poll_interval sekundach, dopóki status to PENDING lub RUNNING.
+    """
+    try:
+        job = GradingJob.objects.get(id=job_id)
+    except GradingJob.DoesNotExist:
+        return Response({'error': 'Nie znaleziono zgłoszenia'}, status=status.HTTP_404_NOT_FOUND)
+
+    if job.user != request.user and not request.user.is_staff:
+        return Response({'error': 'Brak dostępu do tego zgłoszenia'}, status=status.HTTP_403_FORBIDDEN)
+
+    return Response({
+        'job_id': job.id,
+        'status': job.status,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'result': job.result,
+        'poll_interval': getattr(settings, 'GRADING_POLL_INTERVAL', 1)
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def grading_metrics_view(request):
+    """
+    Percentyle (p50/p95/p99) czasu kompilacji, wykonania i porównania wyników dla każdego zadania,
+    od zadań zajmujących najwięcej czasu oceniania. Parametr ?exercise=<id strony> zawęża wynik.
+    """
+    exercise_id = request.query_params.get('exercise')
+    if exercise_id is not None and not exercise_id.isdigit():
+        return Response({'error': 'Nieprawidłowy identyfikator zadania'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'exercises': grading_metrics(int(exercise_id) if exercise_id else None)})
+
 @api_view(['GET'])
 def verify_email(request):
     code = request.GET.get('code')
@@ -1274,10 +1341,7 @@ def activate_view(request):
         messages.error(request, 'Link wygasł lub jest niepoprawny')
         return redirect('home')
 def home_view(request):
-    courses = Course.objects.annotate(
-        average_rating=Avg('reviews__rating'),
-        total_reviews=Count('reviews')
-    ).prefetch_related('reviews', 'chapters', 'technologies')
+    courses = Course.objects.prefetch_related('chapters', 'technologies')
     
     if not request.user.is_authenticated:
         courses = courses.filter(is_published=True)
@@ -1855,202 +1919,146 @@ def get_json_body(request):
     except json.JSONDecodeError:
         raise ValueError('Nieprawidłowy format JSON.')
 
-def run_code(request, file_extension, commands, extra_options=None):
+def throttled_response(error):
+    return Response(
+        {'error': str(error)},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+def throttled_json_response(error):
+    response = JsonResponse({'success': False, 'error': str(error)}, status=429)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _run_language(request, language):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method. Use POST.'})
 
     try:
-        if request.content_type == 'application/json':
-            data = get_json_body(request)  # Funkcja pomocnicza
-            code = data.get('code', '')
-        else:
-            code = request.POST.get('code', '')
-
+        data = get_json_body(request) if request.content_type == 'application/json' else request.POST
+        language = language or data.get('language', '')
+        code = data.get('code', '')
         if not code.strip():
             return JsonResponse({'success': False, 'error': 'Kod nie może być pusty.'})
 
-        # Logika plików tymczasowych
-        temp_file = tempfile.NamedTemporaryFile(
-            suffix=file_extension, delete=False, dir='.', mode='w', encoding='utf-8'
-        )
-        temp_file.write(code)
-        temp_file.close()
-
-        # Przetwarzanie komend i uruchamianie
-        binary_file = extra_options.get('binary_file') if extra_options else None
-        if extra_options and extra_options.get('compile_needed'):
-            compile_command = extra_options.get('compile_command')
-            compile_process = subprocess.run(compile_command + [temp_file.name], capture_output=True, text=True)
-            if compile_process.returncode != 0:
-                raise RuntimeError(f"Kompilacja nieudana: {compile_process.stderr}")
-
-        if binary_file:
-            commands.append(binary_file)
-
-        process = subprocess.run(commands, capture_output=True, text=True)
+        try:
+            registry.get(language)
+        except LanguageUnavailable as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        key = execution_key(request=request)
+        admit(key)
+        # Kompilacja przez cache artefaktów, uruchomienie w osobnym katalogu z limitami języka
+        result = registry.run(language, code)
+        charge_cpu_time(key, result['cpu_time'] if result.get('cpu_time') is not None else result['wall_time'])
+        success = result['returncode'] == 0 and not result['timed_out']
         return JsonResponse({
-            'success': process.returncode == 0,
-            'output': process.stdout,
-            'error': process.stderr
+            'success': success,
+            'language': language,
+            'output': result['stdout'],
+            'error': '' if success else execution_error(result),
+            **execution_metadata(result)
         })
 
+    except (LanguageUnavailable, CompilationError) as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    except ExecutionThrottled as e:
+        return throttled_json_response(e)
+    except RunnerBusy as e:
+        # Wszystkie miejsca na procesy zajęte - klient ponawia po chwili
+        return throttled_json_response(ExecutionThrottled(str(e), getattr(settings, 'RUNNER_BUSY_RETRY_AFTER', 5)))
     except Exception as e:
         return JsonResponse({'success': False, 'error': f"Unexpected error: {str(e)}"})
 
-    finally:
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
-        if binary_file and os.path.exists(binary_file):
-            os.unlink(binary_file)
-
 
-# Widok dla języka Python
-def python_interpreter(request):
-    if request.method != 'POST':
-        return JsonResponse({'success': False, 'error': 'Invalid request method. Use POST.'})
-
-    try:
-        # Odczyt JSON tylko raz
-        data = request.body.decode('utf-8') if request.content_type == 'application/json' else request.POST.get('code',
-                                                                                                                '')
-        if not data.strip():
-            return JsonResponse({'success': False, 'error': 'Kod nie może być pusty.'})
+def run_code(request):
+    """
+    Jeden endpoint dla wszystkich języków: POST {"language": ..., "code": ...}.
+    GET zwraca listę języków z dostępnym na serwerze kompilatorem/interpreterem.
+    """
+    if request.method == 'GET':
+        available = {language.name for language in registry.available()}
+        return JsonResponse({'languages': [
+            {'name': language.name, 'label': language.label, 'available': language.name in available}
+            for language in registry
+        ]})
+    return _run_language(request, None)
 
-        # Utwórz plik tymczasowy z kodem w Pythonie
-        with tempfile.NamedTemporaryFile(suffix='.py', delete=False, mode='w', encoding='utf-8') as temp_file:
-            temp_file.write(data)
-            temp_file_path = temp_file.name
 
-        # Uruchom kod w pliku tymczasowym przy użyciu subprocess
-        process = subprocess.run(
-            ['python', temp_file_path],
-            capture_output=True, text=True
-        )
+# Dotychczasowe adresy poszczególnych interpreterów - ten sam mechanizm co /run-code/
+def python_interpreter(request):
+    return _run_language(request, 'python')
 
-        # Usuń plik tymczasowy po wykonaniu
-        os.unlink(temp_file_path)
 
-        if process.returncode == 0:
-            return JsonResponse({'success': True, 'output': process.stdout})
-        else:
-            return JsonResponse({'success': False, 'error': process.stderr})
+# Sesja Pythona - stan (zmienne, importy) zachowany między kolejnymi fragmentami kodu
+def python_session(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Tryb sesji wymaga zalogowania.'}, status=403)
 
-    except Exception as e:
-        return JsonResponse({'success': False, 'error': f'Unexpected error: {str(e)}'})
+    manager = get_repl_manager()
+    if request.method == 'DELETE':
+        try:
+            manager.close(request.user.pk)
+        except ReplHostUnavailable as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=503)
+        return JsonResponse({'success': True})
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method. Use POST or DELETE.'})
 
-# Widok dla PowerShell
-def powershell_interpreter(request):
-    if request.method == 'POST':
-        code = request.POST.get('code', '')
+    try:
+        data = get_json_body(request) if request.content_type == 'application/json' else request.POST
+        code = data.get('code', '')
         if not code.strip():
             return JsonResponse({'success': False, 'error': 'Kod nie może być pusty.'})
 
-        try:
-            # Znajdowanie odpowiedniego PowerShell (classic lub Core)
-            executable = shutil.which("powershell") or shutil.which("pwsh")
-            if not executable:
-                return JsonResponse({'success': False, 'error': 'PowerShell executable not found in PATH.'})
-
-            # Tworzenie pliku tymczasowego z poleceniami PowerShell
-            with tempfile.NamedTemporaryFile(suffix='.ps1', delete=False, mode='w', encoding='utf-8') as temp_file:
-                temp_file.write(code)
-                temp_file.flush()
-                temp_file_path = temp_file.name
-
-            # Uruchomienie skryptu PowerShell
-            process = subprocess.run(
-                [executable, '-ExecutionPolicy', 'Bypass', '-File', temp_file_path],
-                capture_output=True, text=True, shell=False
-            )
-
-            # Usuwanie pliku tymczasowego
-            os.unlink(temp_file_path)
-
-            if process.returncode != 0:
-                return JsonResponse({'success': False, 'error': process.stderr})
-
-            return JsonResponse({'success': True, 'output': process.stdout})
+        key = execution_key(request.user)
+        admit(key)
+        result = manager.run(request.user.pk, code)
+        charge_cpu_time(key, result.get('execution_time'))
+        response = {
+            'success': result['success'],
+            'output': result['stdout'],
+            'truncated': result['truncated'],
+            'restarted': result.get('restarted', False),
+            'execution_time': result.get('execution_time')
+        }
+        if not result['success']:
+            response['error'] = result['stderr']
+        return JsonResponse(response)
+
+    except ExecutionThrottled as e:
+        return throttled_json_response(e)
+    except RunnerBusy as e:
+        # Wszystkie miejsca na procesy zajęte przez uruchomienia i aktywne sesje
+        return throttled_json_response(ExecutionThrottled(str(e), getattr(settings, 'RUNNER_BUSY_RETRY_AFTER', 5)))
+    except ReplHostUnavailable as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=503)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'Unexpected error: {str(e)}'})
 
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
-        finally:
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
 
-    else:
-        return JsonResponse({'success': False, 'error': 'Invalid HTTP method. Use POST.'})
+def powershell_interpreter(request):
+    return _run_language(request, 'powershell')
 
 
 def c_interpreter(request):
-    gcc_path = r"C:\msys64\ucrt64\bin\gcc.exe"
-    if not os.path.exists(gcc_path):
-        return JsonResponse({'success': False, 'error': 'Nie znaleziono GCC w podanej ścieżce.'})
-
-    return run_code(
-        request,
-        file_extension='.c',
-        commands=[],  # Puste, bo etap kompilacji określi plik wykonywalny
-        extra_options={
-            'compile_needed': True,
-            'compile_command': [gcc_path, '-o', 'program.exe', '-L', r"C:\msys64\ucrt64\lib"],
-            'binary_file': './program.exe'  # Nazwa wynikowego pliku wykonywalnego
-        }
-    )
+    return _run_language(request, 'c')
+
 
-# Widok dla C#
 def csharp_interpreter(request):
-    return run_code(request, '.cs', ['dotnet', 'run'])
+    return _run_language(request, 'csharp')
 
 
-# Widok dla języka Java
 def java_interpreter(request):
-    return run_code(
-        request,
-        file_extension='.java',
-        commands=['java', 'program'],  # Uruchomienie programu
-        extra_options={
-            'compile_needed': True,
-            'compile_command': ['javac'],
-            'binary_file': 'program.class'
-        }
-    )
-
-# Widok dla JavaScript
-def js_interpreter(request):
-    try:
-        # Upewnij się, że `node` jest dostępny
-        node_executable = shutil.which('node')
-        if not node_executable:
-            return JsonResponse(
-                {'success': False, 'error': 'Node.js executable not found in PATH. Please install Node.js.'})
-
-        # Uzyskaj kod JavaScript
-        data = get_json_body(request) if request.content_type == 'application/json' else request.POST
-        code = data.get('code', '').strip()
-        if not code:
-            return JsonResponse({'success': False, 'error': 'Kod nie może być pusty.'})
-
-        # Tworzenie pliku tymczasowego
-        with tempfile.NamedTemporaryFile(suffix='.js', delete=False, mode='w', encoding='utf-8') as temp_file:
-            temp_file.write(code)
-            temp_file_path = temp_file.name
-
-        # Uruchamianie kodu z użyciem subprocess
-        process = subprocess.run(
-            [node_executable, temp_file_path],
-            capture_output=True, text=True, shell=False
-        )
+    return _run_language(request, 'java')
 
-        # Usuwanie pliku tymczasowego
-        os.unlink(temp_file_path)
 
-        if process.returncode != 0:
-            return JsonResponse({'success': False, 'error': process.stderr})
-
-        return JsonResponse({'success': True, 'output': process.stdout})
+def js_interpreter(request):
+    return _run_language(request, 'javascript')
 
-    except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)})
 
 def interpreter_view(request):
     return render(request, 'interpreter.html')
\ No newline at end of file